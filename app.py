@@ -1,27 +1,59 @@
 from flask import Flask, render_template, jsonify, request, Response, send_file
-import matplotlib
-import matplotlib.pyplot as plt
 import io
-import time
+import itertools
+import math
 import json
 import base64
-from tsp_solver import carregar_problema, algoritmo_colonia_formigas_sse, visualizar_grafo_json, \
-    visualizar_melhor_rota_json
+import os
+import time
+import re
+import cProfile
+import marshal
+import pstats
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from tsp_solver import obter_instancia, algoritmo_colonia_formigas_sse, executar_colonia, execucao_pulada
+from ilhas import algoritmo_ilhas
+from paralelo import CONTEXTO_PROCESSOS, precarregar
+from registro_instancias import registro_instancias
+from visualizacao import payload_grafo, payload_rota, K_VIZINHOS_VISUALIZACAO
+from jobs import GerenciadorJobs, FilaCheia
+import graficos
+from metricas import Instrumentacao, registro, memoria_rss, memoria_pico
 
-matplotlib.use('Agg')
 app = Flask(__name__)
 
-# Variables for problem and solution data
-problem_instance = None
-melhor_rota = None
-G = None
-problem = None
+# The run and island processes re-import this module; preloading it in the forkserver means they find Flask and
+# matplotlib already imported, instead of spending the deadline of the job importing them again
+precarregar('app')
+
+# Server-side cap on how many /run_multiple_aco runs execute at the same time
+MAX_CONCURRENT_RUNS = os.cpu_count() or 1
+
+# Job subsystem: every solve is a job with its own instance and results, run on a background worker pool.
+# At most MAX_CONCURRENT_JOBS run at once and MAX_QUEUED_JOBS wait; beyond that new jobs are refused.
+MAX_CONCURRENT_JOBS = 32
+MAX_QUEUED_JOBS = 64
+jobs = GerenciadorJobs(max_simultaneos=MAX_CONCURRENT_JOBS, max_fila=MAX_QUEUED_JOBS)
+
+# Island-model jobs: at most this many islands (one process each), by default one per CPU
+MAX_ISLANDS = 32
+DEFAULT_ISLANDS = os.cpu_count() or 1
+
+# Iterations without improvement after which a run counts as converged and stops (0 disables it)
+DEFAULT_STAGNATION = 50
+
+# Colony checkpoints (one .npz per job id) live here, so they survive restarts and deploys
+CHECKPOINT_DIR = os.environ.get('ACO_CHECKPOINT_DIR', 'checkpoints')
+
+# How often a multiple-runs job waiting on its runs wakes up to check whether it was cancelled, in seconds
+CANCEL_CHECK_SECONDS = 0.5
+
+# Reconnection delay suggested to EventSource clients, in milliseconds
+SSE_RETRY_MS = 3000
+# Seconds without events after which a comment line is sent so proxies don't drop the idle connection
+SSE_HEARTBEAT_SECONDS = 15
 
-# Global variables for fitness and iteration data
-iteration_counts = []
-best_fitnesses = []
-worst_fitnesses = []
-avg_fitnesses = []
 
 @app.route('/')
 def index():
@@ -29,190 +61,687 @@ def index():
     return render_template('index.html')
 
 
+# Reads the run parameters from the query string or from a JSON body (same names in both)
+def read_parameters(source):
+    seed = source.get('seed')
+    num_runs = int(source.get('numRuns', 10))  # Number of runs, default to 10
+    parameters = {
+        'instance': source.get('instance'),
+        'rounded': str(source.get('rounded', False)).lower() in ('1', 'true'),
+        'seed': int(seed) if seed not in (None, '') else None,
+        # Per-phase timers and construction counters in every iteration event (cheap, on by default)
+        'instrument': str(source.get('instrument', True)).lower() in ('1', 'true'),
+        # Checkpoint the colony every checkpointEvery iterations, on cancellation and at the end
+        'checkpoint': str(source.get('checkpoint', False)).lower() in ('1', 'true'),
+        'checkpoint_every': max(1, int(source.get('checkpointEvery', 50))),
+        # Job id whose checkpoint is resumed (same run, continued) or used to warm-start a new run
+        'resume_from': source.get('resumeFrom') or None,
+        'warm_start_from': source.get('warmStartFrom') or None,
+        # cProfile the whole run, downloadable from /jobs/<id>/profile once the job ends
+        'profile': str(source.get('profile', False)).lower() in ('1', 'true'),
+        'num_runs': num_runs,
+        # Runs are independent, so they are spread over a process pool; the client may ask for less, never more
+        'concurrency': max(1, min(int(source.get('concurrency', MAX_CONCURRENT_RUNS)), MAX_CONCURRENT_RUNS, num_runs)),
+        'solver': {
+            'alfa': float(source.get('alpha', 1)),
+            'beta': float(source.get('beta', 2)),
+            'evaporacao': float(source.get('evaporation', 0.5)),
+            'Q': float(source.get('Q', 10)),
+            'num_formigas': int(source.get('numAnts', 100)),
+            'num_iteracoes': int(source.get('numIterations', 100)),
+            'motor': source.get('engine', 'vetorizado'),  # 'vetorizado' (all ants at once) or 'escalar'
+            'k_vizinhos': int(source.get('k', 0)) or None,  # candidate list size, 0 = full scan
+            'modo_busca_local': source.get('localSearch') or None,  # None, 'melhor' (iteration best) or 'todas'
+            'estrategia': source.get('strategy', 'as'),  # 'as' (Ant System), 'mmas' (MAX-MIN) or 'acs' (Ant Colony System)
+            'parametros_estrategia': {'q0': float(source['q0'])} if source.get('q0') not in (None, '') else None,
+            'max_stagnation': int(source.get('stagnation', DEFAULT_STAGNATION)),
+            # Anytime mode: stop at the deadline (ms) or once the best tour is at most target long
+            'prazo_ms': float(source['deadlineMs']) if source.get('deadlineMs') not in (None, '') else None,
+            'distancia_alvo': float(source['target']) if source.get('target') not in (None, '') else None,
+        },
+    }
+    # Island model ('islands' jobs): colonies in separate processes, exchanging their best tours every
+    # migrationInterval iterations over a ring or fully connected topology. islandAlphas / islandBetas are
+    # comma-separated values handed out to the islands in turn (empty = every island uses alpha / beta)
+    parameters['islands'] = {
+        'num_ilhas': max(1, min(int(source.get('islands', DEFAULT_ISLANDS)), MAX_ISLANDS)),
+        'intervalo': int(source.get('migrationInterval', 10)),
+        'topologia': source.get('topology', 'anel'),  # 'anel' (ring) or 'completa' (fully connected)
+        'modo': source.get('migration', 'rota'),  # 'rota' (best tours) or 'feromonio' (pheromone blend on them)
+        'peso': float(source.get('migrationWeight', 0.5)),
+        'parametros_ilhas': island_parameters(source),
+    }
+    if 'solution' in source and source['solution']:
+        parameters['solver']['solucao_inicial'] = [int(cidade) for cidade in source['solution']]
+    return parameters
+
+
+# Per-island alpha / beta overrides: the i-th island gets the i-th value of each list (cycling when shorter)
+def island_parameters(source):
+    listas = {}
+    for chave, nome in (('islandAlphas', 'alfa'), ('islandBetas', 'beta')):
+        valores = [float(valor) for valor in str(source.get(chave) or '').split(',') if valor.strip()]
+        if valores:
+            listas[nome] = valores
+    if not listas:
+        return None
+    num_ilhas = max(1, min(int(source.get('islands', DEFAULT_ISLANDS)), MAX_ISLANDS))
+    return [{nome: valores[ilha % len(valores)] for nome, valores in listas.items()} for ilha in range(num_ilhas)]
+
+
+# Encodes a route (list of city labels) as base64 of a little-endian uint16 array (uint32 for labels >= 65536),
+# several times smaller than the JSON list for large instances
+def encode_route(rota):
+    rota = np.asarray(rota)
+    dtype = '<u2' if rota.max(initial=0) < 2 ** 16 else '<u4'
+    return {'dtype': 'uint16' if dtype == '<u2' else 'uint32',
+            'data': base64.b64encode(rota.astype(dtype).tobytes()).decode()}
+
+
+# Absolute deadline of a job as a time.time() instant (comparable across processes, unlike perf_counter), counted
+# from job creation; None when the job has no deadline
+def job_deadline(job):
+    prazo_ms = job.parametros['solver']['prazo_ms']
+    if prazo_ms is None:
+        return None
+    return time.time() - (time.perf_counter() - job.criado_em) + prazo_ms / 1000
+
+
+# Solver parameters of a job, with the deadline counted from job creation, so time spent queued or loading the
+# instance is included
+def job_solver_parameters(job):
+    solver_parameters = dict(job.parametros['solver'])
+    if solver_parameters['prazo_ms'] is not None:
+        espera_ms = 1000 * (time.perf_counter() - job.criado_em)
+        solver_parameters['prazo_ms'] = max(0.0, solver_parameters['prazo_ms'] - espera_ms)
+    return solver_parameters
+
+
+# Single colony job: streams one event per iteration and keeps the fitness history and best route in the job
+def colony_job(job):
+    parameters = job.parametros
+    G, problem, instancia = obter_instancia(instance_path(parameters['instance']), parameters['rounded'])
+    dados = job.dados
+    dados.update(best_fitnesses=[], worst_fitnesses=[], avg_fitnesses=[], iteration_counts=[], melhor_rota=None)
+    tempos = []  # per-iteration construction / local search time
+    num_workers = min(int(parameters.get('workers', 1)), os.cpu_count() or 1)  # processes building the ants
+    instrumentacao = Instrumentacao() if parameters['instrument'] else None
+    # The profiler follows this thread only, so with workers > 1 the ants built in other processes are not in it
+    perfil = cProfile.Profile() if parameters['profile'] else None
+    checkpoints = {
+        'checkpoint': checkpoint_path(job.id) if parameters['checkpoint'] else None,
+        'intervalo_checkpoint': parameters['checkpoint_every'],
+        'retomar': checkpoint_path(parameters['resume_from']) if parameters['resume_from'] else None,
+        'aquecimento': checkpoint_path(parameters['warm_start_from']) if parameters['warm_start_from'] else None,
+    }
+    if checkpoints['checkpoint'] is not None:
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    solver_parameters = job_solver_parameters(job)
+    parada = {}
+
+    iteration_counter = 0
+    melhor_fitness = None
+    if perfil is not None:
+        perfil.enable()
+    solver = algoritmo_colonia_formigas_sse(
+        G, problem, dados['best_fitnesses'], dados['worst_fitnesses'], dados['avg_fitnesses'],
+        instancia=instancia, tempos=tempos, semente=parameters['seed'], num_workers=num_workers,
+        instrumentacao=instrumentacao, parada=parada, **checkpoints, **solver_parameters)
+    try:
+        for iteracao, fitness, rota_atual in solver:
+            dados['melhor_rota'] = rota_atual
+            iteration_counter += 1
+            evento = {'iteracao': iteracao, 'fitness': fitness, 'tempos': tempos[-1]}
+            if instrumentacao is not None:
+                evento['metricas'] = instrumentacao.ultima
+            # The route only goes out when the best tour improves, compactly encoded
+            if melhor_fitness is None or fitness < melhor_fitness:
+                melhor_fitness = fitness
+                evento['rota'] = encode_route(rota_atual)
+            yield evento
+    finally:
+        solver.close()  # on cancellation this is what writes the last checkpoint
+        if perfil is not None:
+            perfil.disable()
+            dados['perfil'] = perfil
+
+    dados['iteration_counts'].append(iteration_counter)
+    yield {'final': True, 'mensagem': 'Execução concluída com sucesso', 'fitness': melhor_fitness,
+           'melhor_rota': encode_route(dados['melhor_rota']) if dados['melhor_rota'] is not None else None,
+           'stop_reason': parada['motivo'],
+           'converged': parada['motivo'] == 'estagnacao'}
+
+
+# Multiple independent runs job: runs go to a process pool and are reported in completion order
+def multiple_runs_job(job):
+    parameters = job.parametros
+    # Fail early if the instance cannot be loaded; this also writes its artifacts, which the runs then only map
+    caminho = instance_path(parameters['instance'])
+    obter_instancia(caminho, parameters['rounded'])
+    dados = job.dados
+    dados.update(best_fitnesses=[], worst_fitnesses=[], avg_fitnesses=[], iteration_counts=[], melhor_rota=None)
+    # One seed per run, derived from the request seed (or from fresh entropy when none is given)
+    sementes = np.random.SeedSequence(parameters['seed']).generate_state(parameters['num_runs'])
+
+    resultados = {}
+    # Runs already executing check this event every iteration: cancelling the job stops them, not only the queued ones
+    gerenciador = CONTEXTO_PROCESSOS.Manager()
+    cancelamento = gerenciador.Event()
+    pool = ProcessPoolExecutor(max_workers=parameters['concurrency'], mp_context=CONTEXTO_PROCESSOS)
+    futuros = {}
+    pendentes = set()
+    execucoes = iter(enumerate(sementes, start=1))
+    # The job deadline goes to each run as an absolute prazo_final (see run_deadline), so the pool, the Manager and
+    # the worker processes starting up all count against it
+    fim = job_deadline(job)
+    solver_parameters = dict(parameters['solver'], prazo_ms=None)
+
+    # A run is submitted only when a worker is free. Its deadline is an even share of what is left of the job's
+    # deadline among the waves of runs still to start (concurrency runs per wave), so the first runs do not use up
+    # the time of the later ones; runs that converge early leave their time to the rest
+    def run_deadline(restantes):
+        agora = time.time()
+        return agora + (fim - agora) / math.ceil(restantes / parameters['concurrency'])
+
+    # Submits up to quantas runs and returns the numbers of the runs skipped because the job deadline is over
+    def submeter(quantas):
+        for run_num, semente in itertools.islice(execucoes, quantas):
+            restantes = parameters['num_runs'] - run_num + 1
+            if fim is not None and fim <= time.time():
+                return [run_num] + [outro for outro, _ in execucoes]
+            futuro = pool.submit(executar_colonia, caminho, parameters['rounded'], cancelamento=cancelamento,
+                                 semente=int(semente), prazo_final=run_deadline(restantes) if fim else None,
+                                 **solver_parameters)
+            futuros[futuro] = run_num
+            pendentes.add(futuro)
+        return []
+
+    try:
+        puladas = submeter(parameters['concurrency'])
+
+        # Runs are reported in completion order, as soon as each one finishes. Waiting wakes up every
+        # CANCEL_CHECK_SECONDS, so a cancellation is noticed even while no run finishes
+        while pendentes or puladas:
+            prontos = set()
+            if pendentes:
+                prontos, _ = wait(pendentes, timeout=CANCEL_CHECK_SECONDS, return_when=FIRST_COMPLETED)
+            if job.cancelamento.is_set():
+                return
+            pendentes.difference_update(prontos)
+            puladas += submeter(len(prontos))
+            concluidas = [(futuros[futuro], futuro.result()) for futuro in prontos]
+            concluidas += [(run_num, execucao_pulada()) for run_num in puladas]
+            puladas = []
+            for run_num, resultado in sorted(concluidas, key=lambda concluida: concluida[0]):
+                resultados[run_num] = resultado
+                yield run_event(run_num, resultado)
+    finally:
+        cancelamento.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+        gerenciador.shutdown()
+
+    # Aggregate in run order once every run is done; skipped runs are listed but left out of the statistics
+    runs = [dict(run=run_num, **{k: v for k, v in resultados[run_num].items() if k != 'melhor_rota'})
+            for run_num in sorted(resultados)]
+    executadas = [run for run in runs if not run['pulada']]
+    message = 'Execução múltipla concluída com sucesso'
+    if len(executadas) < len(runs):
+        message += f" ({len(runs) - len(executadas)} execução(ões) pulada(s): o prazo acabou antes de começarem)"
+    if not executadas:
+        yield {'final': True, 'message': 'Nenhuma execução começou antes do fim do prazo', 'boxplot_url': None,
+               'runs': runs}
+        return
+    melhor_run = min(executadas, key=lambda run: run['melhor_distancia'])
+    dados['iteration_counts'].extend(run['iteracoes'] for run in executadas)
+    dados['best_fitnesses'], dados['worst_fitnesses'], dados['avg_fitnesses'] = (
+        executadas[-1]['best_fitnesses'], executadas[-1]['worst_fitnesses'], executadas[-1]['avg_fitnesses'])
+    dados['melhor_rota'] = resultados[melhor_run['run']]['melhor_rota']
+
+    # Send the final boxplot image after all runs
+    img = graficos.boxplot_iteracoes(dados['iteration_counts'])
+    img_url = f"data:image/png;base64,{base64.b64encode(img).decode()}"
+
+    yield {'final': True, 'message': message, 'boxplot_url': img_url, 'runs': runs}
+
+
+# Event of a finished run. stop_reason: 'estagnacao' (converged), 'alvo' (target reached), 'iteracoes' or 'prazo'
+# (budget exhausted); skipped runs (the job deadline was over before they could start) have skipped set
+def run_event(run_num, resultado):
+    return {'run': run_num, 'iterations': resultado['iteracoes'], 'best': resultado['melhor_distancia'],
+            'stop_reason': resultado['motivo_parada'], 'skipped': resultado['pulada'],
+            'converged': resultado['motivo_parada'] == 'estagnacao'}
+
+
+# Island-model job (see ilhas.py): streams one event per island iteration carrying the global best across islands
+# (fitness) and that island's own best (island_fitness), plus one event per migration
+def islands_job(job):
+    parameters = job.parametros
+    # Loading here writes the instance artifacts once, the islands then only map them
+    caminho = instance_path(parameters['instance'])
+    obter_instancia(caminho, parameters['rounded'])
+    dados = job.dados
+    dados.update(best_fitnesses=[], worst_fitnesses=[], avg_fitnesses=[], iteration_counts=[], melhor_rota=None)
+    resultado = {}
+
+    # The islands run side by side, so each one gets the whole job deadline; it is passed as an instant, so the
+    # time spent starting the island processes counts against it
+    solver = algoritmo_ilhas(caminho, parameters['rounded'], semente=parameters['seed'], resultado=resultado,
+                             prazo_final=job_deadline(job), **parameters['islands'],
+                             **dict(parameters['solver'], prazo_ms=None))
+    try:
+        for evento_ilha in solver:
+            if 'migracao' in evento_ilha:
+                yield {'migration': evento_ilha['migracao'], 'received': evento_ilha['trocas'],
+                       'islands': {str(ilha): distancia for ilha, distancia in evento_ilha['distancias'].items()}}
+                continue
+            evento = {'iteracao': evento_ilha['iteracao'], 'island': evento_ilha['ilha'],
+                      'fitness': evento_ilha['melhor_distancia'], 'island_fitness': evento_ilha['distancia']}
+            # The route only goes out when the global best improves
+            if 'melhor_rota' in evento_ilha:
+                dados['melhor_rota'] = evento_ilha['melhor_rota']
+                evento['rota'] = encode_route(evento_ilha['melhor_rota'])
+            yield evento
+    finally:
+        solver.close()  # stops the islands that are still running
+
+    ilhas = resultado['ilhas']
+    islands = [{'island': ilha['ilha'], 'iterations': ilha['iteracoes'], 'best': ilha['melhor_distancia'],
+                'stop_reason': ilha['motivo_parada'], 'skipped': ilha['pulada']} for ilha in ilhas]
+    dados['iteration_counts'].extend(ilha['iteracoes'] for ilha in ilhas if not ilha['pulada'])
+    if resultado['melhor_ilha'] is None:
+        yield {'final': True, 'mensagem': 'Nenhuma ilha começou antes do fim do prazo', 'fitness': None,
+               'melhor_rota': None, 'best_island': None, 'islands': islands, 'stop_reason': 'prazo',
+               'converged': False}
+        return
+    melhor_ilha = next(ilha for ilha in ilhas if ilha['ilha'] == resultado['melhor_ilha'])
+    dados['best_fitnesses'], dados['worst_fitnesses'], dados['avg_fitnesses'] = (
+        melhor_ilha['best_fitnesses'], melhor_ilha['worst_fitnesses'], melhor_ilha['avg_fitnesses'])
+    puladas = sum(ilha['pulada'] for ilha in ilhas)
+    mensagem = 'Execução em ilhas concluída com sucesso'
+    if puladas:
+        mensagem += f' ({puladas} ilha(s) não começaram antes do fim do prazo)'
+    yield {'final': True, 'mensagem': mensagem, 'fitness': resultado['melhor_distancia'],
+           'melhor_rota': encode_route(resultado['melhor_rota']), 'best_island': resultado['melhor_ilha'],
+           'islands': islands, 'stop_reason': resultado['motivo'],
+           'converged': resultado['motivo'] == 'estagnacao'}
+
+
+JOB_TYPES = {
+    'single': colony_job,
+    'multiple': multiple_runs_job,
+    'islands': islands_job,
+}
+
+
+# Checkpoint file of a job; the id must look like one of ours, so it can never point outside CHECKPOINT_DIR
+def checkpoint_path(job_id):
+    if not re.fullmatch(r'[0-9a-f]{32}', str(job_id)):
+        raise ValueError(f"Id de job inválido: {job_id}")
+    return os.path.join(CHECKPOINT_DIR, f'{job_id}.npz')
+
+
+# Path of a requested instance; only names of .tsp files found in the instance directory are accepted
+def instance_path(name):
+    return registro_instancias.caminho(name)
+
+
+def create_job(job_type, source):
+    parameters = read_parameters(source)
+    if not parameters['instance']:
+        raise ValueError("Informe a instância ('instance').")
+    instance_path(parameters['instance'])
+    if 'workers' in source:
+        parameters['workers'] = int(source['workers'])
+    if job_type == 'islands' and (parameters['checkpoint'] or parameters['resume_from'] or parameters['warm_start_from']):
+        raise ValueError("Checkpoints não estão disponíveis na execução em ilhas.")
+    for key in ('resume_from', 'warm_start_from'):
+        if parameters[key] is not None and not os.path.exists(checkpoint_path(parameters[key])):
+            raise ValueError(f"Checkpoint do job {parameters[key]} não encontrado.")
+    return jobs.criar(job_type, JOB_TYPES[job_type], parameters)
+
+
+# Streams the events of a job as SSE, starting after last_event_id (replay for reconnecting clients).
+# The solver never waits for the client: iteration events are read from the job log and coalesced, so at most
+# max_rate of them go out per second (0 = no limit) and, with every > 1, only every k-th iteration is sent.
+# Coalesced events are merged, so a route carried by a skipped iteration is still delivered with the next one.
+# Other events (run results, final, errors) are always sent right away, after any pending iteration.
+def stream_job(job, last_event_id=0, max_rate=0.0, every=1):
+    intervalo = 1.0 / max_rate if max_rate > 0 else 0.0
+    coalescer = intervalo > 0 or every > 1
+
+    def sse(event_id, evento):
+        inicio = time.perf_counter()
+        texto = f"id: {event_id}\ndata: {json.dumps(evento)}\n\n"
+        registro.somar('sse_serialization_seconds_total', time.perf_counter() - inicio)
+        registro.somar('sse_events_total')
+        return texto
+
+    def events():
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        ultimo_id = last_event_id
+        pendente, pendente_id = None, None  # coalesced iteration event not sent yet
+        proximo_envio = 0.0
+        while True:
+            # Throttled: sleep until the next slot instead of waking up for every iteration
+            espera = proximo_envio - time.monotonic()
+            timeout = 0 if pendente is not None and espera > 0 else SSE_HEARTBEAT_SECONDS
+            if timeout == 0:
+                time.sleep(espera)
+            novos, terminado = job.aguardar(ultimo_id, timeout=timeout)
+            if not novos and not terminado and timeout:
+                yield ": heartbeat\n\n"
+                continue
+
+            for event_id, evento in novos:
+                ultimo_id = event_id
+                if coalescer and 'iteracao' in evento:
+                    pendente = {**pendente, **evento} if pendente is not None else evento
+                    pendente_id = event_id
+                    if evento['iteracao'] % every == 0 and time.monotonic() >= proximo_envio:
+                        proximo_envio = time.monotonic() + intervalo
+                        yield sse(pendente_id, pendente)
+                        pendente = None
+                else:
+                    if pendente is not None:
+                        yield sse(pendente_id, pendente)
+                        pendente = None
+                    yield sse(event_id, evento)
+
+            # Pending iteration whose slot has come (or the job ended) goes out without waiting for the next event
+            if pendente is not None and (terminado or (pendente['iteracao'] % every == 0
+                                                       and time.monotonic() >= proximo_envio)):
+                proximo_envio = time.monotonic() + intervalo
+                yield sse(pendente_id, pendente)
+                pendente = None
+            if terminado and not novos:
+                break
+
+    return Response(events(), content_type='text/event-stream',
+                    headers={'X-Job-Id': job.id, 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# Stream rate options from the query string: maxRate (events/s, 0 = unlimited) and every (send every k-th iteration)
+def stream_options_from_request():
+    try:
+        return {'max_rate': max(0.0, float(request.args.get('maxRate', 0))),
+                'every': max(1, int(request.args.get('every', 1)))}
+    except ValueError:
+        return {'max_rate': 0.0, 'every': 1}
+
+
+def last_event_id_from_request():
+    value = request.headers.get('Last-Event-ID') or request.args.get('lastEventId') or 0
+    try:
+        return max(0, int(value))
+    except ValueError:
+        return 0
+
+
+# Looks up the job given by ?job=<id>, returning (job, None) or (None, error response)
+def job_from_request():
+    job_id = request.args.get('job')
+    job = jobs.obter(job_id) if job_id else None
+    if job is None:
+        return None, (jsonify({'error': 'Job não encontrado!'}), 404)
+    return job, None
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job_route():
+    source = request.get_json(silent=True) or {}
+    job_type = source.get('type', 'single')
+    if job_type not in JOB_TYPES:
+        return jsonify({'error': f"Tipo de job desconhecido: {job_type}"}), 400
+    try:
+        job = create_job(job_type, source)
+    except FilaCheia as e:
+        print(f"[ERROR] Job refused: {str(e)}")
+        return jsonify({'error': str(e)}), 503
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    print(f"[INFO] Job {job.id} ({job_type}) created for instance {job.parametros['instance']}.")
+    return jsonify(job.resumo()), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.obter(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado!'}), 404
+    return jsonify(job.resumo())
+
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = jobs.cancelar(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado!'}), 404
+    print(f"[INFO] Job {job_id} cancellation requested.")
+    return jsonify(job.resumo())
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    job = jobs.obter(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado!'}), 404
+    return stream_job(job, last_event_id_from_request(), **stream_options_from_request())
+
+
+# Instances available in the instance directory (ACO_INSTANCE_DIR), with what their headers say
+@app.route('/instances', methods=['GET'])
+def list_instances():
+    return jsonify(registro_instancias.listar())
+
+
 @app.route('/load_instance', methods=['POST'])
 def load_instance():
-    global G, problem
     instance_name = request.json['instance']
     print(f"[INFO] Attempting to load instance: {instance_name}")
 
     try:
-        G, problem = carregar_problema(instance_name)
-        if G is None or problem is None:
+        # Instances above LIMITE_INSTANCIA_DENSA cities load in large-instance mode, without a graph or problem
+        inicio = time.perf_counter()
+        _, _, instancia = obter_instancia(instance_path(instance_name), bool(request.json.get('rounded', False)))
+        if instancia is None:
             raise ValueError("Erro ao carregar o problema.")
     except Exception as e:
         print(f"[ERROR] Failed to load instance {instance_name}: {str(e)}")
         return jsonify({"error": f"Falha ao carregar a instância {instance_name}: {str(e)}"}), 400
 
-    print(f"[SUCCESS] Instance {instance_name} loaded successfully.")
-    return jsonify({"message": f"Instância {instance_name} carregada com sucesso."})
+    print(f"[SUCCESS] Instance {instance_name} loaded successfully in {1000 * (time.perf_counter() - inicio):.1f} ms.")
+    return jsonify({"message": f"Instância {instance_name} carregada com sucesso.",
+                    "cities": len(instancia['cidades']), "large": bool(instancia.get('grande'))})
 
 
+# Sends a cached visualisation payload: 304 when the client already has it (ETag), gzip when accepted
+def send_payload(payload):
+    if 'gzip' in request.accept_encodings:
+        response = Response(payload.corpo_gzip, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(payload.etag + '-gz')
+    else:
+        response = Response(payload.corpo, mimetype='application/json')
+        response.set_etag(payload.etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'  # always revalidate, the ETag makes that a 304
+    return response.make_conditional(request)
+
+
+# Graph of an instance (?instance= or ?job=). ?mode= picks what is drawn: auto (default), completo (every edge),
+# vizinhos (edges to the ?k= nearest neighbours), amostra (sampled edges) or cidades (nodes only)
 @app.route('/get_graph', methods=['GET'])
 def get_graph():
     print("[INFO] Generating graph for the problem instance.")
-    if G is not None and problem is not None:
-        return visualizar_grafo_json(G, problem)
-    else:
-        print("[ERROR] Graph not generated because the problem or graph is not loaded.")
+    instance_name = request.args.get('instance')
+    rounded = str(request.args.get('rounded', False)).lower() in ('1', 'true')
+    if instance_name is None and request.args.get('job'):
+        job, error = job_from_request()
+        if error:
+            return error
+        instance_name, rounded = job.parametros['instance'], job.parametros['rounded']
+    if not instance_name:
+        print("[ERROR] Graph not generated because no instance was given.")
         return jsonify({"error": "Grafo não carregado!"}), 400
 
+    try:
+        _, _, instancia = obter_instancia(instance_path(instance_name), rounded)
+        payload = payload_grafo(instancia, request.args.get('mode', 'auto'),
+                                int(request.args.get('k', K_VIZINHOS_VISUALIZACAO)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return send_payload(payload)
+
 
+# Best route of a job as city indices; the frontend draws it with the node coordinates of /get_graph
 @app.route('/get_best_route', methods=['GET'])
 def get_best_route():
-    global melhor_rota
-    print(f"[INFO] Fetching the best route: {melhor_rota}")
+    job, error = job_from_request()
+    if error:
+        return error
+    melhor_rota = job.dados.get('melhor_rota')
+    print(f"[INFO] Fetching the best route of job {job.id}.")
     if melhor_rota is not None:
-        return visualizar_melhor_rota_json(G, problem, melhor_rota)
+        _, _, instancia = obter_instancia(instance_path(job.parametros['instance']), job.parametros['rounded'])
+        if job.dados.get('rota_payload') is None or job.dados['rota_payload'][0] is not melhor_rota:
+            job.dados['rota_payload'] = (melhor_rota, payload_rota(instancia, melhor_rota))
+        return send_payload(job.dados['rota_payload'][1])
     else:
         print("[ERROR] No best route found.")
         return jsonify({"error": "Nenhuma melhor rota encontrada!"}), 400
 
 
+# Latest checkpoint of a job (also available after a restart, since it is read from disk)
+@app.route('/jobs/<job_id>/checkpoint', methods=['GET'])
+def job_checkpoint(job_id):
+    try:
+        caminho = checkpoint_path(job_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not os.path.exists(caminho):
+        return jsonify({'error': 'Checkpoint não encontrado (crie o job com checkpoint=true).'}), 404
+    return send_file(os.path.abspath(caminho), mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f'job-{job_id}.npz')
+
+
+# cProfile dump of a job run with profile=true: the raw pstats file (open with pstats or snakeviz), or with
+# ?format=text the top functions by cumulative time
+@app.route('/jobs/<job_id>/profile', methods=['GET'])
+def job_profile(job_id):
+    job = jobs.obter(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado!'}), 404
+    perfil = job.dados.get('perfil')
+    if perfil is None:
+        return jsonify({'error': 'Perfil não disponível (crie o job com profile=true e espere ele terminar).'}), 404
+
+    if request.args.get('format') == 'text':
+        saida = io.StringIO()
+        pstats.Stats(perfil, stream=saida).sort_stats('cumulative').print_stats(int(request.args.get('limit', 40)))
+        return Response(saida.getvalue(), mimetype='text/plain')
+    perfil.create_stats()
+    return send_file(io.BytesIO(marshal.dumps(perfil.stats)), mimetype='application/octet-stream',
+                     as_attachment=True, download_name=f'job-{job_id}.prof')
+
+
+# Prometheus text exposition of the solver, stream and plot counters plus job and memory gauges
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    for state, count in jobs.contar_estados().items():
+        registro.definir('jobs', count, state=state)
+    registro.definir('resident_memory_bytes', memoria_rss())
+    registro.definir('peak_resident_memory_bytes', max(memoria_pico(), memoria_rss()))
+    return Response(registro.texto(), mimetype='text/plain; version=0.0.4')
+
+
+# Legacy streaming endpoint: creates a single-run job and streams its events.
+# The solve keeps running if the connection drops; reconnect with /jobs/<id>/events (id in the X-Job-Id header).
 @app.route('/run_aco_sse', methods=['GET'])
 def run_aco_sse():
-    global melhor_rota, iteration_counts, best_fitnesses, worst_fitnesses, avg_fitnesses
+    try:
+        job = create_job('single', request.args)
+    except FilaCheia as e:
+        return Response(f"data: {json.dumps({'error': str(e)})}\n\n", content_type='text/event-stream')
+    except (ValueError, TypeError) as e:
+        error = str(e) if request.args.get('instance') else 'Carregue uma instância primeiro!'
+        return Response(f"data: {json.dumps({'error': error})}\n\n", content_type='text/event-stream')
+    return stream_job(job, **stream_options_from_request())
 
-    # Reset fitness and iteration data for a new run
-    iteration_counter = 0
-    best_fitnesses.clear()
-    worst_fitnesses.clear()
-    avg_fitnesses.clear()
-    iteration_counts.clear()
-
-    alfa = float(request.args.get('alpha', 1))
-    beta = float(request.args.get('beta', 2))
-    evaporacao = float(request.args.get('evaporation', 0.5))
-    Q = float(request.args.get('Q', 10))
-    num_formigas = int(request.args.get('numAnts', 100))
-    num_iteracoes = int(request.args.get('numIterations', 100))
-
-    def iteracoes():
-        global melhor_rota
-        nonlocal iteration_counter
-
-        try:
-            if G is not None and problem is not None:
-                melhor_rota = None
-
-                # Pass fitness lists explicitly
-                for iteracao, fitness, rota_atual in algoritmo_colonia_formigas_sse(
-                        G, problem, best_fitnesses, worst_fitnesses, avg_fitnesses,
-                        alfa=alfa, beta=beta, evaporacao=evaporacao, Q=Q,
-                        num_formigas=num_formigas, num_iteracoes=num_iteracoes):
-                    melhor_rota = rota_atual
-                    iteration_counter += 1
-                    yield f"data: {json.dumps({'iteracao': iteracao, 'fitness': fitness})}\n\n"
-                    time.sleep(0.1)
-
-                iteration_counts.append(iteration_counter)
-                yield f"data: {json.dumps({'final': True, 'mensagem': 'Execução concluída com sucesso', 'melhor_rota': melhor_rota})}\n\n"
-            else:
-                yield "data: {'error': 'Carregue uma instância primeiro!'}\n\n"
-        except Exception as e:
-            yield f"data: {{'error': 'Erro no servidor: {str(e)}'}}\n\n"
-
-    return Response(iteracoes(), content_type='text/event-stream')
+
+# Renders one of the job plots, in ?format=png (default) or svg. Images are cached per job, plot type and data
+# version (the number of events the job has published), so asking again while nothing changed costs nothing.
+def send_job_plot(job, plot_type, draw):
+    plot_format = request.args.get('format', 'png')
+    if plot_format not in graficos.FORMATOS:
+        return jsonify({'error': f"Unknown format: {plot_format}"}), 400
+    img = graficos.grafico_job(job.id, plot_type, len(job.eventos), plot_format, lambda: draw(plot_format))
+    return send_file(io.BytesIO(img), mimetype=graficos.FORMATOS[plot_format])
 
 
 @app.route('/plot_iterations_boxplot', methods=['GET'])
 def plot_iterations_boxplot():
     print("[INFO] Generating boxplot for iteration counts.")
+    job, error = job_from_request()
+    if error:
+        return error
+    iteration_counts = list(job.dados.get('iteration_counts') or [])
     if not iteration_counts:
         print("[ERROR] No iteration data available for plotting.")
         return jsonify({'error': 'No iteration data available to plot.'}), 400
 
-    # Create the boxplot
-    plt.figure()
-    plt.boxplot(iteration_counts)
-    plt.title("Boxplot of Iterations Until Convergence")
-    plt.xlabel("Run")
-    plt.ylabel("Number of Iterations")
-
-    # Save the plot to a BytesIO object
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-
     print("[SUCCESS] Boxplot generated and sent.")
-    return send_file(img, mimetype='image/png')
+    return send_job_plot(job, 'boxplot', lambda plot_format: graficos.boxplot_iteracoes(iteration_counts, plot_format))
 
 
 @app.route('/plot_fitness_evolution', methods=['GET'])
 def plot_fitness_evolution():
-    global best_fitnesses, worst_fitnesses, avg_fitnesses
     print("[INFO] Generating fitness evolution plot.")
-    if not best_fitnesses:
+    job, error = job_from_request()
+    if error:
+        return error
+    series = fitness_series(job)
+    if not series['best']:
         print("[ERROR] No fitness data available for plotting.")
         return jsonify({'error': 'No fitness data available to plot.'}), 400
 
-    plt.figure()
-    plt.plot(best_fitnesses, label='Best Fitness')
-    plt.plot(worst_fitnesses, label='Worst Fitness')
-    plt.plot(avg_fitnesses, label='Average Fitness')
-    plt.title("Fitness Evolution Over Time")
-    plt.xlabel("Iteration")
-    plt.ylabel("Fitness")
-    plt.legend()
-
-    # Save the plot to a BytesIO object
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-
     print("[SUCCESS] Fitness evolution plot generated and sent.")
-    return send_file(img, mimetype='image/png')
-
-@app.route('/run_multiple_aco', methods=['GET'])
-def run_multiple_aco():
-    global iteration_counts, best_fitnesses, worst_fitnesses, avg_fitnesses
-
-    # Reset iteration counts
-    iteration_counts.clear()
-
-    alfa = float(request.args.get('alpha', 1))
-    beta = float(request.args.get('beta', 2))
-    evaporacao = float(request.args.get('evaporation', 0.5))
-    Q = float(request.args.get('Q', 10))
-    num_formigas = int(request.args.get('numAnts', 100))
-    num_iteracoes = int(request.args.get('numIterations', 100))
-    num_runs = int(request.args.get('numRuns', 10))  # Number of runs, default to 10
+    return send_job_plot(job, 'fitness', lambda plot_format: graficos.evolucao_fitness(
+        series['best'], series['worst'], series['avg'], plot_format))
 
-    def run_multiple_aco_stream():
-        for run_num in range(num_runs):
-            iteration_counter = 0
-            best_fitnesses.clear()
-            worst_fitnesses.clear()
-            avg_fitnesses.clear()
 
-            for iteracao, fitness, rota_atual in algoritmo_colonia_formigas_sse(
-                    G, problem, best_fitnesses, worst_fitnesses, avg_fitnesses,
-                    alfa=alfa, beta=beta, evaporacao=evaporacao, Q=Q,
-                    num_formigas=num_formigas, num_iteracoes=num_iteracoes):
-                iteration_counter += 1
+# Copy of the fitness history of a job (the solver may still be appending to it)
+def fitness_series(job):
+    n = len(job.dados.get('best_fitnesses') or [])
+    return {
+        'best': list(job.dados.get('best_fitnesses', [])[:n]),
+        'worst': list(job.dados.get('worst_fitnesses', [])[:n]),
+        'avg': list(job.dados.get('avg_fitnesses', [])[:n]),
+        'iteration_counts': list(job.dados.get('iteration_counts') or []),
+    }
 
-            iteration_counts.append(iteration_counter)
-            yield f"data: {json.dumps({'run': run_num + 1, 'iterations': iteration_counter})}\n\n"
-            time.sleep(0.1)
-
-        # Send the final boxplot image after all runs
-        plt.figure()
-        plt.boxplot(iteration_counts)
-        plt.title("Boxplot of Iterations Until Convergence")
-        plt.xlabel("Run")
-        plt.ylabel("Number of Iterations")
-
-        img = io.BytesIO()
-        plt.savefig(img, format='png')
-        img.seek(0)
-        img_url = f"data:image/png;base64,{base64.b64encode(img.getvalue()).decode()}"
-
-        yield f"data: {json.dumps({'final': True, 'message': 'Execução múltipla concluída com sucesso', 'boxplot_url': img_url})}\n\n"
-
-    return Response(run_multiple_aco_stream(), content_type='text/event-stream')
 
+# Raw series behind the plots, for the browser to draw itself
+@app.route('/fitness_data', methods=['GET'])
+def fitness_data():
+    job, error = job_from_request()
+    if error:
+        return error
+    return jsonify(dict(fitness_series(job), version=len(job.eventos), status=job.estado))
 
 
+# Legacy streaming endpoint for multiple runs, backed by a 'multiple' job like /run_aco_sse
+@app.route('/run_multiple_aco', methods=['GET'])
+def run_multiple_aco():
+    try:
+        job = create_job('multiple', request.args)
+    except FilaCheia as e:
+        return Response(f"data: {json.dumps({'error': str(e)})}\n\n", content_type='text/event-stream')
+    except (ValueError, TypeError) as e:
+        error = str(e) if request.args.get('instance') else 'Carregue uma instância primeiro!'
+        return Response(f"data: {json.dumps({'error': error})}\n\n", content_type='text/event-stream')
+    return stream_job(job, **stream_options_from_request())
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
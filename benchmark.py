@@ -0,0 +1,265 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from tsp_solver import obter_instancia, algoritmo_colonia_formigas_sse, calcular_distancias_rotas, \
+    atualizar_feromonios, construir_rotas_vetorizado, obter_heuristica_beta, atualizar_informacao_escolha, \
+    obter_vizinhos
+from instancia_grande import gerar_instancia
+from paralelo import CONTEXTO_PROCESSOS
+
+#Benchmarks do solver sobre as instâncias do TSPLIB que vêm com o projeto, sempre com as mesmas sementes.
+#Cada instância roda uma colônia inteira (em um processo novo, para o pico de memória ser só dela) e mede formigas e
+#iterações por segundo, o tempo mediano de cada fase da iteração, o pico de memória (RSS) e o tempo até a melhor rota
+#ficar a menos de ALVO_PERCENTUAL% do ótimo conhecido. Junto vão micro-benchmarks das partes mais quentes
+#(avaliação das rotas, atualização do feromonio, informação de escolha e construção).
+#O resultado é gravado em JSON e comparado com a baseline guardada: métricas que pioraram mais que o limite contam
+#como regressão, e o script sai com código 1.
+#Uso:
+#   python benchmark.py                      roda, grava benchmark_resultados.json e compara com a baseline
+#   python benchmark.py --salvar-baseline    roda e grava o resultado como a nova baseline
+#   python benchmark.py --rapido             menos iterações e repetições, para conferir rápido
+#   python benchmark.py --grande 50000       gera uma instância aleatória de 50k cidades, carrega no modo de instância
+#                                            grande e roda a colônia, conferindo se o pico de memória ficou dentro de
+#                                            --orcamento-mb (sai com código 1 se passou)
+
+INSTANCIAS = ['dj38.tsp', 'd198.tsp', 'lin318.tsp']
+#ótimos publicados do TSPLIB (com a distância arredondada do TSPLIB, por isso as instâncias carregam com arredondar).
+OTIMOS = {'dj38.tsp': 6656, 'd198.tsp': 15780, 'lin318.tsp': 42029}
+ALVO_PERCENTUAL = 2.0
+SEMENTE = 1
+CONFIGURACAO = dict(estrategia='mmas', evaporacao=0.2, beta=3, num_formigas=25, k_vizinhos=15,
+                    modo_busca_local='melhor')
+NUM_ITERACOES = 100
+NUM_ITERACOES_RAPIDO = 20
+INSTANCIA_MICRO = 'lin318.tsp'
+#instância grande gerada: poucas formigas e iterações, cada iteração com 50k cidades leva alguns segundos.
+CONFIGURACAO_GRANDE = dict(estrategia='mmas', evaporacao=0.2, beta=3, num_formigas=10, k_vizinhos=10)
+NUM_ITERACOES_GRANDE = 5
+ORCAMENTO_GRANDE_MB = 256
+
+ARQUIVO_BASELINE = 'benchmark_baseline.json'
+ARQUIVO_RESULTADOS = 'benchmark_resultados.json'
+LIMITE_REGRESSAO = 0.15 #piorar mais que 15% é regressão.
+#tempos em segundos muito curtos (ex: o alvo do dj38 sai em poucos ms) variam muito em termos relativos, então
+#diferenças menores que isso são ignoradas.
+PISO_SEGUNDOS = 0.005
+
+#métricas em que maior é melhor, as outras (tempos, memória, distância) são menor é melhor.
+MAIOR_MELHOR = ('formigas_por_s', 'iteracoes_por_s', 'rotas_por_s')
+#métricas que só descrevem a execução e não entram na comparação.
+INFORMATIVAS = ('iteracoes', 'alvo_atingido_na_iteracao')
+
+
+#pico de memória do processo em MB (o ru_maxrss vem em KB no Linux e em bytes no macOS).
+def pico_rss_mb():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+#roda dentro de um processo novo: carrega a instância, roda a colônia e mede tudo.
+def benchmark_solver(nome_arquivo, num_iteracoes):
+    inicio_carga = time.perf_counter()
+    G, problem, instancia = obter_instancia(nome_arquivo, arredondar=True)
+    tempo_carga = time.perf_counter() - inicio_carga
+    alvo = OTIMOS[nome_arquivo] * (1 + ALVO_PERCENTUAL / 100)
+
+    tempos = []
+    tempo_ate_alvo, iteracao_alvo = None, None
+    iteracoes, melhor_distancia = 0, None
+    inicio = time.perf_counter()
+    for iteracoes, melhor_distancia, _ in algoritmo_colonia_formigas_sse(
+            G, problem, [], [], [], instancia=instancia, semente=SEMENTE, num_iteracoes=num_iteracoes,
+            tempos=tempos, **CONFIGURACAO):
+        if tempo_ate_alvo is None and melhor_distancia <= alvo:
+            tempo_ate_alvo, iteracao_alvo = time.perf_counter() - inicio, iteracoes
+    tempo_total = time.perf_counter() - inicio
+
+    return {
+        'iteracoes': iteracoes,
+        'tempo_carga_s': tempo_carga,
+        'tempo_total_s': tempo_total,
+        'iteracoes_por_s': iteracoes / tempo_total,
+        'formigas_por_s': iteracoes * CONFIGURACAO['num_formigas'] / tempo_total,
+        'construcao_ms': 1000 * float(np.median([t['construcao'] for t in tempos])),
+        'busca_local_ms': 1000 * float(np.median([t['busca_local'] for t in tempos])),
+        'feromonio_ms': 1000 * float(np.median([t['feromonio'] for t in tempos])),
+        'melhor_distancia': melhor_distancia,
+        'gap_percentual': 100 * (melhor_distancia / OTIMOS[nome_arquivo] - 1),
+        'tempo_ate_alvo_s': tempo_ate_alvo,
+        'alvo_atingido_na_iteracao': iteracao_alvo,
+        'rss_pico_mb': pico_rss_mb(),
+    }
+
+
+#roda dentro de um processo novo: gera a instância, carrega (sem grafo e sem matrizes n x n) e roda a colônia.
+def benchmark_instancia_grande(num_cidades, num_iteracoes):
+    with tempfile.TemporaryDirectory() as pasta:
+        nome_arquivo = gerar_instancia(os.path.join(pasta, f"aleatoria{num_cidades}.tsp"), num_cidades, SEMENTE)
+        inicio_carga = time.perf_counter()
+        _, _, instancia = obter_instancia(nome_arquivo, arredondar=True)
+        tempo_carga = time.perf_counter() - inicio_carga
+
+    tempos = []
+    iteracoes, melhor_distancia = 0, None
+    inicio = time.perf_counter()
+    for iteracoes, melhor_distancia, _ in algoritmo_colonia_formigas_sse(
+            None, None, [], [], [], instancia=instancia, semente=SEMENTE, num_iteracoes=num_iteracoes,
+            tempos=tempos, **CONFIGURACAO_GRANDE):
+        pass
+    tempo_total = time.perf_counter() - inicio
+
+    return {
+        'cidades': num_cidades,
+        'modo_grande': bool(instancia.get('grande')),
+        'iteracoes': iteracoes,
+        'tempo_carga_s': tempo_carga,
+        'tempo_total_s': tempo_total,
+        'formigas_por_s': iteracoes * CONFIGURACAO_GRANDE['num_formigas'] / tempo_total,
+        'construcao_ms': 1000 * float(np.median([t['construcao'] for t in tempos])),
+        'feromonio_ms': 1000 * float(np.median([t['feromonio'] for t in tempos])),
+        'melhor_distancia': melhor_distancia,
+        'rss_pico_mb': pico_rss_mb(),
+    }
+
+
+def rodar_instancia_grande(num_cidades, orcamento_mb, num_iteracoes=NUM_ITERACOES_GRANDE):
+    with ProcessPoolExecutor(max_workers=1, mp_context=CONTEXTO_PROCESSOS) as processo:
+        resultado = processo.submit(benchmark_instancia_grande, num_cidades, num_iteracoes).result()
+    print(f"[INFO] {num_cidades} cidades: {resultado}")
+    if resultado['rss_pico_mb'] > orcamento_mb:
+        print(f"[REGRESSION] Pico de memória de {resultado['rss_pico_mb']:.0f} MB passou do orçamento de "
+              f"{orcamento_mb:.0f} MB.")
+        return 1
+    print(f"[SUCCESS] Pico de memória de {resultado['rss_pico_mb']:.0f} MB dentro do orçamento de {orcamento_mb:.0f} MB.")
+    return 0
+
+
+#menor tempo por chamada entre as repetições (o mínimo é o que menos sofre com ruído da máquina). O número de chamadas
+#por repetição é escolhido pelo timeit para cada repetição durar pelo menos 0,2 s, funções muito rápidas medidas
+#poucas vezes variam demais.
+def medir(funcao, repeticoes):
+    cronometro = timeit.Timer(funcao)
+    numero, _ = cronometro.autorange()
+    return min(cronometro.repeat(repeticoes, numero)) / numero
+
+
+def micro_benchmarks(rapido=False):
+    _, _, instancia = obter_instancia(INSTANCIA_MICRO, arredondar=True)
+    n = len(instancia['cidades'])
+    rng = np.random.default_rng(SEMENTE)
+    num_rotas = 100
+    rotas = np.array([rng.permutation(n) for _ in range(num_rotas)])
+    distancias_rotas = calcular_distancias_rotas(rotas, instancia['distancias'])
+    feromonio = np.ones((n, n))
+    heuristica_beta = obter_heuristica_beta(instancia, CONFIGURACAO['beta'])
+    informacao = atualizar_informacao_escolha(None, feromonio, heuristica_beta, 1)
+    vizinhos = obter_vizinhos(instancia, CONFIGURACAO['k_vizinhos'])
+    repeticoes = 3 if rapido else 7
+
+    resultados = {}
+    tempo = medir(lambda: calcular_distancias_rotas(rotas, instancia['distancias']), repeticoes)
+    resultados['avaliacao_rotas'] = {'tempo_ms': 1000 * tempo, 'rotas_por_s': num_rotas / tempo}
+    tempo = medir(lambda: atualizar_feromonios(feromonio, rotas, distancias_rotas, 0.5, 10), repeticoes)
+    resultados['atualizacao_feromonio'] = {'tempo_ms': 1000 * tempo}
+    tempo = medir(lambda: atualizar_informacao_escolha(informacao, feromonio, heuristica_beta, 1), repeticoes)
+    resultados['informacao_escolha'] = {'tempo_ms': 1000 * tempo}
+    num_formigas = CONFIGURACAO['num_formigas']
+    rng_construcao = np.random.default_rng(SEMENTE)
+    tempo = medir(lambda: construir_rotas_vetorizado(num_formigas, informacao, instancia['heuristica'],
+                                                     rng_construcao, vizinhos), repeticoes)
+    resultados['construcao_vetorizada'] = {'tempo_ms': 1000 * tempo, 'formigas_por_s': num_formigas / tempo}
+    return {f"micro/{nome}": metricas for nome, metricas in resultados.items()}
+
+
+def rodar(rapido=False):
+    num_iteracoes = NUM_ITERACOES_RAPIDO if rapido else NUM_ITERACOES
+    resultados = {}
+    for nome_arquivo in INSTANCIAS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=CONTEXTO_PROCESSOS) as processo:
+            resultados[f"solver/{nome_arquivo}"] = processo.submit(benchmark_solver, nome_arquivo,
+                                                                   num_iteracoes).result()
+        print(f"[INFO] {nome_arquivo}: {resultados[f'solver/{nome_arquivo}']}")
+    resultados.update(micro_benchmarks(rapido))
+    return {
+        'maquina': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'processador': platform.processor() or platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'configuracao': dict(CONFIGURACAO, semente=SEMENTE, num_iteracoes=num_iteracoes,
+                             alvo_percentual=ALVO_PERCENTUAL),
+        'resultados': resultados,
+    }
+
+
+#compara cada métrica com a da baseline e devolve as que pioraram mais que o limite.
+def comparar(atual, baseline, limite=LIMITE_REGRESSAO):
+    regressoes = []
+    if atual['configuracao'] != baseline['configuracao']:
+        print("[WARNING] Configuração diferente da baseline, a comparação pode não fazer sentido.")
+    for caso, metricas in atual['resultados'].items():
+        for metrica, valor in metricas.items():
+            anterior = baseline['resultados'].get(caso, {}).get(metrica)
+            if metrica in INFORMATIVAS or valor is None or anterior is None:
+                if anterior is not None and valor is None and metrica == 'tempo_ate_alvo_s':
+                    regressoes.append(f"{caso} {metrica}: o alvo não foi mais atingido (antes {anterior:.4g})")
+                continue
+            if anterior == 0 or (metrica.endswith('_s') and abs(valor - anterior) < PISO_SEGUNDOS):
+                continue
+            variacao = (valor - anterior) / abs(anterior)
+            piora = -variacao if metrica in MAIOR_MELHOR else variacao
+            if piora > limite:
+                regressoes.append(f"{caso} {metrica}: {anterior:.4g} -> {valor:.4g} ({100 * piora:+.1f}% pior)")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do ACO sobre as instâncias do TSPLIB.")
+    parser.add_argument('--rapido', action='store_true', help="menos iterações e repetições")
+    parser.add_argument('--saida', default=ARQUIVO_RESULTADOS, help="arquivo JSON com o resultado")
+    parser.add_argument('--baseline', default=ARQUIVO_BASELINE, help="baseline para comparar")
+    parser.add_argument('--limite', type=float, default=LIMITE_REGRESSAO,
+                        help="piora relativa a partir da qual uma métrica é regressão (0.15 = 15%%)")
+    parser.add_argument('--salvar-baseline', action='store_true', help="grava o resultado como a nova baseline")
+    parser.add_argument('--grande', type=int, metavar='CIDADES',
+                        help="só roda a instância aleatória desse tamanho no modo de instância grande")
+    parser.add_argument('--orcamento-mb', type=float, default=ORCAMENTO_GRANDE_MB,
+                        help="pico de memória máximo (MB) da instância grande")
+    args = parser.parse_args()
+    if args.grande:
+        return rodar_instancia_grande(args.grande, args.orcamento_mb)
+
+    atual = rodar(args.rapido)
+    destino = args.baseline if args.salvar_baseline else args.saida
+    with open(destino, 'w') as arquivo:
+        json.dump(atual, arquivo, indent=2)
+    print(f"[INFO] Resultado gravado em {destino}.")
+    if args.salvar_baseline:
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"[WARNING] Baseline {args.baseline} não encontrada, nada para comparar.")
+        return 0
+    with open(args.baseline) as arquivo:
+        baseline = json.load(arquivo)
+    regressoes = comparar(atual, baseline, args.limite)
+    for regressao in regressoes:
+        print(f"[REGRESSION] {regressao}")
+    if regressoes:
+        return 1
+    print(f"[SUCCESS] Nenhuma métrica piorou mais que {100 * args.limite:.0f}% em relação à baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+from collections import deque
+import numpy as np
+
+#Busca local aplicada nas rotas das formigas antes do depósito de feromonio: 2-opt e Or-opt.
+#Para cada passo ficar barato:
+# - o ganho de cada movimento é calculado em O(1), só com as arestas que saem e as que entram;
+# - só os vizinhos mais próximos (lista de candidatos) de cada cidade são testados, e a busca para assim que a
+#   aresta nova já fica maior que a aresta que sairia (nenhum vizinho mais longe pode melhorar);
+# - don't-look bits: só as cidades que estão na fila são examinadas, e uma cidade só volta para a fila quando
+#   uma das arestas dela muda. Assim cada passada fica perto de linear no lugar de O(n²).
+
+TOLERANCIA = 1e-10 #ganhos menores que isso são considerados zero (evita loop por erro de arredondamento).
+TAMANHO_MAXIMO_SEGMENTO = 3 #Or-opt move segmentos de 1 até 3 cidades.
+LIMITE_DISTANCIAS_LISTA = 600 #cidades até onde as distâncias da busca local vão em lista (~11 MB por execução).
+
+
+#a busca local é feita em python puro, e indexar um array numpy elemento por elemento é lento (cada acesso cria um
+#escalar numpy). As distâncias vão achatadas, a de i até j na posição i * n + j, em uma destas formas:
+# - até LIMITE_DISTANCIAS_LISTA cidades, uma lista (o acesso mais rápido, mas cada distância vira um float do python,
+#   32 bytes no lugar de 8);
+# - acima disso, um memoryview da própria matriz (a do registro, aberta com mmap), sem cópia nenhuma.
+#Quem chama prepara uma vez por execução e descarta no fim dela, nada fica guardado na instância.
+def preparar_distancias(instancia):
+    planas = np.ascontiguousarray(instancia['distancias'], dtype=np.float64).reshape(-1)
+    return planas.tolist() if len(instancia['cidades']) <= LIMITE_DISTANCIAS_LISTA else memoryview(planas)
+
+
+#Recebe uma rota (índices), as distâncias achatadas (ver preparar_distancias) e a lista de vizinhos de cada cidade,
+#e devolve a rota melhorada (lista) e a distância total dela. Cada cidade é examinada com 2-opt e, se não melhorar,
+#com Or-opt.
+def busca_local(rota, distancias, vizinhos):
+    rota = [int(cidade) for cidade in rota]
+    n = len(rota)
+    if n < 5:
+        return rota, calcular_distancia(rota, distancias)
+    posicao = [0] * n
+    for indice, cidade in enumerate(rota):
+        posicao[cidade] = indice
+
+    fila = deque(rota)
+    na_fila = [True] * n
+    while fila:
+        cidade = fila.popleft()
+        na_fila[cidade] = False
+        alteradas = dois_opt(cidade, rota, posicao, distancias, vizinhos)
+        if not alteradas:
+            alteradas = or_opt(cidade, rota, posicao, distancias, vizinhos)
+        for alterada in alteradas:
+            if not na_fila[alterada]:
+                na_fila[alterada] = True
+                fila.append(alterada)
+    return rota, calcular_distancia(rota, distancias)
+
+
+def calcular_distancia(rota, distancias):
+    n = len(rota)
+    return sum(distancias[rota[i - 1] * n + rota[i]] for i in range(n))
+
+
+#inverte o trecho da rota que vai da posição inicio até a posição fim (andando para frente, de forma circular).
+#Inverter um trecho ou o resto da rota dá o mesmo ciclo, então sempre inverte o menor dos dois.
+def inverter(rota, posicao, inicio, fim):
+    n = len(rota)
+    tamanho = (fim - inicio) % n + 1
+    if tamanho * 2 > n:
+        inicio, fim = (fim + 1) % n, (inicio - 1) % n
+        tamanho = n - tamanho
+    for _ in range(tamanho // 2):
+        a, b = rota[inicio], rota[fim]
+        rota[inicio], rota[fim] = b, a
+        posicao[b], posicao[a] = inicio, fim
+        inicio = (inicio + 1) % n
+        fim = (fim - 1) % n
+
+
+#movimento 2-opt: sai (a, b) e (c, d), entram (a, c) e (b, d). b vem logo depois de a e d logo depois de c (ou os
+#dois logo antes, com a rota lida ao contrário), e o trecho de b até c é invertido.
+def trocar_arestas(rota, posicao, a, b, c, d):
+    if rota[(posicao[a] + 1) % len(rota)] == b:
+        inverter(rota, posicao, posicao[b], posicao[c])
+    else:
+        inverter(rota, posicao, posicao[c], posicao[b])
+
+
+#2-opt: tira duas arestas e reconecta a rota do outro jeito. Para a cidade a, testa as duas arestas dela (com o
+#sucessor e com o antecessor) contra cada vizinho c mais perto que a cidade ligada a a nessa aresta.
+#Devolve as cidades cujas arestas mudaram (vazio se não achou melhora).
+def dois_opt(a, rota, posicao, distancias, vizinhos):
+    n = len(rota)
+    linha_a = a * n
+    for direcao in (1, -1):
+        b = rota[(posicao[a] + direcao) % n]
+        d_ab = distancias[linha_a + b]
+        for c in vizinhos[a]:
+            d_ac = distancias[linha_a + c]
+            if d_ac >= d_ab:
+                break
+            d = rota[(posicao[c] + direcao) % n]
+            if c == b or d == a:
+                continue
+            ganho = d_ab + distancias[c * n + d] - d_ac - distancias[b * n + d]
+            if ganho > TOLERANCIA:
+                trocar_arestas(rota, posicao, a, b, c, d)
+                return (a, b, c, d)
+    return ()
+
+
+#Or-opt: tira um segmento de 1 até 3 cidades que começa em a e coloca entre duas cidades vizinhas de uma das
+#pontas do segmento, na mesma orientação ou invertido.
+def or_opt(a, rota, posicao, distancias, vizinhos):
+    n = len(rota)
+    for tamanho in range(1, TAMANHO_MAXIMO_SEGMENTO + 1):
+        if tamanho + 3 > n:
+            break
+        inicio = posicao[a]
+        primeira = a
+        ultima = rota[(inicio + tamanho - 1) % n]
+        anterior = rota[(inicio - 1) % n]
+        seguinte = rota[(inicio + tamanho) % n]
+        #o quanto a rota diminui tirando o segmento e ligando anterior direto com seguinte.
+        ganho_remocao = (distancias[anterior * n + primeira] + distancias[ultima * n + seguinte] -
+                         distancias[anterior * n + seguinte])
+        if ganho_remocao <= TOLERANCIA:
+            continue
+
+        for ponta, outra_ponta in ((primeira, ultima), (ultima, primeira)):
+            for c in vizinhos[ponta]:
+                d_c_ponta = distancias[c * n + ponta]
+                if d_c_ponta >= ganho_remocao:
+                    break
+                if (posicao[c] - inicio) % n < tamanho:
+                    continue #c está dentro do segmento.
+                #o segmento pode entrar entre c e o sucessor ou entre c e o antecessor dele.
+                for e in (rota[(posicao[c] + 1) % n], rota[(posicao[c] - 1) % n]):
+                    if (posicao[e] - inicio) % n < tamanho:
+                        continue
+                    custo_insercao = d_c_ponta + distancias[outra_ponta * n + e] - distancias[c * n + e]
+                    if ganho_remocao - custo_insercao > TOLERANCIA:
+                        mover_segmento(rota, posicao, anterior, primeira, ultima, seguinte, c, e, ponta)
+                        return (anterior, seguinte, primeira, ultima, c, e)
+    return ()
+
+
+#tira o segmento (de primeira até ultima, entre anterior e seguinte) e coloca entre c e e, com a cidade ponta ao lado
+#de c. São dois ou três movimentos 2-opt (trocar_arestas), que nem o 2-opt só invertem trechos da rota, sem montar ela
+#de novo. Com q logo depois de p na rota (p e q são c e e, em alguma ordem):
+# - sai (anterior, primeira) e (p, q), entram (anterior, p) e (primeira, q);
+# - sai (anterior, p) e (seguinte, ultima), entram (anterior, seguinte) e (p, ultima): o segmento já está entre p e q;
+# - se a ponta que ficou ao lado de c não é a pedida, o segmento é invertido no lugar.
+def mover_segmento(rota, posicao, anterior, primeira, ultima, seguinte, c, e, ponta):
+    p, q = (c, e) if rota[(posicao[c] + 1) % len(rota)] == e else (e, c)
+    trocar_arestas(rota, posicao, anterior, primeira, p, q)
+    trocar_arestas(rota, posicao, anterior, p, seguinte, ultima)
+    if (ponta == ultima) != (c == p):
+        trocar_arestas(rota, posicao, p, ultima, primeira, q)
+
+
+#aplica a busca local em várias rotas (uma por linha) e devolve as rotas e as distâncias já atualizadas.
+#distancias vem do preparar_distancias e vizinhos é a lista de vizinhos de cada cidade (em listas).
+def aplicar_busca_local(rotas, distancias, vizinhos):
+    resultado = [busca_local(rota, distancias, vizinhos) for rota in rotas]
+    return (np.array([rota for rota, _ in resultado], dtype=np.intp),
+            np.array([distancia for _, distancia in resultado], dtype=np.float64))
@@ -0,0 +1,84 @@
+import json
+import os
+import numpy as np
+
+#Checkpoint do estado da colônia em um arquivo .npz (numpy, sem compressão: a matriz de feromonio quase não comprime
+#e assim salvar e carregar é só copiar bytes). O arquivo guarda tudo o que é preciso para continuar a execução do
+#ponto em que parou:
+# - feromonio (n x n), melhor rota (em índices) e melhor distância;
+# - iteração, contador de estagnação e o estado dos geradores aleatórios (o do motor vetorizado e o do escalar,
+#   os dois voltam a sortear exatamente a mesma sequência);
+# - históricos de fitness (melhor, pior e média de cada iteração);
+# - o estado interno da estratégia (ex: limites e contadores do MAX-MIN);
+# - os rótulos das cidades, para não retomar um checkpoint em outra instância (nem com outro formato de feromonio:
+#   n x k no modo de candidatos, n x n fora dele).
+#O arquivo é escrito em um temporário e renomeado, então um processo morto no meio da escrita nunca deixa um
+#checkpoint pela metade no lugar do anterior.
+
+VERSAO = 1
+
+
+def salvar_checkpoint(caminho, estado):
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'wb') as arquivo:
+        np.savez(
+            arquivo,
+            feromonio=estado['feromonio'],
+            melhor_rota=np.asarray(estado['melhor_rota'] if estado['melhor_rota'] is not None else [], dtype=np.intp),
+            cidades=estado['cidades'],
+            best_fitnesses=np.asarray(estado['best_fitnesses'], dtype=np.float64),
+            worst_fitnesses=np.asarray(estado['worst_fitnesses'], dtype=np.float64),
+            avg_fitnesses=np.asarray(estado['avg_fitnesses'], dtype=np.float64),
+            #o resto são escalares e dicionários, vão juntos em um JSON.
+            metadados=np.array(json.dumps({
+                'versao': VERSAO,
+                'iteracao': estado['iteracao'],
+                'melhor_distancia': estado['melhor_distancia'],
+                'stagnation_counter': estado['stagnation_counter'],
+                'reiniciou': estado['reiniciou'],
+                'estrategia': estado['estrategia'],
+                'estado_estrategia': estado['estado_estrategia'],
+                'estado_rng': estado['estado_rng'],
+                'estado_random': estado['estado_random'],
+            })),
+        )
+    os.replace(temporario, caminho)
+
+
+def carregar_checkpoint(caminho):
+    with np.load(caminho) as arquivo:
+        metadados = json.loads(str(arquivo['metadados']))
+        if metadados.get('versao') != VERSAO:
+            raise ValueError(f"Checkpoint {caminho} tem versão {metadados.get('versao')}, esperada {VERSAO}.")
+        melhor_rota = arquivo['melhor_rota']
+        return dict(
+            metadados,
+            feromonio=arquivo['feromonio'],
+            melhor_rota=melhor_rota if melhor_rota.size else None,
+            cidades=arquivo['cidades'],
+            best_fitnesses=arquivo['best_fitnesses'].tolist(),
+            worst_fitnesses=arquivo['worst_fitnesses'].tolist(),
+            avg_fitnesses=arquivo['avg_fitnesses'].tolist(),
+        )
+
+
+#confere se o checkpoint é da mesma instância (mesmas cidades, na mesma ordem) e se o feromonio dele tem o formato
+#do da execução atual (forma_feromonio: n x k no modo de candidatos, n x n fora dele).
+def validar_instancia(estado, instancia, caminho, forma_feromonio):
+    if not np.array_equal(estado['cidades'], instancia['cidades']):
+        raise ValueError(f"Checkpoint {caminho} é de outra instância ({len(estado['cidades'])} cidades, "
+                         f"a instância atual tem {len(instancia['cidades'])}).")
+    if estado['feromonio'].shape != tuple(forma_feromonio):
+        raise ValueError(f"Checkpoint {caminho} tem o feromonio {estado['feromonio'].shape}, a execução atual usa "
+                         f"{tuple(forma_feromonio)} (n x k no modo de candidatos, n x n sem ele).")
+
+
+#estado interno de uma estratégia: os atributos simples (números e booleanos), que são o que muda durante a execução.
+def estado_estrategia(estrategia):
+    return {nome: valor for nome, valor in vars(estrategia).items()
+            if isinstance(valor, (bool, int, float)) and not callable(valor)}
+
+
+def restaurar_estrategia(estrategia, estado):
+    for nome, valor in estado.items():
+        setattr(estrategia, nome, valor)
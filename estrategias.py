@@ -0,0 +1,156 @@
+import numpy as np
+from tsp_solver import atualizar_feromonios, arestas_das_rotas, posicoes_arestas, \
+    obter_comprimento_vizinho_mais_proximo
+
+#Estratégias de atualização do feromonio e de seleção das formigas. Cada estratégia diz:
+# - feromonio_inicial: o valor com que todas as arestas começam;
+# - q0: chance de a formiga ir direto para a melhor cidade no lugar de fazer a roleta (0 = sempre roleta);
+# - atualizacao_local: o que acontece com o feromonio das arestas que as formigas acabaram de percorrer,
+#   durante a construção (None = nada);
+# - atualizar: a atualização do fim da iteração. Ela devolve o fator que multiplicou todas as arestas e as arestas
+#   que receberam algo além disso (None = a matriz toda mudou), que é o que atualizar_informacao_escolha precisa.
+# - reinicio: quantas iterações sem melhora até a estratégia reiniciar o feromonio (0 = nunca reinicia), e reinicios
+#   quantas vezes ela já reiniciou. A parada por estagnação do algoritmo_colonia_formigas_sse só acontece depois de um
+#   reinicio, e a contagem dela recomeça nele;
+# - receber: o depósito de uma rota que veio de outra colônia (modelo de ilhas, ver ilhas.py), sem evaporar nada.
+#   Devolve o mesmo par (fator, arestas) do atualizar.
+#candidatas vem só na instância grande, em que o feromonio é o array esparso das arestas candidatas (ver
+#ArestasCandidatas no tsp_solver.py), e é repassado para as funções que mexem nele.
+
+
+#Ant System, o algoritmo original: todas as formigas depositam Q/distância e todas as arestas evaporam.
+class SistemaFormigas:
+    q0 = 0.0
+    atualizacao_local = None
+    reinicio = 0
+    reinicios = 0
+
+    def __init__(self, instancia, evaporacao, Q, candidatas=None, **_):
+        self.evaporacao = evaporacao
+        self.Q = Q
+        self.candidatas = candidatas
+
+    def feromonio_inicial(self):
+        return 1.0
+
+    def atualizar(self, feromonio, todas_rotas, todas_distancias, melhor_rota, melhor_distancia):
+        atualizar_feromonios(feromonio, todas_rotas, todas_distancias, self.evaporacao, self.Q, self.candidatas)
+        return 1 - self.evaporacao, arestas_das_rotas(todas_rotas)
+
+    def receber(self, feromonio, rota, distancia):
+        atualizar_feromonios(feromonio, [rota], [distancia], 0.0, self.Q, self.candidatas)
+        return 1.0, arestas_das_rotas(rota)
+
+
+#MAX-MIN Ant System: só uma formiga deposita (a melhor da iteração, e a melhor global a cada intervalo_global
+#iterações), o feromonio fica preso entre tau_min e tau_max, começa em tau_max, e volta para tau_max quando a colônia
+#fica reinicio iterações sem melhorar. tau_max = Q / (evaporacao * melhor distância), e tau_min sai de tau_max
+#pela fórmula do Stützle com p_best (a chance de a melhor rota ser construída quando a colônia convergiu).
+class MaxMin:
+    q0 = 0.0
+    atualizacao_local = None
+
+    def __init__(self, instancia, evaporacao, Q, candidatas=None, p_best=0.05, intervalo_global=10, reinicio=50, **_):
+        self.evaporacao = evaporacao
+        self.Q = Q
+        self.candidatas = candidatas
+        self.n = len(instancia['cidades'])
+        self.p_best = p_best
+        self.intervalo_global = intervalo_global
+        self.reinicio = reinicio
+        self.reinicios = 0
+        self.iteracao = 0
+        self.sem_melhora = 0
+        self.melhor_distancia = float('inf')
+        self.definir_limites(obter_comprimento_vizinho_mais_proximo(instancia))
+
+    def definir_limites(self, distancia):
+        self.tau_max = self.Q / (self.evaporacao * distancia)
+        raiz = self.p_best ** (1.0 / self.n)
+        self.tau_min = self.tau_max * (1 - raiz) / ((self.n / 2 - 1) * raiz)
+
+    def feromonio_inicial(self):
+        return self.tau_max
+
+    def atualizar(self, feromonio, todas_rotas, todas_distancias, melhor_rota, melhor_distancia):
+        self.iteracao += 1
+        if melhor_distancia < self.melhor_distancia:
+            self.melhor_distancia = melhor_distancia
+            self.sem_melhora = 0
+            self.definir_limites(melhor_distancia)
+        else:
+            self.sem_melhora += 1
+
+        if self.sem_melhora >= self.reinicio: #estagnou: reinicia a trilha, mas mantém a melhor rota encontrada.
+            self.sem_melhora = 0
+            self.reinicios += 1
+            feromonio.fill(self.tau_max)
+            return 1.0, None
+
+        if self.iteracao % self.intervalo_global == 0:
+            rota, distancia = melhor_rota, melhor_distancia
+        else:
+            melhor_formiga = int(np.argmin(todas_distancias))
+            rota, distancia = todas_rotas[melhor_formiga], todas_distancias[melhor_formiga]
+        atualizar_feromonios(feromonio, [rota], [distancia], self.evaporacao, self.Q, self.candidatas)
+        np.clip(feromonio, self.tau_min, self.tau_max, out=feromonio)
+        return 1.0, None
+
+    #uma rota melhor que a melhor da colônia muda os limites, igual a uma melhora encontrada aqui.
+    def receber(self, feromonio, rota, distancia):
+        if distancia < self.melhor_distancia:
+            self.melhor_distancia = distancia
+            self.sem_melhora = 0
+            self.definir_limites(distancia)
+        atualizar_feromonios(feromonio, [rota], [distancia], 0.0, self.Q, self.candidatas)
+        np.clip(feromonio, self.tau_min, self.tau_max, out=feromonio)
+        return 1.0, None
+
+
+#Ant Colony System: regra pseudo-aleatória proporcional (com chance q0 a formiga vai direto para a melhor cidade),
+#atualização local (cada aresta percorrida perde um pouco de feromonio, puxando para tau0, o que espalha as formigas)
+#e atualização global só nas arestas da melhor rota encontrada até agora, sem evaporar o resto da matriz.
+class SistemaColoniaFormigas:
+    reinicio = 0
+    reinicios = 0
+
+    def __init__(self, instancia, evaporacao, Q, candidatas=None, q0=0.9, xi=0.1, **_):
+        self.evaporacao = evaporacao
+        self.Q = Q
+        self.candidatas = candidatas
+        self.q0 = q0
+        self.xi = xi
+        self.tau0 = Q / (len(instancia['cidades']) * obter_comprimento_vizinho_mais_proximo(instancia))
+
+    def feromonio_inicial(self):
+        return self.tau0
+
+    #as duas posições de cada aresta ([origem, destino] e [destino, origem]) têm o mesmo valor, então atualizar as duas
+    #a partir do valor atual mantém o feromonio simétrico.
+    def atualizacao_local(self, feromonio, origens, destinos):
+        posicoes = posicoes_arestas(feromonio, origens, destinos, self.candidatas)
+        feromonio.flat[posicoes] = (1 - self.xi) * feromonio.flat[posicoes] + self.xi * self.tau0
+
+    def atualizar(self, feromonio, todas_rotas, todas_distancias, melhor_rota, melhor_distancia):
+        return self.receber(feromonio, melhor_rota, melhor_distancia)
+
+    #a rota recebida passa pela mesma atualização global da melhor rota.
+    def receber(self, feromonio, rota, distancia):
+        origens, destinos = arestas_das_rotas(rota)
+        posicoes = posicoes_arestas(feromonio, origens, destinos, self.candidatas)
+        feromonio.flat[posicoes] = ((1 - self.evaporacao) * feromonio.flat[posicoes] +
+                                    self.evaporacao * self.Q / distancia)
+        return 1.0, (origens, destinos)
+
+
+ESTRATEGIAS = {
+    'as': SistemaFormigas,
+    'mmas': MaxMin,
+    'acs': SistemaColoniaFormigas,
+}
+
+
+def criar_estrategia(nome, instancia, evaporacao, Q, candidatas=None, **parametros):
+    if nome not in ESTRATEGIAS:
+        raise ValueError(f"Estratégia desconhecida: {nome}. Use uma de {', '.join(ESTRATEGIAS)}.")
+    return ESTRATEGIAS[nome](instancia, evaporacao, Q, candidatas, **parametros)
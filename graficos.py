@@ -0,0 +1,81 @@
+import io
+import threading
+import time
+from collections import OrderedDict
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from metricas import registro
+
+#Gráficos de fitness e de iterações. Cada gráfico é uma Figure própria (API orientada a objetos do matplotlib), sem
+#passar pelo estado global do pyplot: duas requisições ao mesmo tempo não desenham uma na figura da outra, e a figura
+#some junto com a função, sem precisar de plt.close.
+#As imagens prontas ficam num cache LRU, com chave (job, tipo do gráfico, versão dos dados, formato): enquanto os dados
+#do job não mudam, pedir o gráfico de novo não rasteriza nada.
+
+FORMATOS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+MAX_GRAFICOS_CACHE = 64
+
+
+class CacheGraficos:
+    def __init__(self, max_itens=MAX_GRAFICOS_CACHE):
+        self.max_itens = max_itens
+        self.itens = OrderedDict()
+        self.trava = threading.Lock()
+
+    #devolve a imagem da chave, gerando com gerar() se ainda não estiver no cache. A geração fica fora da trava, então
+    #gráficos diferentes são desenhados ao mesmo tempo (o mesmo gráfico pedido junto pode ser desenhado duas vezes).
+    def obter(self, chave, gerar):
+        with self.trava:
+            if chave in self.itens:
+                self.itens.move_to_end(chave)
+                return self.itens[chave]
+        imagem = gerar()
+        with self.trava:
+            self.itens[chave] = imagem
+            self.itens.move_to_end(chave)
+            while len(self.itens) > self.max_itens:
+                self.itens.popitem(last=False)
+        return imagem
+
+
+cache = CacheGraficos()
+
+
+def salvar(figura, formato):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconhecido: {formato}. Use um de {', '.join(FORMATOS)}.")
+    inicio = time.perf_counter()
+    FigureCanvasAgg(figura)
+    img = io.BytesIO()
+    figura.savefig(img, format=formato)
+    registro.somar('plot_render_seconds_total', time.perf_counter() - inicio, format=formato)
+    registro.somar('plots_rendered_total', format=formato)
+    return img.getvalue()
+
+
+def boxplot_iteracoes(iteration_counts, formato='png'):
+    figura = Figure()
+    eixo = figura.add_subplot()
+    eixo.boxplot(iteration_counts)
+    eixo.set_title("Boxplot of Iterations Until Convergence")
+    eixo.set_xlabel("Run")
+    eixo.set_ylabel("Number of Iterations")
+    return salvar(figura, formato)
+
+
+def evolucao_fitness(best_fitnesses, worst_fitnesses, avg_fitnesses, formato='png'):
+    figura = Figure()
+    eixo = figura.add_subplot()
+    eixo.plot(best_fitnesses, label='Best Fitness')
+    eixo.plot(worst_fitnesses, label='Worst Fitness')
+    eixo.plot(avg_fitnesses, label='Average Fitness')
+    eixo.set_title("Fitness Evolution Over Time")
+    eixo.set_xlabel("Iteration")
+    eixo.set_ylabel("Fitness")
+    eixo.legend()
+    return salvar(figura, formato)
+
+
+#gráfico de um job, pelo cache. versao identifica o estado dos dados (muda sempre que o job publica um evento).
+def grafico_job(job_id, tipo, versao, formato, gerar):
+    return cache.obter((job_id, tipo, versao, formato), gerar)
@@ -0,0 +1,220 @@
+from multiprocessing.connection import wait
+import time
+import numpy as np
+from tsp_solver import obter_instancia, algoritmo_colonia_formigas_sse
+from paralelo import CONTEXTO_PROCESSOS #cada ilha roda em um processo separado (sem disputar o GIL)
+
+#Modelo de ilhas: várias colônias independentes, cada uma no seu processo, com sementes diferentes (e, se quiser,
+#alfa e beta diferentes por ilha), que de tempos em tempos trocam as melhores rotas. Uma colônia só costuma convergir
+#para uma região do espaço de busca, e colocar mais formigas nela não muda isso; ilhas separadas exploram regiões
+#diferentes e a migração leva as boas rotas de uma para as outras.
+# - a cada intervalo iterações todas as ilhas param no mesmo ponto (uma migração): cada uma manda ao processo
+#   principal a sua melhor rota (e no modo 'feromonio' o feromonio que tem nas arestas dela) e recebe de volta a melhor
+#   rota entre as das ilhas vizinhas, quando ela é melhor que a sua (ver a migração no algoritmo_colonia_formigas_sse);
+# - a topologia diz de quem cada ilha recebe: 'anel' (da ilha anterior) ou 'completa' (de todas as outras);
+# - as mensagens são pequenas, O(n) por ilha em cada migração (uma rota e, no modo 'feromonio', n valores), nunca a
+#   matriz de feromonio inteira;
+# - o processo principal acompanha a melhor rota global e devolve um evento a cada iteração de cada ilha.
+#Ilhas que param antes (estagnação, prazo, alvo) saem das migrações seguintes, e quando a melhor rota global chega na
+#distância alvo todas param.
+#As formigas de cada ilha são construídas no processo da ilha (num_workers = 1), o paralelismo aqui são as ilhas.
+#Com prazo_final (instante em time.time()), as ilhas rodam ao mesmo tempo, então cada uma tem até ele inteiro, e o
+#tempo para começar (processo novo, carga da instância) conta nele. Uma ilha que chegaria depois dele nem começa: fica
+#de fora, com 'pulada' no resultado.
+
+TOPOLOGIAS = ('anel', 'completa')
+MODOS_MIGRACAO = ('rota', 'feromonio')
+
+
+#ilhas de quem cada ilha recebe, entre as que participam da migração (em ordem).
+def vizinhas(topologia, ilhas):
+    if topologia == 'anel':
+        return {ilha: [ilhas[posicao - 1]] for posicao, ilha in enumerate(ilhas)}
+    return {ilha: [outra for outra in ilhas if outra != ilha] for ilha in ilhas}
+
+
+#Lado da ilha da migração (o migracao do algoritmo_colonia_formigas_sse): manda a melhor rota e espera as rotas
+#recebidas. Se no lugar delas vier None, o processo principal mandou parar.
+class Migracao:
+    def __init__(self, conexao, intervalo, modo, peso):
+        self.conexao = conexao
+        self.intervalo = intervalo
+        self.modo = modo
+        self.peso = peso
+        self.parar = False
+
+    def trocar(self, iteracao, melhor_rota, melhor_distancia, valores):
+        self.conexao.send(('migracao', iteracao, np.asarray(melhor_rota).astype(np.uint32), melhor_distancia,
+                           valores))
+        recebidas = self.conexao.recv()
+        if recebidas is None:
+            self.parar = True
+            return []
+        return recebidas
+
+
+#Processo de uma ilha: roda a colônia e manda ao processo principal cada iteração (a rota, com os rótulos das
+#cidades, só quando a melhor da ilha melhora) e, no fim, o motivo da parada e os históricos de fitness.
+def executar_ilha(conexao, caminho, arredondar, semente, parametros, intervalo, modo, peso, prazo_final=None):
+    migracao = Migracao(conexao, intervalo, modo, peso)
+    best_fitnesses, worst_fitnesses, avg_fitnesses = [], [], []
+    parada = {}
+    iteracoes, melhor_distancia = 0, float('inf')
+    try:
+        G, problem, instancia = obter_instancia(caminho, arredondar)
+        if prazo_final is not None:
+            parametros['prazo_ms'] = 1000 * (prazo_final - time.time())
+            if parametros['prazo_ms'] <= 0:
+                conexao.send(('pulada',))
+                return
+        solver = algoritmo_colonia_formigas_sse(G, problem, best_fitnesses, worst_fitnesses, avg_fitnesses,
+                                                instancia=instancia, semente=semente, parada=parada,
+                                                migracao=migracao, **parametros)
+        try:
+            for iteracoes, distancia, rota in solver:
+                conexao.send(('iteracao', iteracoes, distancia, rota if distancia < melhor_distancia else None))
+                melhor_distancia = min(melhor_distancia, distancia)
+                if migracao.parar or conexao.poll(): #a única mensagem que chega fora da migração é a de parar.
+                    break
+        finally:
+            solver.close()
+        #na parada por estagnação a última iteração não chega a ser devolvida, as iterações feitas vêm do parada.
+        conexao.send(('fim', parada.get('motivo'), parada.get('iteracoes', iteracoes), melhor_distancia,
+                      best_fitnesses, worst_fitnesses, avg_fitnesses))
+    except Exception as e:
+        conexao.send(('erro', str(e)))
+    finally:
+        conexao.close()
+
+
+#Roda num_ilhas colônias com migração e devolve, a cada iteração de cada ilha, um evento (dict) com a ilha, a
+#iteração dela, a melhor distância dela e a melhor distância global ('melhor_rota' com os rótulos das cidades só
+#quando a melhor global melhora), e a cada migração um evento com 'migracao' (a iteração), a melhor distância de cada
+#ilha e quantas receberam uma rota. parametros vão para todas as ilhas (os mesmos do algoritmo_colonia_formigas_sse)
+#e parametros_ilhas, se vier, é uma lista com o que muda em cada ilha (ex: [{'alfa': 1}, {'alfa': 2}]).
+#Se vier, resultado recebe a melhor rota e distância globais, a ilha que achou, o motivo da parada e o resultado de
+#cada ilha (iterações, motivo da parada, melhor distância e históricos de fitness).
+def algoritmo_ilhas(caminho, arredondar=False, num_ilhas=4, intervalo=10, topologia='anel', modo='rota', peso=0.5,
+                    semente=None, parametros_ilhas=None, resultado=None, prazo_final=None, **parametros):
+    if topologia not in TOPOLOGIAS:
+        raise ValueError(f"Topologia desconhecida: {topologia}. Use uma de {', '.join(TOPOLOGIAS)}.")
+    if modo not in MODOS_MIGRACAO:
+        raise ValueError(f"Migração desconhecida: {modo}. Use uma de {', '.join(MODOS_MIGRACAO)}.")
+    if num_ilhas < 1 or intervalo < 1:
+        raise ValueError("O número de ilhas e o intervalo de migração têm que ser pelo menos 1.")
+    if not 0 < peso <= 1:
+        raise ValueError("O peso da migração de feromonio tem que estar entre 0 (exclusive) e 1.")
+    parametros['num_workers'] = 1
+    distancia_alvo = parametros.get('distancia_alvo')
+    #uma semente por ilha, derivada da semente pedida (ou de entropia nova quando não vem nenhuma).
+    sementes = np.random.SeedSequence(semente).generate_state(num_ilhas)
+
+    conexoes = [] #None no lugar das ilhas que nem começaram (puladas).
+    processos = []
+    finais = {}
+    try:
+        for ilha, semente_ilha in enumerate(sementes):
+            if prazo_final is not None and prazo_final <= time.time():
+                finais[ilha] = ilha_pulada(ilha)
+                conexoes.append(None)
+                continue
+            conexao, conexao_ilha = CONTEXTO_PROCESSOS.Pipe()
+            parametros_ilha = dict(parametros, **(parametros_ilhas[ilha] if parametros_ilhas else {}))
+            processo = CONTEXTO_PROCESSOS.Process(
+                target=executar_ilha, daemon=True,
+                args=(conexao_ilha, caminho, arredondar, int(semente_ilha), parametros_ilha, intervalo, modo, peso,
+                      prazo_final))
+            processo.start()
+            conexao_ilha.close()
+            conexoes.append(conexao)
+            processos.append(processo)
+
+        ativas = set(range(num_ilhas)) - set(finais)
+        pendentes = {} #ilha -> (rota, distância, valores) mandados na migração em andamento.
+        iteracao_migracao = None
+        parando = False
+        melhor_distancia, melhor_rota, melhor_ilha = float('inf'), None, None
+        motivo = 'iteracoes'
+        while ativas:
+            for conexao in wait([conexoes[ilha] for ilha in sorted(ativas)]):
+                ilha = conexoes.index(conexao)
+                try:
+                    mensagem = conexao.recv()
+                except EOFError:
+                    raise RuntimeError(f"A ilha {ilha} terminou sem avisar.")
+
+                if mensagem[0] == 'iteracao':
+                    _, iteracao, distancia, rota = mensagem
+                    evento = {'ilha': ilha, 'iteracao': iteracao, 'distancia': distancia}
+                    if distancia < melhor_distancia:
+                        melhor_distancia, melhor_rota, melhor_ilha = distancia, rota, ilha
+                        evento['melhor_rota'] = rota
+                    evento['melhor_distancia'] = melhor_distancia
+                    yield evento
+                    if distancia_alvo is not None and melhor_distancia <= distancia_alvo and not parando:
+                        parando, motivo = True, 'alvo'
+                        pendentes.clear()
+                        for outra in ativas:
+                            mandar_parar(conexoes[outra])
+                elif mensagem[0] == 'migracao':
+                    if not parando: #parando, a ilha já recebe (ou já recebeu) o None no lugar das rotas.
+                        iteracao_migracao, pendentes[ilha] = mensagem[1], mensagem[2:]
+                elif mensagem[0] == 'fim':
+                    _, motivo_ilha, iteracoes, distancia, best_fitnesses, worst_fitnesses, avg_fitnesses = mensagem
+                    finais[ilha] = {'ilha': ilha, 'pulada': False, 'iteracoes': iteracoes,
+                                    'motivo_parada': motivo_ilha or motivo, 'melhor_distancia': distancia,
+                                    'best_fitnesses': best_fitnesses, 'worst_fitnesses': worst_fitnesses,
+                                    'avg_fitnesses': avg_fitnesses}
+                    if not parando:
+                        motivo = finais[ilha]['motivo_parada']
+                    ativas.discard(ilha)
+                elif mensagem[0] == 'pulada':
+                    finais[ilha] = ilha_pulada(ilha)
+                    ativas.discard(ilha)
+                else:
+                    raise RuntimeError(f"Erro na ilha {ilha}: {mensagem[1]}")
+
+            #a migração acontece quando todas as ilhas que ainda estão rodando chegaram nela.
+            if pendentes and ativas <= set(pendentes):
+                yield migrar(iteracao_migracao, pendentes, topologia, conexoes)
+                pendentes.clear()
+    finally:
+        conexoes_abertas = [conexao for conexao in conexoes if conexao is not None]
+        for conexao in conexoes_abertas:
+            mandar_parar(conexao)
+        for processo in processos:
+            processo.join(timeout=5)
+            if processo.is_alive():
+                processo.terminate()
+        for conexao in conexoes_abertas:
+            conexao.close()
+
+    if resultado is not None:
+        resultado.update(melhor_distancia=melhor_distancia, melhor_rota=melhor_rota, melhor_ilha=melhor_ilha,
+                         motivo=motivo, ilhas=[finais[ilha] for ilha in sorted(finais)])
+
+
+#resultado de uma ilha que não começou porque o prazo já tinha acabado (melhor_distancia None, sem históricos).
+def ilha_pulada(ilha):
+    return {'ilha': ilha, 'pulada': True, 'iteracoes': 0, 'motivo_parada': 'prazo', 'melhor_distancia': None,
+            'best_fitnesses': [], 'worst_fitnesses': [], 'avg_fitnesses': []}
+
+
+#uma ilha que já terminou (e só falta ler o 'fim' dela) já fechou a conexão.
+def mandar_parar(conexao):
+    try:
+        conexao.send(None)
+    except (BrokenPipeError, OSError):
+        pass
+
+
+#manda a cada ilha a melhor rota entre as das vizinhas dela, quando é melhor que a sua (senão uma lista vazia).
+def migrar(iteracao, pendentes, topologia, conexoes):
+    trocas = 0
+    for ilha, origens in vizinhas(topologia, sorted(pendentes)).items():
+        rota, distancia, valores = pendentes[min(origens, key=lambda origem: pendentes[origem][1])]
+        recebidas = [(rota, distancia, valores)] if distancia < pendentes[ilha][1] else []
+        conexoes[ilha].send(recebidas)
+        trocas += len(recebidas)
+    return {'migracao': iteracao, 'distancias': {ilha: pendentes[ilha][1] for ilha in sorted(pendentes)},
+            'trocas': trocas}
@@ -0,0 +1,146 @@
+import numpy as np
+
+try: #KD-tree do scipy para achar a cidade livre mais próxima sem olhar todas as cidades.
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+#Modo de instância grande (dezenas de milhares de cidades). O carregamento normal monta o grafo completo no networkx e
+#as matrizes n x n de distância e heurística, e com 10k cidades isso já são 50M arestas, que não cabem na memória.
+#Aqui o arquivo .tsp é lido direto para arrays numpy (só as coordenadas, sem o tsplib95), nada n x n é criado e:
+# - as distâncias são calculadas na hora, a partir das coordenadas, só para os pares que forem pedidos;
+# - cada cidade guarda só os k vizinhos mais próximos e a distância até eles (n x k);
+# - o feromonio e a informação de escolha ficam só nas arestas candidatas, em arrays n x k alinhados com os vizinhos
+#   (ver ArestasCandidatas no tsp_solver.py).
+#Assim a memória da instância e da colônia fica O(n·k) (mais O(formigas·n) das rotas sendo construídas).
+
+#instâncias com mais cidades que isso são carregadas no modo grande quando o modo não é escolhido.
+LIMITE_INSTANCIA_DENSA = 2000
+#tipos de distância do TSPLIB que dá para calcular só com as coordenadas (com arredondar). Sem arredondar, a distância
+#é a euclidiana das coordenadas, igual ao modo normal.
+TIPOS_DISTANCIA = ('EUC_2D', 'CEIL_2D', 'ATT')
+#quantos vizinhos a KD-tree devolve quando a formiga não tem candidato livre (primeiro poucos, depois mais para as
+#formigas que não acharam nenhum livre), antes de olhar todas as cidades.
+K_BUSCA_ARVORE = (64, 1024)
+#quantidade de cidades por bloco quando a distância de várias cidades para todas as outras é calculada de uma vez,
+#para o bloco (cidades x n) não passar de alguns MB.
+ELEMENTOS_POR_BLOCO = 2 ** 21
+
+
+#lê o cabeçalho do .tsp (as linhas "CHAVE : valor" até a seção de coordenadas). Devolve o cabeçalho e o arquivo
+#aberto, parado no começo da NODE_COORD_SECTION (ou no fim, se não houver coordenadas).
+def ler_cabecalho(arquivo):
+    cabecalho = {}
+    while True:
+        linha = arquivo.readline()
+        if not linha or linha.strip() in ('NODE_COORD_SECTION', 'EOF'):
+            return cabecalho
+        if ':' in linha:
+            chave, valor = linha.split(':', 1)
+            cabecalho[chave.strip().upper()] = valor.strip()
+
+
+def dimensao_do_arquivo(nome_arquivo):
+    with open(nome_arquivo) as arquivo:
+        return int(ler_cabecalho(arquivo).get('DIMENSION', 0))
+
+
+#cabeçalho, rótulos das cidades e coordenadas (n x 2) de um .tsp com NODE_COORD_SECTION.
+def ler_coordenadas(nome_arquivo):
+    with open(nome_arquivo) as arquivo:
+        cabecalho = ler_cabecalho(arquivo)
+        if 'DIMENSION' not in cabecalho:
+            raise ValueError(f"{nome_arquivo} não tem DIMENSION no cabeçalho.")
+        dimensao = int(cabecalho['DIMENSION'])
+        linhas = np.loadtxt(arquivo, max_rows=dimensao, ndmin=2)
+    if linhas.shape != (dimensao, 3):
+        raise ValueError(f"{nome_arquivo} não tem as {dimensao} coordenadas 2D na NODE_COORD_SECTION.")
+    return cabecalho, linhas[:, 0].astype(np.int64), linhas[:, 1:].copy()
+
+
+#arredonda distâncias euclidianas do jeito do tipo de distância do TSPLIB (None = sem arredondar).
+def arredondar_distancias(distancias, tipo):
+    if tipo == 'EUC_2D':
+        return np.floor(distancias + 0.5) #nint do TSPLIB.
+    if tipo == 'CEIL_2D':
+        return np.ceil(distancias)
+    if tipo == 'ATT': #pseudo-euclidiana: raiz de (dx² + dy²) / 10, arredondada para cima quando o nint fica abaixo.
+        reais = distancias / np.sqrt(10.0)
+        inteiras = np.floor(reais + 0.5)
+        return inteiras + (inteiras < reais)
+    return distancias
+
+
+#distância entre cada origem e o destino correspondente (arrays de índices de qualquer formato, o mesmo para os dois).
+def distancias_pares(instancia, origens, destinos):
+    coordenadas = instancia['coordenadas']
+    diferencas = coordenadas[origens] - coordenadas[destinos]
+    distancias = np.sqrt(np.einsum('...i,...i->...', diferencas, diferencas))
+    return arredondar_distancias(distancias, instancia['tipo_distancia'])
+
+
+#mesma conta do calcular_distancias_rotas (uma rota por linha), com as distâncias tiradas das coordenadas.
+def distancias_rotas(instancia, rotas):
+    return distancias_pares(instancia, rotas, np.roll(rotas, -1, axis=1)).sum(axis=1)
+
+
+#Para cada formiga, a cidade não visitada mais próxima da cidade atual dela (usada quando nenhum vizinho candidato
+#está livre). Primeiro procura entre os vizinhos mais próximos pela KD-tree (guardada na instância), e só as formigas
+#que não acharam nenhum livre ali olham todas as cidades, em O(n).
+def cidades_mais_proximas(instancia, atuais, visitadas):
+    coordenadas = instancia['coordenadas']
+    proximas = np.empty(len(atuais), dtype=np.intp)
+    pendentes = np.arange(len(atuais))
+    if cKDTree is not None and 'arvore' not in instancia:
+        instancia['arvore'] = cKDTree(coordenadas)
+    for k in K_BUSCA_ARVORE if cKDTree is not None else ():
+        if not pendentes.size or k >= len(coordenadas):
+            break
+        _, perto = instancia['arvore'].query(coordenadas[atuais[pendentes]], k=k)
+        livres = ~visitadas[pendentes[:, None], perto]
+        achadas = livres.any(axis=1)
+        proximas[pendentes[achadas]] = perto[achadas, np.argmax(livres[achadas], axis=1)]
+        pendentes = pendentes[~achadas]
+    atuais, visitadas = atuais[pendentes], visitadas[pendentes]
+    bloco = max(1, ELEMENTOS_POR_BLOCO // len(coordenadas))
+    for inicio in range(0, len(atuais), bloco):
+        fim = inicio + bloco
+        diferencas = coordenadas[None, :, :] - coordenadas[atuais[inicio:fim], None, :]
+        quadrados = np.einsum('fni,fni->fn', diferencas, diferencas)
+        quadrados[visitadas[inicio:fim]] = np.inf
+        proximas[pendentes[inicio:fim]] = np.argmin(quadrados, axis=1)
+    return proximas
+
+
+#Instância grande a partir do arquivo: mesmas chaves do construir_matrizes (cidades, indices, coordenadas, vizinhos),
+#mas no lugar de 'distancias' e 'heuristica' (n x n) tem 'distancias_vizinhos' (n x k, a distância até cada vizinho)
+#e 'tipo_distancia', usado para calcular as outras distâncias na hora.
+def construir_instancia_grande(nome_arquivo, arredondar, k, calcular_vizinhos):
+    cabecalho, cidades, coordenadas = ler_coordenadas(nome_arquivo)
+    tipo = cabecalho.get('EDGE_WEIGHT_TYPE') if arredondar else None
+    if tipo is not None and tipo not in TIPOS_DISTANCIA:
+        raise ValueError(f"Distância {tipo} não é suportada no modo de instância grande, "
+                         f"use uma de {', '.join(TIPOS_DISTANCIA)} ou sem arredondar.")
+    instancia = {
+        'grande': True,
+        'cidades': cidades,
+        'indices': {int(cidade): indice for indice, cidade in enumerate(cidades.tolist())},
+        'coordenadas': coordenadas,
+        'tipo_distancia': tipo,
+        'vizinhos': calcular_vizinhos(coordenadas, k),
+    }
+    instancia['distancias_vizinhos'] = distancias_pares(
+        instancia, np.arange(len(cidades))[:, None], instancia['vizinhos'])
+    return instancia
+
+
+#Gera uma instância EUC_2D com n cidades espalhadas de forma uniforme num quadrado, no formato do TSPLIB (para testar
+#o modo grande sem precisar baixar instâncias enormes).
+def gerar_instancia(caminho, n, semente=0, lado=1000000):
+    coordenadas = np.random.default_rng(semente).integers(0, lado, size=(n, 2))
+    with open(caminho, 'w') as arquivo:
+        arquivo.write(f"NAME: aleatoria{n}\nTYPE: TSP\nCOMMENT: {n} cidades uniformes (semente {semente})\n"
+                      f"DIMENSION: {n}\nEDGE_WEIGHT_TYPE: EUC_2D\nNODE_COORD_SECTION\n")
+        np.savetxt(arquivo, np.column_stack([np.arange(1, n + 1), coordenadas]), fmt='%d')
+        arquivo.write("EOF\n")
+    return caminho
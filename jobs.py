@@ -0,0 +1,140 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+#Gerenciador de jobs: cada execução do algoritmo vira um job com um id, que roda em um pool de threads em segundo
+#plano, fora da thread da requisição HTTP. O job guarda a própria instância, os próprios resultados e a lista de
+#eventos que produziu, então várias abas ou clientes podem rodar ao mesmo tempo sem um pisar no outro, e um cliente
+#que cair pode se reconectar e receber de novo os eventos a partir do último que viu (Last-Event-ID).
+
+NA_FILA = 'na_fila'
+EXECUTANDO = 'executando'
+CONCLUIDO = 'concluido'
+CANCELADO = 'cancelado'
+ERRO = 'erro'
+ESTADOS_FINAIS = (CONCLUIDO, CANCELADO, ERRO)
+
+
+class FilaCheia(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, tipo, funcao, parametros):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.parametros = parametros
+        self.funcao = funcao
+        self.estado = NA_FILA
+        self.eventos = [] #o id de cada evento é a posição dele na lista + 1.
+        self.dados = {} #resultados do job (melhor rota, históricos de fitness...), preenchidos pela função.
+        self.condicao = threading.Condition()
+        self.cancelamento = threading.Event()
+        self.futuro = None
+        self.criado_em = time.perf_counter() #prazos pedidos pelo cliente contam a partir daqui, fila inclusa.
+
+    #a função do job é um gerador de eventos (dicts), e cada evento novo acorda quem está esperando.
+    def publicar(self, evento):
+        with self.condicao:
+            self.eventos.append(evento)
+            self.condicao.notify_all()
+
+    def finalizar(self, estado):
+        with self.condicao:
+            self.estado = estado
+            self.condicao.notify_all()
+
+    @property
+    def terminado(self):
+        return self.estado in ESTADOS_FINAIS
+
+    #espera até ter evento depois de ultimo_id, o job terminar ou o tempo acabar, e devolve os eventos novos
+    #(pares id, evento) e se o job já terminou.
+    def aguardar(self, ultimo_id, timeout=None):
+        with self.condicao:
+            if len(self.eventos) <= ultimo_id and not self.terminado:
+                self.condicao.wait(timeout)
+            novos = list(enumerate(self.eventos[ultimo_id:], start=ultimo_id + 1))
+            return novos, self.terminado
+
+    def resumo(self):
+        return {
+            'job_id': self.id,
+            'type': self.tipo,
+            'status': self.estado,
+            'events': len(self.eventos),
+            'parameters': self.parametros,
+        }
+
+
+class GerenciadorJobs:
+    #max_simultaneos jobs rodam ao mesmo tempo, até max_fila esperam na fila, e além disso a criação é recusada.
+    #Dos jobs já terminados, os max_retidos mais recentes continuam disponíveis para consulta.
+    def __init__(self, max_simultaneos=8, max_fila=32, max_retidos=100):
+        self.executor = ThreadPoolExecutor(max_workers=max_simultaneos, thread_name_prefix='job')
+        self.max_simultaneos = max_simultaneos
+        self.max_fila = max_fila
+        self.max_retidos = max_retidos
+        self.jobs = OrderedDict()
+        self.trava = threading.Lock()
+
+    def criar(self, tipo, funcao, parametros):
+        job = Job(tipo, funcao, parametros)
+        with self.trava:
+            ativos = sum(1 for outro in self.jobs.values() if not outro.terminado)
+            if ativos >= self.max_simultaneos + self.max_fila:
+                raise FilaCheia(f"Limite de {self.max_simultaneos + self.max_fila} jobs ativos atingido.")
+            self.jobs[job.id] = job
+            self.descartar_antigos()
+        job.futuro = self.executor.submit(self.executar, job)
+        return job
+
+    def obter(self, job_id):
+        with self.trava:
+            return self.jobs.get(job_id)
+
+    def cancelar(self, job_id):
+        job = self.obter(job_id)
+        if job is None:
+            return None
+        job.cancelamento.set()
+        if job.futuro is not None and job.futuro.cancel(): #ainda estava na fila, nem chegou a começar.
+            job.publicar({'cancelled': True, 'mensagem': 'Execução cancelada'})
+            job.finalizar(CANCELADO)
+        return job
+
+    #quantos jobs existem em cada estado (para as métricas).
+    def contar_estados(self):
+        with self.trava:
+            estados = [job.estado for job in self.jobs.values()]
+        return {estado: estados.count(estado) for estado in (NA_FILA, EXECUTANDO) + ESTADOS_FINAIS}
+
+    #tira os jobs terminados mais antigos quando passa de max_retidos (chamado com a trava).
+    def descartar_antigos(self):
+        terminados = [job_id for job_id, job in self.jobs.items() if job.terminado]
+        for job_id in terminados[:max(0, len(terminados) - self.max_retidos)]:
+            del self.jobs[job_id]
+
+    #roda a função do job publicando cada evento, e entre um evento e outro confere se o job foi cancelado.
+    #Fechar o gerador roda os finally dele, então pools de processos e memória compartilhada são liberados.
+    #A função também pode olhar o job.cancelamento enquanto espera e terminar sozinha (sem o evento final).
+    def executar(self, job):
+        job.estado = EXECUTANDO
+        gerador = job.funcao(job)
+        try:
+            for evento in gerador:
+                job.publicar(evento)
+                if job.cancelamento.is_set():
+                    gerador.close()
+                    break
+        except Exception as e:
+            job.publicar({'error': f'Erro no servidor: {str(e)}'})
+            job.finalizar(ERRO)
+            return
+        if job.cancelamento.is_set():
+            job.publicar({'cancelled': True, 'mensagem': 'Execução cancelada'})
+            job.finalizar(CANCELADO)
+            return
+        job.finalizar(CONCLUIDO)
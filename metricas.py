@@ -0,0 +1,115 @@
+import os
+import resource
+import sys
+import threading
+
+#Instrumentação do solver e métricas do servidor.
+# - Instrumentacao: medições de uma execução (tempo de cada fase da iteração, contadores da construção e memória),
+#   passada para o algoritmo_colonia_formigas_sse. Sem ela (o padrão) o algoritmo não mede nada além dos tempos de
+#   sempre, e a construção só paga um "if contadores is not None" por passo.
+# - registro: totais do processo inteiro (todas as execuções instrumentadas, serialização do SSE, gráficos),
+#   exportados no formato texto do Prometheus pelo /metrics.
+
+PREFIXO = 'aco_'
+#nome: (tipo, descrição). Só as métricas daqui aparecem no /metrics.
+METRICAS = {
+    'phase_seconds_total': ('counter', 'Time spent in each phase of the solver iterations.'),
+    'iterations_total': ('counter', 'Solver iterations completed by instrumented runs.'),
+    'ants_built_total': ('counter', 'Ant tours built by instrumented runs.'),
+    'candidate_fallbacks_total': ('counter', 'Construction steps where an ant had no free candidate neighbour.'),
+    'probability_evaluations_total': ('counter', 'Choice probabilities evaluated during construction.'),
+    'sse_events_total': ('counter', 'Server-sent events serialised.'),
+    'sse_serialization_seconds_total': ('counter', 'Time spent serialising server-sent events to JSON.'),
+    'plots_rendered_total': ('counter', 'Plots rasterised by the server.'),
+    'plot_render_seconds_total': ('counter', 'Time spent rasterising plots.'),
+    'jobs': ('gauge', 'Jobs currently known to the server, by state.'),
+    'resident_memory_bytes': ('gauge', 'Resident memory of the server process.'),
+    'peak_resident_memory_bytes': ('gauge', 'Peak resident memory of the server process.'),
+}
+
+try:
+    TAMANHO_PAGINA = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    TAMANHO_PAGINA = 4096
+
+
+#memória residente atual em bytes (do /proc no Linux; onde não existe, o pico é o melhor que dá para ter).
+def memoria_rss():
+    try:
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * TAMANHO_PAGINA
+    except (OSError, IndexError, ValueError):
+        return memoria_pico()
+
+
+def memoria_pico():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == 'darwin' else pico * 1024 #ru_maxrss vem em KB no Linux e em bytes no macOS.
+
+
+class Registro:
+    def __init__(self):
+        self.valores = {} #(nome, rótulos) -> valor, rótulos é uma tupla ordenada de pares (chave, valor).
+        self.trava = threading.Lock()
+
+    def somar(self, nome, valor=1, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self.trava:
+            self.valores[chave] = self.valores.get(chave, 0) + valor
+
+    def definir(self, nome, valor, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self.trava:
+            self.valores[chave] = valor
+
+    #texto no formato de exposição do Prometheus (# HELP, # TYPE e uma linha por série).
+    def texto(self):
+        with self.trava:
+            valores = dict(self.valores)
+        linhas = []
+        for nome, (tipo, descricao) in METRICAS.items():
+            series = sorted((rotulos, valor) for (outro, rotulos), valor in valores.items() if outro == nome)
+            if not series:
+                continue
+            linhas.append(f"# HELP {PREFIXO}{nome} {descricao}")
+            linhas.append(f"# TYPE {PREFIXO}{nome} {tipo}")
+            for rotulos, valor in series:
+                texto_rotulos = ','.join(f'{chave}="{rotulo}"' for chave, rotulo in rotulos)
+                linhas.append(f"{PREFIXO}{nome}{{{texto_rotulos}}} {valor:.10g}" if rotulos
+                              else f"{PREFIXO}{nome} {valor:.10g}")
+        return '\n'.join(linhas) + '\n'
+
+
+registro = Registro()
+
+
+#medições de uma execução. contadores é preenchido pela construção vetorizada (avaliacoes_probabilidade e
+#fallbacks_candidatos), e a cada iteração o algoritmo chama registrar_iteracao com o tempo de cada fase.
+#ultima guarda o resumo da última iteração (o que vai nos eventos do SSE) e totais o acumulado da execução.
+class Instrumentacao:
+    def __init__(self):
+        self.contadores = {'avaliacoes_probabilidade': 0, 'fallbacks_candidatos': 0}
+        self.totais = {'iteracoes': 0, 'formigas': 0, 'fases': {}}
+        self.ultima = None
+        self.anteriores = dict(self.contadores)
+
+    def registrar_iteracao(self, fases, num_formigas):
+        iteracao = {nome: valor - self.anteriores[nome] for nome, valor in self.contadores.items()}
+        self.anteriores = dict(self.contadores)
+        self.totais['iteracoes'] += 1
+        self.totais['formigas'] += num_formigas
+        for fase, tempo in fases.items():
+            self.totais['fases'][fase] = self.totais['fases'].get(fase, 0.0) + tempo
+            registro.somar('phase_seconds_total', tempo, phase=fase)
+        registro.somar('iterations_total')
+        registro.somar('ants_built_total', num_formigas)
+        registro.somar('probability_evaluations_total', iteracao['avaliacoes_probabilidade'])
+        registro.somar('candidate_fallbacks_total', iteracao['fallbacks_candidatos'])
+
+        self.ultima = {
+            'fases_ms': {fase: 1000 * tempo for fase, tempo in fases.items()},
+            'formigas': num_formigas,
+            'avaliacoes_probabilidade': iteracao['avaliacoes_probabilidade'],
+            'fallbacks_candidatos': iteracao['fallbacks_candidatos'],
+            'memoria_mb': memoria_rss() / 2 ** 20,
+        }
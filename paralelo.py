@@ -0,0 +1,165 @@
+import multiprocessing as mp #Biblioteca de processos, cada worker roda em um processo separado (sem disputar o GIL)
+from multiprocessing.shared_memory import SharedMemory #memória compartilhada entre os processos
+import os
+import time
+import numpy as np
+from tsp_solver import construir_rotas_vetorizado, calcular_distancias_rotas
+
+
+#Arrays que ficam na memória compartilhada: as coordenadas e as distâncias da instância, a heurística (usada
+#quando a formiga não tem vizinho candidato livre) e a informação de escolha (feromonio^alfa * heuristica^beta),
+#que é a única que muda de uma iteração para outra.
+#Quando a instância veio do registro (ver registro_instancias.py), os arrays da instância já estão em arquivos .npy e os
+#workers abrem esses mesmos arquivos com mmap, sem cópia. Só a informação de escolha vai para a memória compartilhada.
+ARRAYS_COMPARTILHADOS = ('coordenadas', 'distancias', 'heuristica', 'informacao')
+
+#Contexto de todos os processos do projeto (workers daqui, ilhas, pools das execuções múltiplas, da varredura e do
+#benchmark). O servidor cria processos a partir das threads dos jobs, e no fork (o padrão no Linux) o filho herda as
+#travas do jeito que estavam no momento do fork: uma trava segura por outra thread (ex: a do registro de instâncias no
+#meio de uma carga) fica travada para sempre no filho. No forkserver os processos saem de um servidor sem threads,
+#iniciado uma vez (e no spawn, onde não tem forkserver, de um interpretador novo).
+CONTEXTO_PROCESSOS = mp.get_context('forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn')
+#módulos que o servidor do forkserver já importa (e o numpy junto), então cada processo novo sai pronto em
+#milissegundos no lugar de importar tudo de novo (centenas de ms), o que conta nos prazos das execuções múltiplas e das
+#ilhas. Ver precarregar.
+MODULOS_PRECARREGADOS = ['tsp_solver', 'paralelo', 'ilhas']
+
+
+#acrescenta módulos aos que o servidor do forkserver importa; tem que vir antes do primeiro processo. Cada processo
+#novo roda de novo o módulo principal (o '__main__' do set_forkserver_preload não chega ao servidor no Python 3.11),
+#então o principal (ex: o app.py, com o Flask e o matplotlib) se precarrega aqui para esse import sair do cache.
+def precarregar(*modulos):
+    MODULOS_PRECARREGADOS.extend(modulo for modulo in modulos if modulo not in MODULOS_PRECARREGADOS)
+    if CONTEXTO_PROCESSOS.get_start_method() == 'forkserver':
+        CONTEXTO_PROCESSOS.set_forkserver_preload(MODULOS_PRECARREGADOS)
+
+
+precarregar()
+
+
+#cria um bloco de memória compartilhada do tamanho do array e copia o conteúdo para ele.
+def criar_array_compartilhado(array):
+    memoria = SharedMemory(create=True, size=max(array.nbytes, 1))
+    compartilhado = np.ndarray(array.shape, dtype=array.dtype, buffer=memoria.buf)
+    compartilhado[...] = array
+    return memoria, compartilhado
+
+
+#o worker só se conecta nos blocos já criados pelo processo principal, quem cria é quem apaga (unlink) no final.
+def abrir_array_compartilhado(nome, formato, tipo):
+    memoria = SharedMemory(name=nome)
+    return memoria, np.ndarray(formato, dtype=tipo, buffer=memoria.buf)
+
+
+#Loop de cada worker: abre os arrays compartilhados uma vez e fica esperando o sinal de cada iteração, que é a
+#quantidade de formigas que ele tem que construir e se a execução é instrumentada. Ele devolve as rotas, as distâncias
+#delas, os contadores da construção (ver metricas.Instrumentacao, vazios sem instrumentação) e o tempo da avaliação das
+#rotas, e com None termina.
+#Cada worker tem o seu próprio gerador, criado a partir de uma SeedSequence, então a execução é reproduzível para
+#o mesmo par (semente, workers).
+def executar_worker(conexao, descricoes, semente, vizinhos, q0):
+    memorias = []
+    arrays = {}
+    for nome, descricao in descricoes.items():
+        if isinstance(descricao, str): #arquivo .npy dos artefatos da instância.
+            arrays[nome] = np.load(descricao, mmap_mode='r')
+            continue
+        memoria, arrays[nome] = abrir_array_compartilhado(*descricao)
+        memorias.append(memoria)
+    rng = np.random.default_rng(semente)
+
+    try:
+        while True:
+            pedido = conexao.recv()
+            if pedido is None:
+                break
+            num_formigas, instrumentar = pedido
+            if num_formigas == 0:
+                conexao.send((None, None, {}, 0.0))
+                continue
+            contadores = {'avaliacoes_probabilidade': 0, 'fallbacks_candidatos': 0} if instrumentar else None
+            rotas = construir_rotas_vetorizado(num_formigas, arrays['informacao'], arrays['heuristica'], rng,
+                                               vizinhos, q0, contadores=contadores)
+            inicio_avaliacao = time.perf_counter()
+            distancias = calcular_distancias_rotas(rotas, arrays['distancias'])
+            conexao.send((rotas, distancias, contadores or {}, time.perf_counter() - inicio_avaliacao))
+    finally:
+        for memoria in memorias:
+            memoria.close()
+        conexao.close()
+
+
+#Pool persistente de workers para construir as formigas de cada iteração em paralelo.
+#Os workers são criados uma vez por execução, e a cada iteração o processo principal só escreve a informação de
+#escolha no array compartilhado e manda para cada worker quantas formigas ele constrói.
+class ConstrutorParalelo:
+    def __init__(self, instancia, informacao, num_workers, semente=None, vizinhos=None, q0=0.0):
+        self.num_workers = num_workers
+        self.memorias = []
+        self.arrays = {}
+        descricoes = {}
+        origens = {nome: instancia[nome] for nome in ARRAYS_COMPARTILHADOS if nome != 'informacao'}
+        if 'artefatos' in instancia:
+            for nome in origens:
+                descricoes[nome] = os.path.join(instancia['artefatos'], f"{nome}.npy")
+            origens = {}
+        origens['informacao'] = informacao
+        for nome, array in origens.items():
+            memoria, self.arrays[nome] = criar_array_compartilhado(np.ascontiguousarray(array))
+            self.memorias.append(memoria)
+            descricoes[nome] = (memoria.name, array.shape, array.dtype)
+
+        sementes = np.random.SeedSequence(semente).spawn(num_workers)
+        self.conexoes = []
+        self.processos = []
+        for semente_worker in sementes:
+            conexao, conexao_worker = CONTEXTO_PROCESSOS.Pipe()
+            processo = CONTEXTO_PROCESSOS.Process(target=executar_worker, daemon=True,
+                                                  args=(conexao_worker, descricoes, semente_worker, vizinhos, q0))
+            processo.start()
+            conexao_worker.close()
+            self.conexoes.append(conexao)
+            self.processos.append(processo)
+
+    #constrói num_formigas rotas, divididas o mais igual possível entre os workers, e junta na ordem dos workers.
+    #Com contadores (os da Instrumentacao), os contadores de cada worker são somados nele. tempo_avaliacao fica com o
+    #tempo da avaliação das rotas da última chamada (o do worker mais lento, já que eles avaliam ao mesmo tempo).
+    def construir(self, informacao, num_formigas, contadores=None):
+        if informacao is not self.arrays['informacao']:
+            np.copyto(self.arrays['informacao'], informacao)
+        partes = [len(parte) for parte in np.array_split(np.arange(num_formigas), self.num_workers)]
+        for conexao, quantidade in zip(self.conexoes, partes):
+            conexao.send((quantidade, contadores is not None))
+        resultados = [conexao.recv() for conexao in self.conexoes]
+        resultados = [resultado for resultado in resultados if resultado[0] is not None]
+        if contadores is not None:
+            for _, _, contadores_worker, _ in resultados:
+                for nome, valor in contadores_worker.items():
+                    contadores[nome] += valor
+        self.tempo_avaliacao = max((tempo for _, _, _, tempo in resultados), default=0.0)
+        rotas = np.concatenate([rotas for rotas, _, _, _ in resultados])
+        distancias = np.concatenate([distancias for _, distancias, _, _ in resultados])
+        return rotas, distancias
+
+    def fechar(self):
+        for conexao in self.conexoes:
+            try:
+                conexao.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for processo in self.processos:
+            processo.join(timeout=5)
+            if processo.is_alive():
+                processo.terminate()
+        for conexao in self.conexoes:
+            conexao.close()
+        for memoria in self.memorias:
+            memoria.close()
+            memoria.unlink()
+        self.memorias = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
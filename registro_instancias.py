@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+import numpy as np
+import tsplib95
+from tsp_solver import construir_matrizes, obter_comprimento_vizinho_mais_proximo, calcular_vizinhos, \
+    K_VIZINHOS_PADRAO
+from instancia_grande import LIMITE_INSTANCIA_DENSA, ler_cabecalho, construir_instancia_grande
+
+#Registro das instâncias: descobre os arquivos .tsp de uma pasta e entrega as instâncias carregadas.
+# - Só nomes de arquivos .tsp que estão na pasta (sem caminho) são aceitos vindos de fora, assim uma requisição nunca
+#   lê um arquivo fora da pasta das instâncias.
+# - As instâncias carregadas ficam num cache LRU em memória (max_carregadas), e cada entrada guarda o mtime e o tamanho
+#   do arquivo: se o arquivo mudar, a instância é carregada de novo.
+# - O que é caro de calcular (rótulos, coordenadas, matriz de distâncias, heurística, vizinhos mais próximos e o
+#   comprimento da rota do vizinho mais próximo, usado pelas estratégias para o feromonio inicial) é gravado em
+#   arquivos .npy numa pasta de artefatos, com o hash do conteúdo do .tsp no nome. Carregar de novo, mesmo em outro
+#   processo ou depois de reiniciar o servidor, é só abrir esses arquivos com mmap, sem o tsplib95 e sem o networkx,
+#   e os processos que abrem os mesmos arquivos dividem as mesmas páginas na memória (os arrays são só leitura).
+#A pasta de artefatos pode ser apagada a qualquer momento, ela é recriada na próxima carga.
+
+PASTA_INSTANCIAS = os.environ.get('ACO_INSTANCE_DIR', '.')
+PASTA_ARTEFATOS = os.environ.get('ACO_ARTIFACT_DIR', 'artefatos')
+MAX_INSTANCIAS_CARREGADAS = 8
+VERSAO_ARTEFATOS = 1
+ARRAYS_DENSOS = ('cidades', 'coordenadas', 'vizinhos', 'distancias', 'heuristica')
+ARRAYS_GRANDES = ('cidades', 'coordenadas', 'vizinhos', 'distancias_vizinhos')
+
+
+def hash_arquivo(caminho):
+    resumo = hashlib.sha1()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()[:20]
+
+
+class RegistroInstancias:
+    def __init__(self, pasta=PASTA_INSTANCIAS, pasta_artefatos=PASTA_ARTEFATOS, max_carregadas=MAX_INSTANCIAS_CARREGADAS):
+        self.pasta = pasta
+        self.pasta_artefatos = pasta_artefatos
+        self.max_carregadas = max_carregadas
+        self.carregadas = OrderedDict() #(caminho, arredondar, grande) -> (mtime, tamanho, instancia)
+        self.cabecalhos = {} #nome -> (mtime, resumo do cabeçalho), para o listar não reler os arquivos.
+        self.trava = threading.Lock() #protege só os dicionários, nunca fica presa durante uma carga.
+        self.travas_cargas = {} #chave -> trava da carga daquela instância.
+
+    #arquivos .tsp da pasta, com o que o cabeçalho diz de cada um.
+    def listar(self):
+        instancias = []
+        with os.scandir(self.pasta) as entradas:
+            for entrada in sorted(entradas, key=lambda entrada: entrada.name):
+                if not entrada.name.endswith('.tsp') or not entrada.is_file():
+                    continue
+                mtime = entrada.stat().st_mtime_ns
+                if self.cabecalhos.get(entrada.name, (None,))[0] != mtime:
+                    with open(entrada.path) as arquivo:
+                        cabecalho = ler_cabecalho(arquivo)
+                    dimensao = int(cabecalho.get('DIMENSION', 0))
+                    self.cabecalhos[entrada.name] = (mtime, {
+                        'nome': entrada.name,
+                        'comentario': cabecalho.get('COMMENT', ''),
+                        'cidades': dimensao,
+                        'tipo_distancia': cabecalho.get('EDGE_WEIGHT_TYPE'),
+                        'grande': dimensao > LIMITE_INSTANCIA_DENSA,
+                    })
+                instancias.append(self.cabecalhos[entrada.name][1])
+        return instancias
+
+    #caminho de uma instância pedida pelo nome. O nome tem que ser só o nome de um .tsp que existe na pasta.
+    def caminho(self, nome):
+        if not isinstance(nome, str) or os.path.basename(nome) != nome or not nome.endswith('.tsp'):
+            raise ValueError(f"Nome de instância inválido: {nome}")
+        caminho = os.path.join(self.pasta, nome)
+        if not os.path.isfile(caminho):
+            raise ValueError(f"Instância {nome} não encontrada.")
+        return caminho
+
+    #(G, problem, instancia) do arquivo, igual ao carregar_problema, mas G e problem são sempre None: nada do solver
+    #precisa deles quando a instância já vem pronta.
+    #Cada instância tem a sua trava de carga: duas cargas da mesma instância esperam uma pela outra (a segunda já acha
+    #a instância no cache), mas a carga lenta de uma instância não segura as cargas das outras. Os artefatos são
+    #gravados numa pasta temporária e renomeados, então outro processo nunca vê uma carga pela metade.
+    def carregar(self, caminho, arredondar=False, grande=None):
+        chave = (os.path.realpath(caminho), bool(arredondar), grande)
+        estado = os.stat(caminho)
+        marca = (estado.st_mtime_ns, estado.st_size)
+        instancia = self.em_cache(chave, marca)
+        if instancia is not None:
+            return None, None, instancia
+        with self.trava:
+            trava_carga = self.travas_cargas.setdefault(chave, threading.Lock())
+        with trava_carga:
+            instancia = self.em_cache(chave, marca)
+            if instancia is None:
+                instancia = self.carregar_artefatos(caminho, bool(arredondar), grande)
+                with self.trava:
+                    self.carregadas[chave] = marca + (instancia,)
+                    self.carregadas.move_to_end(chave)
+                    while len(self.carregadas) > self.max_carregadas:
+                        self.carregadas.popitem(last=False)
+        return None, None, instancia
+
+    #a instância do cache, se ela foi carregada do arquivo como ele está agora (mesmo mtime e tamanho).
+    def em_cache(self, chave, marca):
+        with self.trava:
+            if chave in self.carregadas and self.carregadas[chave][:2] == marca:
+                self.carregadas.move_to_end(chave)
+                return self.carregadas[chave][2]
+        return None
+
+    def carregar_artefatos(self, caminho, arredondar, grande):
+        if grande is None:
+            with open(caminho) as arquivo:
+                grande = int(ler_cabecalho(arquivo).get('DIMENSION', 0)) > LIMITE_INSTANCIA_DENSA
+        variante = f"{'arredondada' if arredondar else 'euclidiana'}-{'grande' if grande else 'densa'}"
+        pasta = os.path.join(self.pasta_artefatos, f"{hash_arquivo(caminho)}-{variante}")
+        if not os.path.isfile(os.path.join(pasta, 'metadados.json')):
+            gravar_artefatos(pasta, calcular_artefatos(caminho, arredondar, grande), caminho)
+        return abrir_artefatos(pasta)
+
+
+#calcula a instância do zero (o caminho lento, só na primeira vez de cada arquivo).
+def calcular_artefatos(caminho, arredondar, grande):
+    if grande:
+        instancia = construir_instancia_grande(caminho, arredondar, K_VIZINHOS_PADRAO, calcular_vizinhos)
+    else:
+        instancia = construir_matrizes(tsplib95.load(caminho), arredondar)
+    obter_comprimento_vizinho_mais_proximo(instancia)
+    return instancia
+
+
+#grava numa pasta temporária e renomeia, assim outro processo nunca abre uma pasta pela metade. Se outro processo
+#gravou a mesma pasta antes (mesmo arquivo, mesmo conteúdo), a dele fica.
+def gravar_artefatos(pasta, instancia, caminho):
+    os.makedirs(os.path.dirname(pasta) or '.', exist_ok=True)
+    temporaria = f"{pasta}.tmp-{os.getpid()}-{threading.get_ident()}"
+    os.makedirs(temporaria, exist_ok=True)
+    try:
+        for nome in ARRAYS_GRANDES if instancia.get('grande') else ARRAYS_DENSOS:
+            np.save(os.path.join(temporaria, f"{nome}.npy"), np.ascontiguousarray(instancia[nome]))
+        with open(os.path.join(temporaria, 'metadados.json'), 'w') as arquivo:
+            json.dump({
+                'versao': VERSAO_ARTEFATOS,
+                'arquivo': os.path.basename(caminho),
+                'grande': bool(instancia.get('grande')),
+                'tipo_distancia': instancia.get('tipo_distancia'),
+                'comprimento_vizinho_mais_proximo': instancia['comprimento_vizinho_mais_proximo'],
+            }, arquivo)
+        os.rename(temporaria, pasta)
+    except OSError:
+        if not os.path.isfile(os.path.join(pasta, 'metadados.json')):
+            raise
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+
+
+#abre os arrays com mmap (só leitura) e monta a instância com as mesmas chaves do construir_matrizes (ou do
+#construir_instancia_grande). 'artefatos' guarda a pasta, para outros processos abrirem os mesmos arquivos.
+def abrir_artefatos(pasta):
+    with open(os.path.join(pasta, 'metadados.json')) as arquivo:
+        metadados = json.load(arquivo)
+    if metadados.get('versao') != VERSAO_ARTEFATOS:
+        raise ValueError(f"Artefatos em {pasta} têm versão {metadados.get('versao')}, esperada {VERSAO_ARTEFATOS}.")
+    nomes = ARRAYS_GRANDES if metadados['grande'] else ARRAYS_DENSOS
+    instancia = {nome: np.load(os.path.join(pasta, f"{nome}.npy"), mmap_mode='r') for nome in nomes}
+    instancia['indices'] = {cidade: indice for indice, cidade in enumerate(instancia['cidades'].tolist())}
+    instancia['comprimento_vizinho_mais_proximo'] = metadados['comprimento_vizinho_mais_proximo']
+    instancia['artefatos'] = pasta
+    if metadados['grande']:
+        instancia['grande'] = True
+        instancia['tipo_distancia'] = metadados['tipo_distancia']
+    return instancia
+
+
+registro_instancias = RegistroInstancias()
@@ -1,3 +1,37 @@
+// Instância carregada e último job (execução) desta aba: cada aba tem os seus, o servidor não guarda estado global
+let currentInstance = null;
+let currentJob = null;
+
+// Máximo de eventos de iteração por segundo pedidos ao servidor; as iterações no meio são agrupadas por ele
+const STREAM_MAX_RATE = 20;
+
+// Motivos de parada de uma execução, como o servidor manda
+const STOP_REASONS = {
+    estagnacao: 'convergiu (sem melhora)',
+    alvo: 'distância alvo atingida',
+    iteracoes: 'limite de iterações',
+    prazo: 'tempo máximo atingido'
+};
+
+// As rotas chegam como base64 de um array uint16/uint32 (little-endian) com os rótulos das cidades
+function decodeRoute(encoded) {
+    const bytes = Uint8Array.from(atob(encoded.data), c => c.charCodeAt(0));
+    const ArrayType = encoded.dtype === 'uint32' ? Uint32Array : Uint16Array;
+    return Array.from(new ArrayType(bytes.buffer));
+}
+
+// Instâncias encontradas pelo servidor na pasta de instâncias: as que ainda não estão na lista entram no fim dela
+fetch('/instances').then(response => response.json()).then(instances => {
+    const select = document.getElementById('problemInstance');
+    const known = new Set(Array.from(select.options, option => option.value));
+    instances.filter(instance => !known.has(instance.nome)).forEach(instance => {
+        const label = `${instance.nome} (${instance.cidades} cidades${instance.grande ? ', instância grande' : ''})`;
+        select.add(new Option(label, instance.nome));
+    });
+}).catch(error => {
+    console.error('Erro ao listar instâncias:', error);
+});
+
 // Carregar instância TSP
 document.getElementById('loadInstance').addEventListener('click', function () {
     const instance = document.getElementById('problemInstance').value;
@@ -6,6 +40,11 @@ document.getElementById('loadInstance').addEventListener('click', function () {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ instance: instance })
     }).then(response => response.json()).then(data => {
+        if (data.error) {
+            logMessage(data.error);
+            return;
+        }
+        currentInstance = instance;
         logMessage(data.message);
         document.getElementById('runACO').disabled = false;
         document.getElementById('runACOWithSolution').disabled = false;
@@ -21,58 +60,117 @@ function getParameters() {
         evaporation: parseFloat(document.getElementById('evaporation').value),
         Q: parseFloat(document.getElementById('Q').value),
         numAnts: parseInt(document.getElementById('numAnts').value),
-        numIterations: parseInt(document.getElementById('numIterations').value)
+        numIterations: parseInt(document.getElementById('numIterations').value),
+        k: parseInt(document.getElementById('k').value) || 0,
+        localSearch: document.getElementById('localSearch').value,
+        strategy: document.getElementById('strategy').value,
+        stagnation: parseInt(document.getElementById('stagnation').value) || 0,
+        deadlineMs: document.getElementById('deadlineMs').value,
+        target: document.getElementById('target').value,
+        islands: parseInt(document.getElementById('islands').value) || 1,
+        migrationInterval: parseInt(document.getElementById('migrationInterval').value) || 10,
+        topology: document.getElementById('topology').value,
+        migration: document.getElementById('migration').value
     };
 }
 
+// Cria um job no servidor e acompanha os eventos dele. Se a conexão cair, o EventSource reconecta sozinho
+// enviando o Last-Event-ID, e o servidor manda só os eventos que faltaram.
+function runJob(type, onEvent, errorMessage) {
+    const body = Object.assign({ type: type, instance: currentInstance }, getParameters());
+    fetch('/jobs', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    }).then(response => response.json()).then(job => {
+        if (job.error) {
+            logMessage(job.error);
+            return;
+        }
+        const eventSource = new EventSource(`/jobs/${job.job_id}/events?maxRate=${STREAM_MAX_RATE}`);
+
+        eventSource.onmessage = function (event) {
+            const data = JSON.parse(event.data);
+            if (data.error || data.cancelled) {
+                logMessage(data.error || data.mensagem);
+                eventSource.close();
+                return;
+            }
+            if (data.final) {
+                currentJob = job.job_id;
+                eventSource.close();
+            }
+            onEvent(data);
+        };
+
+        eventSource.onerror = function () {
+            if (eventSource.readyState === EventSource.CLOSED) {
+                logMessage(errorMessage);
+            }
+        };
+    }).catch(() => logMessage(errorMessage));
+}
+
 // Executar ACO
 document.getElementById('runACO').addEventListener('click', function () {
-    const params = getParameters();
     logMessage("Rodando algoritmo em tempo real...");
-    const queryString = new URLSearchParams(params).toString();
-    const eventSource = new EventSource(`/run_aco_sse?${queryString}`);
 
-    eventSource.onmessage = function (event) {
-        const data = JSON.parse(event.data);
+    // Com mais de uma ilha vira um job de ilhas: os eventos têm a ilha e o fitness é a melhor distância entre todas
+    const type = getParameters().islands > 1 ? 'islands' : 'single';
+    runJob(type, function (data) {
+        if (data.migration) {
+            logMessage(`Migração na iteração ${data.migration}: ${data.received} ilha(s) receberam uma rota melhor`);
+        }
         if (data.iteracao && data.fitness) {
             const iterationsDiv = document.getElementById('iterations');
-            iterationsDiv.innerHTML += `Iteração: ${data.iteracao}, Fitness: ${data.fitness}<br>`;
+            let linha = `Iteração: ${data.iteracao}, Fitness: ${data.fitness}`;
+            if (data.island !== undefined) {
+                linha = `Ilha ${data.island}, ` + linha + ` (ilha: ${data.island_fitness})`;
+            }
+            if (data.tempos) {
+                linha += ` (construção: ${(data.tempos.construcao * 1000).toFixed(1)} ms, busca local: ${(data.tempos.busca_local * 1000).toFixed(1)} ms, feromônio: ${(data.tempos.feromonio * 1000).toFixed(1)} ms)`;
+            }
+            iterationsDiv.innerHTML += linha + '<br>';
         }
 
         if (data.final) {
             logMessage(data.mensagem);
-            logMessage("Melhor solução encontrada: " + JSON.stringify(data.melhor_rota));
+            logMessage(`Parada: ${STOP_REASONS[data.stop_reason] || data.stop_reason}`);
+            (data.islands || []).forEach(island => {
+                if (island.skipped) {
+                    logMessage(`Ilha ${island.island}: pulada (o prazo acabou antes de começar)`);
+                } else {
+                    logMessage(`Ilha ${island.island}: ${island.best} em ${island.iterations} iterações (${STOP_REASONS[island.stop_reason] || island.stop_reason})`);
+                }
+            });
+            if (!data.melhor_rota) {
+                return;  // no island started, there is no route to show
+            }
+            logMessage("Melhor solução encontrada: " + JSON.stringify(decodeRoute(data.melhor_rota)));
             document.getElementById('viewBestRoute').disabled = false;
             document.getElementById('plotBoxplot').disabled = false; // Enable boxplot button
             document.getElementById('plotFitnessEvolution').disabled = false; // Enable fitness evolution button
-            eventSource.close();
         }
-    };
-
-    eventSource.onerror = function () {
-        logMessage("Erro na execução em tempo real.");
-        eventSource.close();
-    };
+    }, "Erro na execução em tempo real.");
 });
 // Executar múltiplos ACOs e visualizar logs e boxplot em tempo real
 document.getElementById('runMultipleACO').addEventListener('click', function () {
     logMessage("Executando múltiplos ACOs em tempo real...");
 
-    const params = getParameters();
-    const queryString = new URLSearchParams(params).toString();
-    const eventSource = new EventSource(`/run_multiple_aco?${queryString}`);
-
-    eventSource.onmessage = function (event) {
-        const data = JSON.parse(event.data);
-
+    runJob('multiple', function (data) {
         // Log each run's result
-        if (data.run && data.iterations) {
-            logMessage(`Execução: ${data.run}, Iterações: ${data.iterations}`);
+        if (data.run && data.skipped) {
+            logMessage(`Execução: ${data.run} pulada (o prazo acabou antes de começar)`);
+        } else if (data.run && data.iterations) {
+            logMessage(`Execução: ${data.run}, Iterações: ${data.iterations} (${STOP_REASONS[data.stop_reason] || data.stop_reason})`);
         }
 
         // Display the boxplot when the process is complete
         if (data.final) {
             logMessage(data.message);
+            if (!data.boxplot_url) {
+                return;  // no run started before the deadline
+            }
 
             // Render the boxplot image
             const img = new Image();
@@ -81,23 +179,36 @@ document.getElementById('runMultipleACO').addEventListener('click', function ()
             canvas.innerHTML = '';  // Clear previous content
             canvas.appendChild(img);  // Add the new boxplot image
 
-            eventSource.close();  // Close the SSE connection
+            document.getElementById('viewBestRoute').disabled = false;
+            document.getElementById('plotBoxplot').disabled = false;
+            document.getElementById('plotFitnessEvolution').disabled = false;
         }
-    };
-
-    eventSource.onerror = function () {
-        logMessage("Erro na execução múltipla em tempo real.");
-        eventSource.close();
-    };
+    }, "Erro na execução múltipla em tempo real.");
 });
 
+// Cidades (node_trace) da instância atual, guardadas para desenhar as rotas, que chegam só como índices
+let graphNodes = null;
+let graphNodesInstance = null;
 
+function getGraph(mode) {
+    const url = `/get_graph?instance=${encodeURIComponent(currentInstance)}` + (mode ? `&mode=${mode}` : '');
+    return fetch(url).then(response => response.json()).then(data => {
+        graphNodes = data.node_trace;
+        graphNodesInstance = currentInstance;
+        return data;
+    });
+}
 
+function getGraphNodes() {
+    if (graphNodes && graphNodesInstance === currentInstance) {
+        return Promise.resolve(graphNodes);
+    }
+    return getGraph('cidades').then(data => data.node_trace);
+}
 
 // Visualizar Grafo
 document.getElementById('viewGraph').addEventListener('click', function () {
-    fetch('/get_graph')
-        .then(response => response.json())
+    getGraph()
         .then(data => {
             const canvas = document.getElementById('canvas');
             Plotly.newPlot(canvas, [data.edge_trace, data.node_trace], data.layout);
@@ -108,11 +219,18 @@ document.getElementById('viewGraph').addEventListener('click', function () {
 
 // Visualizar Melhor Rota
 document.getElementById('viewBestRoute').addEventListener('click', function () {
-    fetch('/get_best_route')
-        .then(response => response.json())
-        .then(data => {
+    Promise.all([getGraphNodes(), fetch(`/get_best_route?job=${currentJob}`).then(response => response.json())])
+        .then(([nodes, data]) => {
+            // Liga as cidades na ordem da rota e volta para a primeira
+            const rota = data.rota.concat([data.rota[0]]);
+            const edgeTrace = {
+                x: rota.map(i => nodes.x[i]),
+                y: rota.map(i => nodes.y[i]),
+                line: data.line,
+                mode: 'lines'
+            };
             const canvas = document.getElementById('canvas');
-            Plotly.newPlot(canvas, [data.edge_trace, data.node_trace], data.layout);
+            Plotly.newPlot(canvas, [edgeTrace, nodes], data.layout);
         }).catch(error => {
             console.error('Error loading best route:', error);
         });
@@ -120,7 +238,7 @@ document.getElementById('viewBestRoute').addEventListener('click', function () {
 
 // Visualizar Boxplot de Iterações
 document.getElementById('plotBoxplot').addEventListener('click', function () {
-    fetch('/plot_iterations_boxplot')
+    fetch(`/plot_iterations_boxplot?job=${currentJob}`)
         .then(response => response.blob())
         .then(blob => {
             const imgUrl = URL.createObjectURL(blob);
@@ -134,17 +252,26 @@ document.getElementById('plotBoxplot').addEventListener('click', function () {
         });
 });
 
-// Visualizar Evolução do Fitness
+// Visualizar Evolução do Fitness (desenhado no navegador com os dados do job, sem imagem gerada no servidor)
 document.getElementById('plotFitnessEvolution').addEventListener('click', function () {
-    fetch('/plot_fitness_evolution')
-        .then(response => response.blob())
-        .then(blob => {
-            const imgUrl = URL.createObjectURL(blob);
-            const img = new Image();
-            img.src = imgUrl;
+    fetch(`/fitness_data?job=${currentJob}`)
+        .then(response => response.json())
+        .then(data => {
+            const iteracoes = data.best.map((_, i) => i);
+            const series = [
+                { x: iteracoes, y: data.best, mode: 'lines', name: 'Best Fitness' },
+                { x: iteracoes, y: data.worst, mode: 'lines', name: 'Worst Fitness' },
+                { x: iteracoes, y: data.avg, mode: 'lines', name: 'Average Fitness' }
+            ];
+            const layout = {
+                title: 'Fitness Evolution Over Time',
+                xaxis: { title: 'Iteration' },
+                yaxis: { title: 'Fitness' },
+                height: 600
+            };
             const canvas = document.getElementById('canvas');
             canvas.innerHTML = ''; // Limpar canvas
-            canvas.appendChild(img); // Adicionar imagem da evolução do fitness
+            Plotly.newPlot(canvas, series, layout);
         }).catch(error => {
             console.error('Erro ao carregar evolução do fitness:', error);
         });
@@ -0,0 +1,7 @@
+import os
+import sys
+
+#os testes importam os módulos da raiz do projeto (app, tsp_solver...) e abrem as instâncias .tsp de lá.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
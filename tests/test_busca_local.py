@@ -0,0 +1,58 @@
+import random
+import numpy as np
+import pytest
+import busca_local
+from busca_local import mover_segmento, aplicar_busca_local, preparar_distancias, LIMITE_DISTANCIAS_LISTA
+from tsp_solver import obter_instancia, obter_vizinhos
+
+
+def arestas(rota):
+    return {frozenset((rota[i - 1], rota[i])) for i in range(len(rota))}
+
+
+#o movimento do Or-opt (feito com inversões) tem que trocar exatamente as três arestas do movimento, em qualquer
+#posição da rota e com o segmento entrando nos dois sentidos.
+def test_mover_segmento_troca_so_as_arestas_do_movimento():
+    sorteio = random.Random(0)
+    for _ in range(2000):
+        n = sorteio.randint(6, 12)
+        rota = sorteio.sample(range(n), n)
+        posicao = [0] * n
+        for indice, cidade in enumerate(rota):
+            posicao[cidade] = indice
+        tamanho, inicio = sorteio.randint(1, 3), sorteio.randrange(n)
+        segmento = [rota[(inicio + i) % n] for i in range(tamanho)]
+        anterior, seguinte = rota[(inicio - 1) % n], rota[(inicio + tamanho) % n]
+        c = sorteio.choice([cidade for cidade in rota if cidade not in segmento])
+        e = sorteio.choice([rota[(posicao[c] + 1) % n], rota[(posicao[c] - 1) % n]])
+        if e in segmento:
+            continue
+        ponta = sorteio.choice([segmento[0], segmento[-1]])
+        outra_ponta = segmento[-1] if ponta == segmento[0] else segmento[0]
+        esperadas = (arestas(rota) - {frozenset((anterior, segmento[0])), frozenset((segmento[-1], seguinte)),
+                                      frozenset((c, e))}) | \
+            {frozenset((anterior, seguinte)), frozenset((c, ponta)), frozenset((outra_ponta, e))}
+
+        mover_segmento(rota, posicao, anterior, segmento[0], segmento[-1], seguinte, c, e, ponta)
+
+        assert arestas(rota) == esperadas
+        assert all(rota[posicao[cidade]] == cidade for cidade in range(n))
+
+
+#a busca local devolve permutações com a distância certa, nas duas formas das distâncias, e não deixa cópia da matriz
+#de distâncias na instância.
+@pytest.mark.parametrize('limite', [LIMITE_DISTANCIAS_LISTA, 0])
+def test_busca_local_nao_copia_as_distancias(monkeypatch, limite):
+    monkeypatch.setattr(busca_local, 'LIMITE_DISTANCIAS_LISTA', limite)
+    _, _, instancia = obter_instancia('lin318.tsp')
+    n = len(instancia['cidades'])
+    rotas = np.array([np.random.default_rng(semente).permutation(n) for semente in range(3)])
+    chaves = set(instancia)
+
+    melhoradas, distancias = aplicar_busca_local(rotas, preparar_distancias(instancia),
+                                                 obter_vizinhos(instancia, 10).tolist())
+
+    assert set(instancia) == chaves
+    for rota, distancia in zip(melhoradas, distancias):
+        assert sorted(rota.tolist()) == list(range(n))
+        assert np.isclose(instancia['distancias'][rota, np.roll(rota, -1)].sum(), distancia)
@@ -0,0 +1,37 @@
+import pytest
+from tsp_solver import obter_instancia, algoritmo_colonia_formigas_sse
+
+PARAMETROS = {'num_formigas': 10, 'max_stagnation': 0, 'semente': 7}
+
+
+def executar(instancia, num_iteracoes, **parametros):
+    best_fitnesses, worst_fitnesses, avg_fitnesses = [], [], []
+    for _ in algoritmo_colonia_formigas_sse(None, None, best_fitnesses, worst_fitnesses, avg_fitnesses,
+                                            instancia=instancia, num_iteracoes=num_iteracoes,
+                                            **dict(PARAMETROS, **parametros)):
+        pass
+    return best_fitnesses, worst_fitnesses, avg_fitnesses
+
+
+#retomar do checkpoint tem que dar os mesmos históricos da execução sem parar, nos dois motores.
+@pytest.mark.parametrize('motor', ['vetorizado', 'escalar'])
+def test_retomar_continua_a_mesma_execucao(tmp_path, motor):
+    _, _, instancia = obter_instancia('dj38.tsp')
+    caminho = str(tmp_path / 'colonia.npz')
+    inteira = executar(instancia, 20, motor=motor)
+
+    executar(instancia, 10, motor=motor, checkpoint=caminho)
+    retomada = executar(instancia, 20, motor=motor, retomar=caminho)
+
+    assert retomada == inteira
+
+
+#um checkpoint com feromonio n x n não pode ser retomado no modo de candidatos (feromonio n x k), e vice-versa.
+def test_retomar_com_outro_formato_de_feromonio(tmp_path):
+    _, _, instancia = obter_instancia('dj38.tsp')
+    _, _, instancia_grande = obter_instancia('dj38.tsp', grande=True)
+    caminho = str(tmp_path / 'colonia.npz')
+    executar(instancia, 5, checkpoint=caminho)
+
+    with pytest.raises(ValueError, match='feromonio'):
+        executar(instancia_grande, 10, retomar=caminho)
@@ -0,0 +1,43 @@
+import pytest
+import estrategias
+from app import read_parameters
+from tsp_solver import executar_colonia
+
+
+#com os padrões da interface web (estagnação = reinicio do MAX-MIN), a colônia tem que reiniciar o feromonio antes
+#de ser dada como convergida, e depois do reinicio ainda ter max_stagnation iterações para melhorar.
+@pytest.mark.parametrize('semente', [1, 2, 3, 4, 5])
+def test_maxmin_reinicia_com_os_padroes_da_web(monkeypatch, semente):
+    criadas = []
+
+    class MaxMinObservado(estrategias.MaxMin):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.iteracoes_reinicio = []
+            criadas.append(self)
+
+        def atualizar(self, *args):
+            reinicios = self.reinicios
+            resultado = super().atualizar(*args)
+            if self.reinicios != reinicios:
+                self.iteracoes_reinicio.append(self.iteracao)
+            return resultado
+
+    monkeypatch.setitem(estrategias.ESTRATEGIAS, 'mmas', MaxMinObservado)
+    parametros = read_parameters({'instance': 'dj38.tsp', 'strategy': 'mmas', 'numIterations': 1000})
+    resultado = executar_colonia('dj38.tsp', parametros['rounded'], semente=semente, **parametros['solver'])
+
+    assert resultado['motivo_parada'] == 'estagnacao'
+    assert criadas[0].reinicios >= 1
+    #a parada vem pelo menos max_stagnation iterações depois do reinicio, nunca logo em seguida (um reinicio na
+    #própria iteração da parada não conta, a colônia não chegou a rodar depois dele).
+    ultimo_reinicio = max(iteracao for iteracao in criadas[0].iteracoes_reinicio if iteracao < resultado['iteracoes'])
+    assert resultado['iteracoes'] - ultimo_reinicio >= parametros['solver']['max_stagnation']
+
+
+#as iterações devolvidas são as feitas pelo solver, o mesmo tamanho dos históricos de fitness.
+def test_iteracoes_da_parada_por_estagnacao():
+    resultado = executar_colonia('dj38.tsp', max_stagnation=20, num_iteracoes=500, num_formigas=10, semente=1)
+
+    assert resultado['motivo_parada'] == 'estagnacao'
+    assert resultado['iteracoes'] == len(resultado['best_fitnesses'])
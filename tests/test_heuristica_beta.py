@@ -0,0 +1,11 @@
+from tsp_solver import obter_instancia, obter_heuristica_beta, MAX_HEURISTICAS_BETA
+
+
+#uma varredura com beta sorteado não pode deixar uma matriz n x n na instância para cada beta.
+def test_cache_de_heuristica_beta_e_limitado():
+    _, _, instancia = obter_instancia('dj38.tsp')
+    for beta in (1.5, 2.25, 3.125, 4.0625):
+        obter_heuristica_beta(instancia, beta)
+
+    assert list(instancia['heuristica_beta']) == [3.125, 4.0625][-MAX_HEURISTICAS_BETA:]
+    assert obter_heuristica_beta(instancia, 4.0625) is instancia['heuristica_beta'][4.0625]
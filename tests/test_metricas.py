@@ -0,0 +1,17 @@
+from metricas import Instrumentacao
+from tsp_solver import obter_instancia, algoritmo_colonia_formigas_sse
+
+
+#com as formigas construídas nos workers, os contadores e o tempo de cada fase continuam sendo medidos.
+def test_instrumentacao_com_workers():
+    _, _, instancia = obter_instancia('lin318.tsp')
+    instrumentacao = Instrumentacao()
+    for _ in algoritmo_colonia_formigas_sse(None, None, [], [], [], instancia=instancia, num_iteracoes=3,
+                                            num_formigas=10, num_workers=2, k_vizinhos=10, semente=1,
+                                            instrumentacao=instrumentacao):
+        pass
+
+    assert instrumentacao.totais['formigas'] == 30
+    assert instrumentacao.totais['fases']['construcao'] > 0
+    assert instrumentacao.totais['fases']['avaliacao'] > 0
+    assert instrumentacao.ultima['avaliacoes_probabilidade'] > 0
@@ -0,0 +1,33 @@
+import time
+from ilhas import algoritmo_ilhas
+from tsp_solver import executar_colonia
+
+
+#uma execução que chega depois do prazo final não começa: volta pulada, sem iterações nem rota.
+def test_execucao_depois_do_prazo_e_pulada():
+    resultado = executar_colonia('dj38.tsp', prazo_final=time.time() - 1, num_iteracoes=100, semente=1)
+
+    assert resultado['pulada'] and resultado['iteracoes'] == 0
+    assert resultado['melhor_rota'] is None and resultado['motivo_parada'] == 'prazo'
+
+
+#com o prazo final dentro da execução, ela roda (pelo menos uma iteração) e para nele.
+def test_execucao_para_no_prazo_final():
+    inicio = time.time()
+    resultado = executar_colonia('lin318.tsp', prazo_final=inicio + 0.3, num_iteracoes=100000, max_stagnation=0,
+                                 semente=1)
+
+    assert not resultado['pulada'] and resultado['iteracoes'] >= 1
+    assert resultado['motivo_parada'] == 'prazo'
+    assert time.time() - inicio < 1
+
+
+#com o prazo já acabado nenhuma ilha começa (nem o processo dela), e todas voltam puladas.
+def test_ilhas_depois_do_prazo_sao_puladas():
+    resultado = {}
+    eventos = list(algoritmo_ilhas('dj38.tsp', num_ilhas=3, resultado=resultado, prazo_final=time.time() - 1,
+                                   num_iteracoes=100))
+
+    assert eventos == []
+    assert resultado['melhor_rota'] is None
+    assert [ilha['pulada'] for ilha in resultado['ilhas']] == [True, True, True]
@@ -0,0 +1,103 @@
+import time
+import pytest
+from instancia_grande import gerar_instancia
+from tsp_solver import obter_instancia
+from visualizacao import payload_grafo, MAX_ARESTAS_COMPLETO, LIMITE_ARESTAS
+
+#limites do payload de uma instância de 50 mil cidades: tamanho (em KB, sem e com gzip) e tempo para montar.
+LIMITES_PAYLOAD = {
+    'auto': (1600, 600),
+    'cidades': (1600, 600),
+    'amostra': (2600, 1000),
+    'vizinhos': (9500, 2600),
+}
+SEGUNDOS_PARA_MONTAR = 5
+
+#limites do payload das instâncias que vêm com o projeto, por modo: tamanho (em KB, sem e com gzip), com folga de
+#uns 50% sobre o medido. O 'auto' dá 'completo' na dj38 e na d198 (cabem em LIMITE_ARESTAS) e 'vizinhos' na lin318.
+LIMITES_INSTANCIAS = {
+    ('dj38.tsp', 'auto'): (60, 10),
+    ('dj38.tsp', 'completo'): (60, 10),
+    ('dj38.tsp', 'vizinhos'): (12, 3),
+    ('dj38.tsp', 'amostra'): (60, 10),
+    ('dj38.tsp', 'cidades'): (4, 2),
+    ('d198.tsp', 'auto'): (1100, 55),
+    ('d198.tsp', 'completo'): (1100, 55),
+    ('d198.tsp', 'vizinhos'): (40, 6),
+    ('d198.tsp', 'amostra'): (1100, 55),
+    ('d198.tsp', 'cidades'): (8, 3),
+    ('lin318.tsp', 'auto'): (64, 8),
+    ('lin318.tsp', 'completo'): (2700, 150),
+    ('lin318.tsp', 'vizinhos'): (64, 8),
+    ('lin318.tsp', 'amostra'): (1100, 120),
+    ('lin318.tsp', 'cidades'): (10, 3),
+}
+SEGUNDOS_PARA_MONTAR_INSTANCIA = 1
+
+
+@pytest.fixture(scope='module')
+def instancia_grande(tmp_path_factory):
+    caminho = gerar_instancia(str(tmp_path_factory.mktemp('instancias') / 'r50000.tsp'), 50000)
+    _, _, instancia = obter_instancia(caminho, True)
+    return instancia
+
+
+@pytest.mark.parametrize('modo', sorted(LIMITES_PAYLOAD))
+def test_payload_de_instancia_grande_cabe_nos_limites(instancia_grande, modo):
+    inicio = time.perf_counter()
+    payload = payload_grafo(instancia_grande, modo)
+    tempo = time.perf_counter() - inicio
+    limite, limite_gzip = LIMITES_PAYLOAD[modo]
+
+    assert len(payload.corpo) // 1024 <= limite
+    assert len(payload.corpo_gzip) // 1024 <= limite_gzip
+    assert tempo <= SEGUNDOS_PARA_MONTAR
+    #a segunda vez sai do cache, sem montar nada.
+    assert payload_grafo(instancia_grande, modo) is payload
+
+
+#tamanho (sem e com gzip) e tempo para montar o payload de cada modo nas instâncias do projeto, montado do zero (sem o
+#cache da instância). Os valores medidos vão para o relatório do pytest (record_property, ex: --junitxml).
+@pytest.mark.parametrize('nome, modo', sorted(LIMITES_INSTANCIAS))
+def test_payload_das_instancias_do_projeto(nome, modo, record_property):
+    _, _, instancia = obter_instancia(nome)
+    instancia.pop('visualizacao', None)
+    inicio = time.perf_counter()
+    payload = payload_grafo(instancia, modo)
+    tempo = time.perf_counter() - inicio
+    limite, limite_gzip = LIMITES_INSTANCIAS[nome, modo]
+
+    record_property('kb', len(payload.corpo) / 1024)
+    record_property('kb_gzip', len(payload.corpo_gzip) / 1024)
+    record_property('ms', 1000 * tempo)
+    assert len(payload.corpo) // 1024 <= limite
+    assert len(payload.corpo_gzip) // 1024 <= limite_gzip
+    assert tempo <= SEGUNDOS_PARA_MONTAR_INSTANCIA
+
+
+def test_grafo_completo_de_instancia_grande_e_recusado(instancia_grande):
+    with pytest.raises(ValueError):
+        payload_grafo(instancia_grande, 'completo')
+
+
+#n·k acima de MAX_ARESTAS_COMPLETO é recusado, e um k maior que o da instância não mexe nos vizinhos dela (que são
+#os das execuções).
+def test_k_do_modo_vizinhos(instancia_grande):
+    n = len(instancia_grande['cidades'])
+    with pytest.raises(ValueError):
+        payload_grafo(instancia_grande, 'vizinhos', MAX_ARESTAS_COMPLETO // n + 1)
+    with pytest.raises(ValueError):
+        payload_grafo(instancia_grande, 'vizinhos', 0)
+
+    vizinhos, distancias = instancia_grande['vizinhos'], instancia_grande['distancias_vizinhos']
+    k = MAX_ARESTAS_COMPLETO // n
+    payload = payload_grafo(instancia_grande, 'vizinhos', k)
+    assert payload.corpo.count(b'null') >= MAX_ARESTAS_COMPLETO // 2
+    assert instancia_grande['vizinhos'] is vizinhos and instancia_grande['distancias_vizinhos'] is distancias
+    assert 'vizinhos_ampliados' not in instancia_grande
+
+
+def test_amostra_tem_limite_arestas():
+    _, _, instancia = obter_instancia('lin318.tsp')
+    payload = payload_grafo(instancia, 'amostra')
+    assert payload.corpo.count(b'null') == 2 * LIMITE_ARESTAS #um null depois de cada aresta, no x e no y.
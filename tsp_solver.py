@@ -2,50 +2,195 @@ import networkx as nx #Biblioteca para interpretação do dataset, contendo a es
 import tsplib95 #Biblioteca para leitura dos datasets
 import numpy as np #Biblioteca numpy para realizar a raiz quadrada na função de custo
 import random #Biblioteca de randomização
-from flask import jsonify #Biblioteca para interface, neste caso especificamente para trabalhar com json.
+import time #Biblioteca de tempo, para medir quanto cada fase de uma iteração demora
+
+try: #KD-tree do scipy para os vizinhos mais próximos, se não estiver instalado usa a matriz de distâncias.
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+from busca_local import aplicar_busca_local, preparar_distancias
+from instancia_grande import LIMITE_INSTANCIA_DENSA, ELEMENTOS_POR_BLOCO, dimensao_do_arquivo, construir_instancia_grande, \
+    distancias_pares, distancias_rotas, cidades_mais_proximas
+
+K_VIZINHOS_PADRAO = 20 #quantidade de vizinhos candidatos calculados ao carregar a instância.
+K_VIZINHOS_BUSCA_LOCAL = 10 #vizinhos testados pela busca local quando o modo de candidatos não está ligado.
+MAX_HEURISTICAS_BETA = 2 #matrizes heurística^beta guardadas por instância (ver obter_heuristica_beta).
+
+#grande escolhe o modo de instância grande (ver instancia_grande.py): None decide pelo tamanho do arquivo, e no modo
+#grande não existe grafo nem problem (voltam None), só a instância.
+def carregar_problema(nome_arquivo, arredondar=False, grande=None): #Função para carregar e interpretar o dataset.
+    if grande is None:
+        grande = dimensao_do_arquivo(nome_arquivo) > LIMITE_INSTANCIA_DENSA
+    if grande:
+        return None, None, construir_instancia_grande(nome_arquivo, arredondar, K_VIZINHOS_PADRAO, calcular_vizinhos)
 
-def carregar_problema(nome_arquivo): #Função para carregar e interpretar o dataset.
     problem = tsplib95.load(nome_arquivo) #Ele armazena dentro de problem o arquivo carregado de acordo com o nome selecionado
     G = nx.Graph() #Gera a estrutura em grafo
 
     for i, j in problem.get_edges(): #loop entre todas as combinações entre todos os pontos, o objetivo é mapear todas as arestas existentes
         G.add_edge(i, j, weight=problem.get_weight(i, j)) #e aqui adiciona o peso, no momento, é null, mas será direcionado futuramente
 
-    return G, problem #retorna o grafo e o problema.
+    instancia = construir_matrizes(problem, arredondar) #matrizes de distância e heurística, calculadas uma única vez.
+    return G, problem, instancia #retorna o grafo, o problema e as matrizes da instância.
+
+
+#As formigas trabalham com índices (0 até n-1) e não com os rótulos das cidades do arquivo (que começam em 1),
+#assim toda consulta de distância ou heurística vira uma simples indexação de array.
+#A matriz de distâncias é calculada de uma vez só com numpy (broadcasting), no lugar de chamar a distância
+#euclidiana cidade por cidade a cada passo de cada formiga.
+#Se arredondar for True, usa o peso oficial do TSPLIB (o mesmo de problem.get_weight, ex: nint no EUC_2D),
+#para que as distâncias reportadas batam com os ótimos publicados.
+def construir_matrizes(problem, arredondar=False):
+    cidades = np.array(list(problem.get_nodes())) #rótulos originais, cidades[indice] devolve o rótulo.
+    coordenadas = np.array([problem.node_coords[i] for i in cidades], dtype=np.float64)
+
+    diferencas = coordenadas[:, None, :] - coordenadas[None, :, :]
+    distancias = np.sqrt((diferencas ** 2).sum(axis=2))
+    if arredondar:
+        if problem.edge_weight_type == 'EUC_2D':
+            distancias = np.floor(distancias + 0.5) #nint do TSPLIB, igual ao get_weight, mas vetorizado.
+        else:
+            for a in range(len(cidades)):
+                for b in range(a + 1, len(cidades)):
+                    distancias[a, b] = distancias[b, a] = problem.get_weight(int(cidades[a]), int(cidades[b]))
+
+    #heurística eta = 1/d, cidades repetidas (d = 0) recebem uma distância mínima para não dividir por zero
+    #e a diagonal fica em 0, já que a formiga nunca volta para a própria cidade.
+    heuristica = 1.0 / np.maximum(distancias, 1e-10)
+    np.fill_diagonal(heuristica, 0.0)
+
+    return {
+        'cidades': cidades,
+        'vizinhos': calcular_vizinhos(coordenadas, K_VIZINHOS_PADRAO, distancias),
+        'indices': {int(cidade): indice for indice, cidade in enumerate(cidades)},
+        'coordenadas': coordenadas,
+        'distancias': distancias,
+        'heuristica': heuristica,
+    }
+
+
+#Lista dos k vizinhos mais próximos de cada cidade (em índices, do mais perto para o mais longe), usada no modo
+#de lista de candidatos. Com o scipy disponível usa uma KD-tree, senão ordena parcialmente a matriz de distâncias
+#(sem a matriz, calcula as distâncias em blocos de linhas, para não criar nada n x n).
+def calcular_vizinhos(coordenadas, k, distancias=None):
+    n = len(coordenadas)
+    k = min(k, n - 1)
+    if cKDTree is not None:
+        _, vizinhos = cKDTree(coordenadas).query(coordenadas, k=k + 1) #k + 1 porque a própria cidade vem junto.
+        #em cidades repetidas a própria cidade pode não vir na primeira coluna, então ela é retirada pelo valor.
+        proprias = vizinhos == np.arange(n)[:, None]
+        proprias[proprias.sum(axis=1) == 0, -1] = True
+        return vizinhos[~proprias].reshape(n, k)
+    if distancias is None:
+        bloco = max(1, ELEMENTOS_POR_BLOCO // n)
+        return np.concatenate([
+            vizinhos_por_distancia(np.sqrt(((coordenadas[inicio:inicio + bloco, None, :] -
+                                             coordenadas[None, :, :]) ** 2).sum(axis=2)), k, inicio)
+            for inicio in range(0, n, bloco)])
+    return vizinhos_por_distancia(distancias, k)
+
+
+#k vizinhos de cada linha de distâncias (as linhas são das cidades primeira, primeira + 1, ...).
+def vizinhos_por_distancia(distancias, k, primeira=0):
+    linhas = np.arange(len(distancias))
+    distancias = distancias.copy()
+    distancias[linhas, primeira + linhas] = np.inf #a própria cidade nunca é vizinha dela mesma.
+    vizinhos = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+    ordem = np.argsort(np.take_along_axis(distancias, vizinhos, axis=1), axis=1)
+    return np.take_along_axis(vizinhos, ordem, axis=1)
+
+
+#o modo de candidatos pode pedir um k maior que o calculado no carregamento, aí recalcula só nesse caso.
+#A instância é compartilhada entre execuções (e threads), então 'vizinhos' e 'distancias_vizinhos' nunca são trocados:
+#a lista maior fica em 'vizinhos_ampliados', guardada de uma vez só, e quem precisa das distâncias até os vizinhos
+#calcula para a lista que recebeu (distancias_dos_vizinhos).
+def obter_vizinhos(instancia, k):
+    k = min(k, len(instancia['cidades']) - 1)
+    if k <= instancia['vizinhos'].shape[1]:
+        return instancia['vizinhos'][:, :k]
+    ampliados = instancia.get('vizinhos_ampliados')
+    if ampliados is None or k > ampliados.shape[1]:
+        ampliados = calcular_vizinhos(instancia['coordenadas'], k, instancia.get('distancias'))
+        instancia['vizinhos_ampliados'] = ampliados
+    return ampliados[:, :k]
+
+
+#distância de cada cidade até cada um dos vizinhos (n x k) da lista dada, calculada das coordenadas.
+def distancias_dos_vizinhos(instancia, vizinhos):
+    return distancias_pares(instancia, np.arange(len(vizinhos))[:, None], vizinhos)
+
+
+#Comprimento da rota do vizinho mais próximo (começando da primeira cidade, sempre indo para a cidade não visitada
+#mais perto). É uma estimativa rápida do tamanho de uma rota boa, usada para escolher o feromonio inicial.
+def comprimento_vizinho_mais_proximo(distancias):
+    n = len(distancias)
+    visitadas = np.zeros(n, dtype=bool)
+    atual, total = 0, 0.0
+    visitadas[0] = True
+    for _ in range(n - 1):
+        linha = np.where(visitadas, np.inf, distancias[atual])
+        proxima = int(np.argmin(linha))
+        total += linha[proxima]
+        visitadas[proxima] = True
+        atual = proxima
+    return total + distancias[atual, 0]
+
+
+#o comprimento do vizinho mais próximo fica guardado na instância (as estratégias usam em toda execução).
+#Na instância grande, sem a matriz de distâncias, a rota é a de uma formiga gulosa (q0 = 1) que só olha os vizinhos
+#candidatos, que é a mesma coisa: o vizinho livre mais perto, ou a cidade livre mais perto quando nenhum está livre.
+def obter_comprimento_vizinho_mais_proximo(instancia):
+    if 'comprimento_vizinho_mais_proximo' not in instancia:
+        if instancia.get('grande'):
+            vizinhos = instancia['vizinhos']
+            rota = construir_rotas_vetorizado(
+                1, 1.0 / np.maximum(instancia['distancias_vizinhos'], 1e-10), None, np.random.default_rng(0),
+                vizinhos, q0=1.0, mais_proxima=lambda atuais, visitadas: cidades_mais_proximas(
+                    instancia, atuais, visitadas))
+            instancia['comprimento_vizinho_mais_proximo'] = float(distancias_rotas(instancia, rota)[0])
+        else:
+            instancia['comprimento_vizinho_mais_proximo'] = comprimento_vizinho_mais_proximo(instancia['distancias'])
+    return instancia['comprimento_vizinho_mais_proximo']
+
 
+#mesma conta do calcular_distancia_total, mas para várias rotas de uma vez (uma rota por linha).
+def calcular_distancias_rotas(rotas, distancias):
+    return distancias[rotas, np.roll(rotas, -1, axis=1)].sum(axis=1)
 
-def calculo_distancia_euclidiana(coord1, coord2): #função para o cálculo da distância euclidiana dita no enunciado do algoritmo
-    return np.sqrt((coord1[0] - coord2[0]) ** 2 + (coord1[1] - coord2[1]) ** 2)
+
+#distâncias das rotas pela matriz da instância ou, na instância grande, calculadas das coordenadas.
+def avaliar_rotas(rotas, instancia):
+    if instancia.get('grande'):
+        return distancias_rotas(instancia, rotas)
+    return calcular_distancias_rotas(rotas, instancia['distancias'])
 
 
 #Para calcular a distancia total, ele deve percorrer por todos os itens do array rota
-#o array rota contém a ordem de acesso das cidades, no final ele pega o ultimo elemento do array e o primeiro
-#para completar o loop.
-def calcular_distancia_total(rota, coordenadas):
-    distancia_total = 0
-    n = len(rota)
-    for i in range(n - 1):
-        cidade_atual = rota[i]
-        proxima_cidade = rota[i + 1]
-        distancia_total += calculo_distancia_euclidiana(coordenadas[cidade_atual], coordenadas[proxima_cidade])
-    distancia_total += calculo_distancia_euclidiana(coordenadas[rota[-1]], coordenadas[rota[0]])
-    return distancia_total
+#o array rota contém a ordem de acesso das cidades (em índices), no final ele pega o ultimo elemento do array e o primeiro
+#para completar o loop. O np.roll faz exatamente isso: desloca a rota em uma posição, então cada cidade fica pareada
+#com a próxima e a última com a primeira, e a soma é feita de uma vez na matriz de distâncias.
+def calcular_distancia_total(rota, distancias):
+    rota = np.asarray(rota)
+    return float(distancias[rota, np.roll(rota, -1)].sum())
 
 #Essa é a função para construir a rota da formiga, ela tem como influência o feromonio deixado pelas outras
 #iterações, o alfa qu é o quanto elas serão influenciadas pelo feromonio (valor de 0,1 até 5), e o beta
 # que é um valor que influência se a escolha irá para rotas mais curtas ou mais longas.
-def construir_rota(cidades, feromonio, coordenadas, alfa, beta):
+#gerador é o random.Random usado nos sorteios (o módulo random, se não vier nenhum).
+def construir_rota(cidades, informacao, heuristica, vizinhos=None, gerador=random):
     rota = []
     cidades_nao_visitadas = set(cidades)
-    cidade_atual = random.choice(list(cidades_nao_visitadas)) #inicializa a formiga em algum local aleatório.
+    cidade_atual = gerador.choice(list(cidades_nao_visitadas)) #inicializa a formiga em algum local aleatório.
     rota.append(cidade_atual) #primeira cidade.
     cidades_nao_visitadas.remove(cidade_atual) #remoção da cidade inicial, já que ela já foi visitada.
 
     #enquanto existir cidades que não foram visitadas, ele irá realizar o loop.
     while cidades_nao_visitadas:
         #Ele seleciona a próxima cidade, passando como parâmetros qual a cidade que a formiga está, a lista das
-        #cidades que não foram visitadas, o feromonio de todas as arestas, as coordenadas dos nós, alfa e beta.
-        proxima_cidade = escolher_proxima_cidade(cidade_atual, cidades_nao_visitadas, feromonio, coordenadas, alfa, beta)
+        #cidades que não foram visitadas, a informação de escolha (feromonio^alfa * heuristica^beta) e a heurística.
+        proxima_cidade = escolher_proxima_cidade(cidade_atual, cidades_nao_visitadas, informacao, heuristica, vizinhos,
+                                                 gerador)
         #adiciona no array de rota
         rota.append(proxima_cidade)
         #remove da lista de não visitadas
@@ -56,178 +201,266 @@ def construir_rota(cidades, feromonio, coordenadas, alfa, beta):
 
 
 #Aqui é a lógica para escolha das cidades, recebendo qual a cidade que a formiga tá, quais as opções
-#de caminho que ela pode ir, quais são os feromonios de todas as arestas, as coordenadas existentes
+#de caminho que ela pode ir, quais são os feromonios de todas as arestas, a matriz de heurística
 #alfa e beta.
 
 #este algoritmo utiliza de uma função heurística, uma medida de qualidade baseada na distância entre
 #as cidades, é o inverso da distância euclidiana, cidades mais próximas terão uma heurística maior
-#cidades mais distantes terão uma heurística menor.
+#cidades mais distantes terão uma heurística menor. Ela já vem pronta da matriz calculada em construir_matrizes.
 
 #a ideia é que cidades mais longes recebam um valor menor, enquanto cidades próximas recebam um valor maior
 #priorizando as cidades mais próximas, porém mantendo o valor de influência.
-def escolher_proxima_cidade(cidade_atual, cidades_nao_visitadas, feromonio, coordenadas, alfa, beta):
-    probabilidades = [] #array que armazenará as probabilidades de acesso, ele é relativo a posição exata em cidades não visitadas.
-    somatorio = 0
-    for cidade in cidades_nao_visitadas:
-
-        #primeiramente antes de calcular o quanto eles vão influênciar, tem que fazer os calculos deles.
-        #então primeiro busca o feromonio, min e max servem para manter as chaves independente da ordem, ou seja
-        # 2, 5 é o mesmo que 5, 2, evitando valores de feromonio diferentes já que o caminho dos grafos não importa
-        feromonio_atual = feromonio.get((min(cidade_atual, cidade), max(cidade_atual, cidade)), 1)
-        #agora vem o valor entre 0 e 1, cidades com distância menor tem um valor mais próximo de 1, enquanto
-        #cidades com distância maior, tem valores mais próximos de 0
-        heuristica = 1.0 / calculo_distancia_euclidiana(coordenadas[cidade_atual], coordenadas[cidade])
-        #e aqui é o gatilho, a formula trabalhada aqui é o valor do feromonio^2 * heurística^2
-        # se o valor de beta for maior ou igual a 1, a influência entre as cidades será maior!
-        # já se for menor, ainda terá uma influência, mas é bem menos relevante entre as outras.
-        valor = (feromonio_atual ** alfa) * (heuristica ** beta)
-        # O somatório irá servir como uma forma de normalização, já que a soma das probabilidades de todos os caminhos
-        # tem que dar no máximo 1, ou seja, 100%.
-        somatorio += valor
-        probabilidades.append((cidade, valor))
-    #se o somatório for 0, ou seja, beta muito grande e alfa muito pequeno, ele considera 1.0 como valor.
-    #e divide pela quantidade de cidades, igualando a probabilidade para cada cidade.
 
-    # essa parte é equivalente a criação de um array normalizado das proabilidades, para cada cidade não visitada,
-    # ele pega o valor que foi retirado e divide pelo somatório de todos os valores.
+#com a lista de vizinhos (modo de candidatos), a formiga só considera os k vizinhos mais próximos que ainda
+#não foram visitados, e se todos já foram, vai direto para a cidade não visitada mais próxima.
+def escolher_proxima_cidade(cidade_atual, cidades_nao_visitadas, informacao, heuristica, vizinhos=None,
+                            gerador=random):
+    if vizinhos is not None:
+        candidatas = [int(cidade) for cidade in vizinhos[cidade_atual] if cidade in cidades_nao_visitadas]
+        if not candidatas:
+            restantes = list(cidades_nao_visitadas)
+            return restantes[int(np.argmax(heuristica[cidade_atual, restantes]))]
+    else:
+        candidatas = list(cidades_nao_visitadas) #a posição em candidatas é a mesma posição em valores.
+
+    #o valor de cada cidade é o feromonio^alfa * heurística^beta, que já vem pronto da matriz de informação de escolha
+    #(calculada uma vez por iteração, ver atualizar_informacao_escolha), é só buscar na linha da cidade atual.
+    # se o valor de beta for maior ou igual a 1, a influência entre as cidades será maior!
+    # já se for menor, ainda terá uma influência, mas é bem menos relevante entre as outras.
+    valores = informacao[cidade_atual, candidatas]
+    # O somatório irá servir como uma forma de normalização, já que a soma das probabilidades de todos os caminhos
+    # tem que dar no máximo 1, ou seja, 100%.
+    somatorio = valores.sum()
 
+    #se o somatório for 0, ou seja, beta muito grande e alfa muito pequeno, ele considera 1.0 como valor.
+    #e divide pela quantidade de cidades, igualando a probabilidade para cada cidade.
+    #caso contrário, para cada cidade não visitada, ele pega o valor e divide pelo somatório de todos os valores.
     #para exemplificar, vamos supor que o somatório de probabilidade de escolha entre 2 cidades deu 11.
     # uma cidade o valor é 5 a outra é 6, a probabilidade de escolher após realizar esse calculo, a cidade
     # com o valor 5 é de 0,45, já a com valor 6, a probabilidade é de 0,54, ou seja, 45% e 54% respectivamente.
-    # por causa dessa divisão, os valores foram normalizados para probabilidades.
     if somatorio == 0:
-        probabilidades = [(cidade, 1.0 / len(cidades_nao_visitadas)) for cidade in cidades_nao_visitadas]
+        probabilidades = np.full(len(candidatas), 1.0 / len(candidatas))
     else:
-        probabilidades = [(cidade, valor / somatorio) for cidade, valor in probabilidades]
+        probabilidades = valores / somatorio
 
     #e aqui é a linha onde faz a escolha propriamente dita, levando em consideração o peso em weights.
-    proxima_cidade = random.choices([cidade for cidade, _ in probabilidades], weights=[p for _, p in probabilidades])[0]
+    proxima_cidade = gerador.choices(candidatas, weights=probabilidades)[0]
     return proxima_cidade
 
+#Motor vetorizado: no lugar de construir uma formiga por vez, todas as formigas andam juntas, um passo por vez.
+#visitadas é uma máscara booleana (formigas x cidades), cada linha é uma formiga, e cada passo faz uma única
+#roleta para todas elas: soma acumulada das linhas + searchsorted.
+#A distribuição é a mesma do construir_rota: cidade inicial uniforme e, depois, probabilidade proporcional à
+#informação de escolha (feromonio^alfa * heuristica^beta) entre as não visitadas (ou uniforme se o somatório der 0).
+#No modo de candidatos (vizinhos), cada formiga sorteia só entre os seus k vizinhos livres, e as que não têm
+#nenhum vizinho livre vão para a cidade não visitada mais próxima, igual ao escolher_proxima_cidade.
+#Com q0 > 0 (regra pseudo-aleatória proporcional do Ant Colony System), a cada passo cada formiga tem chance q0
+#de ir direto para a cidade de maior valor, e só no resto das vezes faz a roleta.
+#atualizacao_local, se vier, é chamada depois de cada passo com as arestas (origens, destinos) que as formigas
+#acabaram de percorrer (é onde o ACS faz a atualização local do feromonio e da informação de escolha).
+#contadores, se vier (ver metricas.Instrumentacao), soma quantas probabilidades foram avaliadas e quantas vezes uma
+#formiga ficou sem vizinho candidato livre.
+#Sem heuristica (instância grande), a informação de escolha é esparsa, n x k e alinhada com vizinhos, e a cidade mais
+#próxima das formigas sem vizinho livre vem de mais_proxima(atuais, visitadas).
+def construir_rotas_vetorizado(num_formigas, informacao, heuristica, rng, vizinhos=None, q0=0.0,
+                               atualizacao_local=None, contadores=None, mais_proxima=None):
+    n = informacao.shape[0]
+    formigas = np.arange(num_formigas)
+    rotas = np.empty((num_formigas, n), dtype=np.intp)
+    visitadas = np.zeros((num_formigas, n), dtype=bool)
+
+    atuais = rng.integers(n, size=num_formigas) #cada formiga começa em uma cidade aleatória.
+    rotas[:, 0] = atuais
+    visitadas[formigas, atuais] = True
+
+    for passo in range(1, n):
+        if vizinhos is None:
+            valores = informacao[atuais] #linha da cidade atual de cada formiga (já é uma cópia).
+            valores[visitadas] = 0.0
+            #formigas com somatório 0 escolhem de forma uniforme entre as não visitadas, igual ao escalar.
+            zeradas = valores.sum(axis=1) <= 0
+            valores[zeradas] = ~visitadas[zeradas]
+            proximas = sortear_por_linha(valores, rng, q0)
+            if contadores is not None:
+                contadores['avaliacoes_probabilidade'] += valores.size
+        else:
+            candidatas = vizinhos[atuais] #(formigas x k)
+            livres = ~visitadas[formigas[:, None], candidatas]
+            proximas = np.empty(num_formigas, dtype=np.intp)
+
+            com_candidata = np.flatnonzero(livres.any(axis=1))
+            if com_candidata.size:
+                if heuristica is None:
+                    valores = informacao[atuais[com_candidata]] * livres[com_candidata]
+                else:
+                    valores = informacao[atuais[com_candidata, None], candidatas[com_candidata]] * livres[com_candidata]
+                zeradas = valores.sum(axis=1) <= 0
+                valores[zeradas] = livres[com_candidata][zeradas]
+                proximas[com_candidata] = candidatas[com_candidata, sortear_por_linha(valores, rng, q0)]
+
+            sem_candidata = np.flatnonzero(~livres.any(axis=1))
+            if sem_candidata.size and heuristica is None:
+                proximas[sem_candidata] = mais_proxima(atuais[sem_candidata], visitadas[sem_candidata])
+            elif sem_candidata.size:
+                proximidade = heuristica[atuais[sem_candidata]]
+                proximidade[visitadas[sem_candidata]] = -1.0
+                proximas[sem_candidata] = np.argmax(proximidade, axis=1)
+            if contadores is not None:
+                contadores['avaliacoes_probabilidade'] += com_candidata.size * candidatas.shape[1]
+                contadores['fallbacks_candidatos'] += sem_candidata.size
+
+        rotas[:, passo] = proximas
+        visitadas[formigas, proximas] = True
+        if atualizacao_local is not None:
+            atualizacao_local(atuais, proximas)
+        atuais = proximas
+
+    if atualizacao_local is not None: #aresta que fecha o ciclo, da última cidade de volta para a primeira.
+        atualizacao_local(atuais, rotas[:, 0])
+    return rotas
+
+
+#Roleta de todas as linhas de uma vez: cada linha de valores (pesos, já zerados onde não pode escolher) é
+#acumulada, normalizada para [0, 1] e deslocada pelo número da linha, assim o array achatado fica ordenado e
+#um único searchsorted sorteia uma coluna por linha. Toda linha precisa ter pelo menos um valor positivo.
+#Com q0 > 0, cada linha tem chance q0 de ficar com a coluna de maior valor, sem roleta.
+def sortear_por_linha(valores, rng, q0=0.0):
+    num_linhas, num_colunas = valores.shape
+    linhas = np.arange(num_linhas)
+    acumulado = np.cumsum(valores, axis=1)
+    acumulado /= acumulado[:, -1:]
+    acumulado += linhas[:, None]
+    sorteios = linhas + rng.random(num_linhas)
+    escolhas = np.searchsorted(acumulado.ravel(), sorteios, side='right') - linhas * num_colunas
+    escolhas = np.minimum(escolhas, num_colunas - 1)
+
+    #arredondamento no fim da linha pode cair numa coluna de peso 0, nesse caso fica a última coluna válida.
+    for linha in np.flatnonzero(valores[linhas, escolhas] <= 0):
+        escolhas[linha] = np.flatnonzero(valores[linha])[-1]
+
+    if q0 > 0:
+        gulosas = np.flatnonzero(rng.random(num_linhas) < q0)
+        escolhas[gulosas] = np.argmax(valores[gulosas], axis=1)
+    return escolhas
+
+
 #função responsável por atualizar os feromonios no final, de acordo com a taxa de evaporação e o valor Q.
 #a evaporação é responsável por retirar os feromonios, o valor de Q é relativo a quantidade de feromonio que vai ser
 #depositado. é realmente para atualizar esses feromonios mesmo.
 
-#O calculo para cada aresta, ele multipica o valor atual do feromonio por 1-a taxa de evaporação.
+#O feromonio é uma matriz simétrica (n x n), feromonio[i, j] == feromonio[j, i], já que o caminho dos grafos não importa.
+#O calculo para cada aresta, ele multipica o valor atual do feromonio por 1-a taxa de evaporação, feito de uma vez
+#só na matriz inteira (multiplicação in-place, sem criar outra matriz).
 #a taxa de evaporação é entre 0 e 1, quanto mais próximo de 1, mais rápido o feromonio desaparece
-#e quanto mais próximo de 0, ele demora mais para sumir. (por que ele está diminuindo 1 pela taxa e guardando
-#a multiplicação pelo anterior.
+#e quanto mais próximo de 0, ele demora mais para sumir.
 
-#O zip ele junta todas as rotas com todas as distâncias, criando um par de chaves associado, em rota ele
-#guarda a rota, em distância ele guarda a distância relativo a rota que está trabalhando.
-#para cada rota, ele joga um feromonio em cada aresta, o calculo é Q dividido pela distância.
+#Depois, cada formiga joga um feromonio em cada aresta da sua rota, o calculo é Q dividido pela distância.
+#Todas as arestas de todas as formigas (incluindo a aresta que fecha o ciclo, da última cidade para a primeira,
+#a mesma que o calcular_distancia_total conta) são somadas de uma vez com o bincount, e a soma é espelhada
+#para manter a matriz simétrica.
 #Q é um valor de 1 a 1000, quanto mais próximo de 1 a taxa de feromonio depositado será menor
 #já quanto mais próximo de 1000, ele deposita muito mais feromonio.
 
 #esses parâmetros normalmente devem ser ajustados para cada problema.
-def atualizar_feromonios(feromonio, todas_rotas, todas_distancias, evaporacao, Q):
-    for edge in feromonio:
-        feromonio[edge] *= (1 - evaporacao)
-    for rota, distancia in zip(todas_rotas, todas_distancias):
-        for i in range(len(rota) - 1):
-            edge = (min(rota[i], rota[i + 1]), max(rota[i + 1], rota[i]))
-            feromonio[edge] += Q / distancia
+#Com candidatas (feromonio esparso da instância grande), só as arestas candidatas recebem depósito.
+def atualizar_feromonios(feromonio, todas_rotas, todas_distancias, evaporacao, Q, candidatas=None):
+    n = feromonio.shape[0]
+    feromonio *= (1 - evaporacao)
+
+    origens, destinos = arestas_das_rotas(todas_rotas)
+    depositos = np.repeat(Q / np.asarray(todas_distancias, dtype=np.float64), len(origens) // len(todas_distancias))
+    if candidatas is not None:
+        posicoes, arestas = candidatas.posicoes(origens, destinos)
+        feromonio += np.bincount(posicoes, weights=depositos[arestas],
+                                 minlength=feromonio.size).reshape(feromonio.shape)
+        return feromonio
+    deposito = np.bincount(origens * n + destinos, weights=depositos, minlength=n * n).reshape(n, n)
+    feromonio += deposito
+    feromonio += deposito.T
     return feromonio
 
-#função usada para gerar o grafo
-def visualizar_grafo_json(G, problem):
-    pos = {i: (problem.node_coords[i][0], problem.node_coords[i][1]) for i in G.nodes}
-    edges = list(G.edges)
-
-    node_x = [pos[i][0] for i in G.nodes]
-    node_y = [pos[i][1] for i in G.nodes]
-
-    node_trace = {
-        'x': node_x,
-        'y': node_y,
-        'mode': 'markers+text',
-        'text': [str(i) for i in G.nodes],
-        'textposition': 'top center',
-        'marker': {
-            'size': 10,
-            'color': 'blue',
-            'line': {'width': 2}
-        }
-    }
-
-    edge_x = []
-    edge_y = []
-    for edge in edges:
-        x0, y0 = pos[edge[0]]
-        x1, y1 = pos[edge[1]]
-        edge_x.extend([x0, x1, None])
-        edge_y.extend([y0, y1, None])
-
-    edge_trace = {
-        'x': edge_x,
-        'y': edge_y,
-        'line': {'width': 1, 'color': '#888'},
-        'mode': 'lines'
-    }
-
-    layout = {
-        'title': 'Visualização do Grafo TSP',
-        'showlegend': False,
-        'hovermode': 'closest',
-        'margin': {'b': 0, 'l': 0, 'r': 0, 't': 40},
-        'xaxis': {'showgrid': False, 'zeroline': False},
-        'yaxis': {'showgrid': False, 'zeroline': False},
-        'height': 600
-    }
 
-    return jsonify({'node_trace': node_trace, 'edge_trace': edge_trace, 'layout': layout})
-
-#mesma coisa, chatgpt puro.
-def visualizar_melhor_rota_json(G, problem, melhor_rota):
-    pos = {i: (problem.node_coords[i][0], problem.node_coords[i][1]) for i in G.nodes}
-
-    node_x = [pos[i][0] for i in G.nodes]
-    node_y = [pos[i][1] for i in G.nodes]
-
-    node_trace = {
-        'x': node_x,
-        'y': node_y,
-        'mode': 'markers+text',
-        'text': [str(i) for i in G.nodes],
-        'textposition': 'top center',
-        'marker': {
-            'size': 10,
-            'color': 'blue',
-            'line': {'width': 2}
-        }
-    }
-
-    edge_x = []
-    edge_y = []
-    for i in range(len(melhor_rota) - 1):
-        x0, y0 = pos[melhor_rota[i]]
-        x1, y1 = pos[melhor_rota[i + 1]]
-        edge_x.extend([x0, x1, None])
-        edge_y.extend([y0, y1, None])
-
-    x0, y0 = pos[melhor_rota[-1]]
-    x1, y1 = pos[melhor_rota[0]]
-    edge_x.extend([x0, x1, None])
-    edge_y.extend([y0, y1, None])
-
-    edge_trace = {
-        'x': edge_x,
-        'y': edge_y,
-        'line': {'width': 2, 'color': 'red'},
-        'mode': 'lines'
-    }
-
-    layout = {
-        'title': 'Melhor Rota Encontrada',
-        'showlegend': False,
-        'hovermode': 'closest',
-        'margin': {'b': 0, 'l': 0, 'r': 0, 't': 40},
-        'xaxis': {'showgrid': False, 'zeroline': False},
-        'yaxis': {'showgrid': False, 'zeroline': False},
-        'height': 600
-    }
-
-    return jsonify({'node_trace': node_trace, 'edge_trace': edge_trace, 'layout': layout})
+#todas as arestas (origem, destino) de um conjunto de rotas, incluindo a aresta que fecha cada ciclo.
+def arestas_das_rotas(rotas):
+    rotas = np.atleast_2d(np.asarray(rotas))
+    return rotas.ravel(), np.roll(rotas, -1, axis=1).ravel()
+
+
+#Feromonio esparso da instância grande: no lugar da matriz n x n, um array n x k em que feromonio[i, j] é a aresta
+#entre a cidade i e o seu j-ésimo vizinho candidato (vizinhos[i, j]). Só as arestas candidatas têm feromonio, e as
+#formigas só saem da lista de candidatos quando ela inteira já foi visitada (aí vão para a cidade livre mais perto).
+#Uma aresta (a, b) pode aparecer duas vezes, na linha de a (se b é vizinho de a) e na de b (se a é vizinho de b),
+#e as duas posições são sempre atualizadas juntas, igual à matriz simétrica.
+#As chaves (origem * n + destino) de todas as arestas candidatas ficam ordenadas, e achar a posição de uma aresta é
+#um searchsorted.
+class ArestasCandidatas:
+    def __init__(self, vizinhos):
+        n, k = vizinhos.shape
+        self.n = n
+        chaves = (np.arange(n)[:, None] * n + vizinhos).ravel()
+        self.ordem = np.argsort(chaves)
+        self.chaves = chaves[self.ordem]
+
+    #posições (no feromonio achatado) das arestas (origens, destinos) nos dois sentidos, e de qual aresta veio
+    #cada posição. Arestas fora das listas de candidatos não têm posição.
+    def posicoes(self, origens, destinos):
+        consultas = np.concatenate([origens * self.n + destinos, destinos * self.n + origens])
+        encontradas = np.minimum(np.searchsorted(self.chaves, consultas), len(self.chaves) - 1)
+        validas = np.flatnonzero(self.chaves[encontradas] == consultas)
+        return self.ordem[encontradas[validas]], validas % len(origens)
+
+
+#posições (no feromonio achatado) das arestas (origens, destinos) nos dois sentidos: [origem, destino] e
+#[destino, origem] na matriz densa, ou as posições das arestas candidatas no feromonio esparso.
+def posicoes_arestas(feromonio, origens, destinos, candidatas=None):
+    if candidatas is not None:
+        return candidatas.posicoes(origens, destinos)[0]
+    n = feromonio.shape[0]
+    return np.concatenate([origens * n + destinos, destinos * n + origens])
+
+
+#heurística^beta só depende da instância e do beta, então fica guardada na própria instância e é reaproveitada
+#entre execuções (inclusive nas repetições do /run_multiple_aco). Cada beta é uma matriz n x n, então só ficam as
+#MAX_HEURISTICAS_BETA calculadas por último (uma varredura com beta sorteado criaria uma nova a cada execução).
+#O dicionário nunca é alterado, só trocado por outro de uma vez, então execuções em outras threads podem ler o antigo.
+def obter_heuristica_beta(instancia, beta):
+    cache = instancia.get('heuristica_beta', {})
+    if beta in cache:
+        return cache[beta]
+    heuristica_beta = potencia(instancia['heuristica'], beta)
+    mantidas = list(cache.items())[-(MAX_HEURISTICAS_BETA - 1):]
+    instancia['heuristica_beta'] = dict(mantidas + [(beta, heuristica_beta)])
+    return heuristica_beta
+
+
+#Informação de escolha: feromonio^alfa * heuristica^beta, a matriz que todas as formigas consultam.
+#Ela só muda quando o feromonio é atualizado, então é mantida de uma iteração para outra no lugar de ser
+#recalculada por formiga. Quando a atualização multiplica todas as arestas pelo mesmo fator (a evaporação,
+#fator = 1 - evaporacao), (fator * feromonio)^alfa é fator^alfa * feromonio^alfa, então basta multiplicar a matriz
+#inteira por fator^alfa e recalcular a potência só nas arestas que receberam depósito (ex: depósito só da melhor formiga).
+#Sem arestas, ou quando o depósito toca uma fração grande da matriz (aí ordenar as arestas custa mais que a
+#potência), recalcula a matriz inteira, sempre no mesmo array (quem já tem a referência continua vendo os valores novos).
+#Na primeira vez (informacao None) cria a matriz. Com candidatas, o feromonio, a heurística e a informação são os
+#arrays esparsos (n x k) da instância grande.
+def atualizar_informacao_escolha(informacao, feromonio, heuristica_beta, alfa, fator=1.0, arestas=None,
+                                 candidatas=None):
+    if informacao is None:
+        return potencia(feromonio, alfa) * heuristica_beta
+    if arestas is None or 2 * len(arestas[0]) > feromonio.size // 8:
+        np.multiply(potencia(feromonio, alfa), heuristica_beta, out=informacao)
+        return informacao
+
+    if fator != 1:
+        informacao *= fator ** alfa
+    origens, destinos = arestas
+    tocadas = np.unique(posicoes_arestas(feromonio, origens, destinos, candidatas))
+    informacao.flat[tocadas] = potencia(feromonio.flat[tocadas], alfa) * heuristica_beta.flat[tocadas]
+    return informacao
+
+
+#com alfa = 1 (o padrão) a potência não muda nada, então nem é calculada.
+def potencia(valores, expoente):
+    return valores if expoente == 1 else valores ** expoente
 
 #Esse aqui é a primeira função do algoritmo em si, ela recebe o grafo, o problema, o melhor fitness (se tiver), o pior fitness (se tiver)
 #e a média, isso somente para fins de caso haja solução inicial instanciada.
@@ -236,14 +469,60 @@ def visualizar_melhor_rota_json(G, problem, melhor_rota):
 
 def algoritmo_colonia_formigas_sse(G, problem, best_fitnesses, worst_fitnesses, avg_fitnesses,
                                    solucao_inicial=None, alfa=1, beta=2, evaporacao=0.5, Q=10,
-                                   num_formigas=100, num_iteracoes=100, max_stagnation=1000):
-    coordenadas = problem.node_coords #Guardando as coordenadas dos nós.
-    feromonio = {edge: 1.0 for edge in G.edges} #Criação do feromonio inicial sendo de valor 1 para todas as arestas
-    cidades = list(G.nodes) #Guardando as cidades
+                                   num_formigas=100, num_iteracoes=100, max_stagnation=1000, instancia=None,
+                                   motor='vetorizado', semente=None, k_vizinhos=None, num_workers=1,
+                                   modo_busca_local=None, tempos=None, estrategia='as', parametros_estrategia=None,
+                                   instrumentacao=None, checkpoint=None, intervalo_checkpoint=50, retomar=None,
+                                   aquecimento=None, prazo_ms=None, distancia_alvo=None, parada=None,
+                                   migracao=None):
+    from estrategias import criar_estrategia
+    from checkpoint import salvar_checkpoint, carregar_checkpoint, validar_instancia, estado_estrategia, \
+        restaurar_estrategia
+
+    if instancia is None: #as matrizes normalmente já vêm do carregar_problema, mas se não vierem são calculadas aqui.
+        instancia = construir_matrizes(problem)
+    heuristica = instancia.get('heuristica') #Guardando a matriz de heurística (não existe na instância grande).
+    indices = instancia['indices']
+    cidades = list(range(len(instancia['cidades']))) #Guardando as cidades (em índices)
+    #com k_vizinhos, as formigas só escolhem entre os k vizinhos mais próximos (modo de lista de candidatos).
+    vizinhos = obter_vizinhos(instancia, k_vizinhos) if k_vizinhos else None
+    #Na instância grande (ver instancia_grande.py) o modo de candidatos é obrigatório, e o feromonio, a heurística e a
+    #informação de escolha só existem nas arestas candidatas (n x k). Só o motor vetorizado, sem workers e sem busca
+    #local (que precisa da matriz de distâncias), funciona assim.
+    candidatas = None
+    mais_proxima = None
+    if instancia.get('grande'):
+        if modo_busca_local:
+            raise ValueError("A busca local não está disponível no modo de instância grande.")
+        vizinhos = obter_vizinhos(instancia, k_vizinhos or K_VIZINHOS_PADRAO)
+        candidatas = ArestasCandidatas(vizinhos)
+        motor, num_workers = 'vetorizado', 1
+        def mais_proxima(atuais, visitadas):
+            return cidades_mais_proximas(instancia, atuais, visitadas)
+    #A estratégia ('as' Ant System, 'mmas' MAX-MIN Ant System, 'acs' Ant Colony System) define como o feromonio começa,
+    #como as formigas escolhem e como o feromonio é atualizado (ver estrategias.py).
+    nome_estrategia = estrategia
+    estrategia = criar_estrategia(estrategia, instancia, evaporacao, Q, candidatas, **(parametros_estrategia or {}))
+    #Criação do feromonio inicial, o mesmo valor para todas as arestas (1 no Ant System)
+    if candidatas is not None:
+        feromonio = np.full(vizinhos.shape, estrategia.feromonio_inicial())
+        heuristica_beta = potencia(1.0 / np.maximum(distancias_dos_vizinhos(instancia, vizinhos), 1e-10), beta)
+    else:
+        feromonio = np.full((len(cidades), len(cidades)), estrategia.feromonio_inicial())
+        heuristica_beta = obter_heuristica_beta(instancia, beta)
+    informacao = atualizar_informacao_escolha(None, feromonio, heuristica_beta, alfa)
+    rng = np.random.default_rng(semente) #gerador usado pelo motor vetorizado.
+    #gerador do motor escalar, próprio da execução: o módulo random é global, e outras execuções (threads) mexeriam nele.
+    gerador_escalar = random.Random(int(semente) if semente is not None else None)
+    #a busca local (2-opt + Or-opt) pode ser aplicada só na melhor formiga da iteração ('melhor') ou em todas ('todas').
+    if modo_busca_local:
+        vizinhos_busca = obter_vizinhos(instancia, k_vizinhos or K_VIZINHOS_BUSCA_LOCAL).tolist()
+        distancias_busca = preparar_distancias(instancia) #só desta execução, some junto com ela.
     melhor_rota = None #Variável para guardar a melhor rota encontrada
     melhor_distancia = float('inf') #instanciando como infinito positivo
     stagnation_counter = 0 #contador para manter o track (mapeamento) de quantas iterações foram realizadas sem melhoras
     previous_best_distance = float('inf')  #Melhor distância anterior, para comparar se houve melhora ou não.
+    reiniciou = False #se a estratégia já reiniciou o feromonio desde a última melhora (ver a parada por estagnação).
 
     #limpar os antigos melhores resultados.
     best_fitnesses.clear()
@@ -252,60 +531,297 @@ def algoritmo_colonia_formigas_sse(G, problem, best_fitnesses, worst_fitnesses,
 
     #se houver uma solução inicial, ele tem que guarda-la para poder trabalhar em cima dela comoo ponto de partida.
     if solucao_inicial:
-        melhor_rota = solucao_inicial
-        melhor_distancia = calcular_distancia_total(melhor_rota, coordenadas)
-
-    #para cada iteração, ele cria um array vazio de todas as rotas e todas as distâncias
+        melhor_rota = [indices[cidade] for cidade in solucao_inicial]
+        melhor_distancia = float(avaliar_rotas(np.array([melhor_rota]), instancia)[0])
+
+    #Checkpoints (ver checkpoint.py): com retomar, a execução continua exatamente de onde o checkpoint parou
+    #(feromonio, melhor rota, iteração, estagnação, gerador aleatório, históricos e estado da estratégia), até
+    #completar num_iteracoes no total. Com aquecimento, é uma execução nova que já começa com o feromonio e a melhor
+    #rota de uma execução anterior, no lugar do feromonio inicial da estratégia.
+    primeira_iteracao = 0
+    if retomar is not None or aquecimento is not None:
+        caminho = retomar if retomar is not None else aquecimento
+        estado = carregar_checkpoint(caminho)
+        validar_instancia(estado, instancia, caminho, feromonio.shape)
+        feromonio[:] = estado['feromonio']
+        if estado['melhor_rota'] is not None and estado['melhor_distancia'] < melhor_distancia:
+            melhor_rota = estado['melhor_rota']
+            melhor_distancia = estado['melhor_distancia']
+        if retomar is not None:
+            if estado['estrategia'] != nome_estrategia:
+                raise ValueError(f"Checkpoint {caminho} é da estratégia {estado['estrategia']}, "
+                                 f"não dá para continuar com {nome_estrategia}.")
+            primeira_iteracao = estado['iteracao']
+            stagnation_counter = estado['stagnation_counter']
+            reiniciou = estado.get('reiniciou', False)
+            previous_best_distance = melhor_distancia
+            best_fitnesses.extend(estado['best_fitnesses'])
+            worst_fitnesses.extend(estado['worst_fitnesses'])
+            avg_fitnesses.extend(estado['avg_fitnesses'])
+            rng.bit_generator.state = estado['estado_rng']
+            if estado.get('estado_random') is not None:
+                versao, estado_interno, gauss = estado['estado_random']
+                gerador_escalar.setstate((versao, tuple(estado_interno), gauss))
+            restaurar_estrategia(estrategia, estado['estado_estrategia'])
+        atualizar_informacao_escolha(informacao, feromonio, heuristica_beta, alfa, candidatas=candidatas)
+
+    iteracoes_feitas = primeira_iteracao
+    def salvar():
+        salvar_checkpoint(checkpoint, {
+            'feromonio': feromonio,
+            'melhor_rota': melhor_rota,
+            'melhor_distancia': melhor_distancia,
+            'cidades': instancia['cidades'],
+            'iteracao': iteracoes_feitas,
+            'stagnation_counter': stagnation_counter,
+            'reiniciou': reiniciou,
+            'best_fitnesses': best_fitnesses,
+            'worst_fitnesses': worst_fitnesses,
+            'avg_fitnesses': avg_fitnesses,
+            'estrategia': nome_estrategia,
+            'estado_estrategia': estado_estrategia(estrategia),
+            'estado_rng': rng.bit_generator.state,
+            'estado_random': gerador_escalar.getstate(),
+        })
+
+    #a atualização local (ACS) mexe no feromonio a cada passo, e a informação de escolha vai junto.
+    atualizacao_local = None
+    if estrategia.atualizacao_local is not None:
+        def atualizacao_local(origens, destinos):
+            estrategia.atualizacao_local(feromonio, origens, destinos)
+            atualizar_informacao_escolha(informacao, feromonio, heuristica_beta, alfa, 1.0, (origens, destinos),
+                                         candidatas)
+        motor = 'vetorizado' #a regra do ACS só existe no motor vetorizado.
+    elif estrategia.q0:
+        motor = 'vetorizado'
+
+    #com num_workers > 1 as formigas de cada iteração são divididas entre processos (ver paralelo.py).
+    #A atualização local precisa ver o passo de todas as formigas, então com ela tudo fica no mesmo processo.
+    construtor = None
+    if num_workers > 1 and motor == 'vetorizado' and atualizacao_local is None:
+        from paralelo import ConstrutorParalelo
+        construtor = ConstrutorParalelo(instancia, informacao, num_workers, semente, vizinhos, estrategia.q0)
+
+    #para cada iteração, ele cria todas as rotas e todas as distâncias
     #além disso, ele cria as formigas que vão explorar, de acordo com a quantidade de formigas que trabalharão.
     #O armazenamento de todas as rotas serve para poder depositar um feromonio ao final dela, feromonio este
     #que é transferido para a próxima iteração de formigas
-    for iteracao in range(num_iteracoes):
-        todas_rotas = []
-        todas_distancias = []
-
-        #cada formiga cria uma rota, e a distância dessa rota, adiciona para a variável de todas as rotas
-        #e todas as distâncias também.
-        #Se a distancia encontrada pela formiga for melhor, ou seja, a distância seja menor que a melhor distância, então atualiza-se
-        #a melhor encontrada.
-        for _ in range(num_formigas):
-            rota = construir_rota(cidades, feromonio, coordenadas, alfa, beta)
-            distancia_rota = calcular_distancia_total(rota, coordenadas)
-            todas_rotas.append(rota)
-            todas_distancias.append(distancia_rota)
-
-            if distancia_rota < melhor_distancia:
-                melhor_rota = rota
-                melhor_distancia = distancia_rota
-
-        #Para essa iteração, ou seja, para as 100 formigas, ele guarda o melhor fitness, o pior e a média dos fitness.
-        #essa para fins de gráficos.
-        best_fitness = min(todas_distancias)
-        worst_fitness = max(todas_distancias)
-        avg_fitness = sum(todas_distancias) / len(todas_distancias)
-
-        #já essa é global, para construir em torno de todas as iterações.
-        best_fitnesses.append(best_fitness)
-        worst_fitnesses.append(worst_fitness)
-        avg_fitnesses.append(avg_fitness)
-
-        # essa aqui está verificando se está estagnado, para aumentar o contador.
-        if melhor_distancia >= previous_best_distance:
-            stagnation_counter += 1
-        else:
-            stagnation_counter = 0
-
-        previous_best_distance = melhor_distancia
-        #aqui é para ver se o algoritmo já entrou em convergência.
-        if stagnation_counter >= max_stagnation:
-            print(f"[INFO] Algorithm converged after {iteracao + 1} iterations.")
+    #Modo "a qualquer momento": a execução para no que vier primeiro entre num_iteracoes, max_stagnation iterações
+    #sem melhora (None ou 0 desliga), prazo_ms milissegundos desde o início e a melhor rota chegar em distancia_alvo.
+    #O prazo é conferido antes de cada iteração, contando com a iteração mais demorada até agora: se ela não cabe
+    #no tempo que sobra, nem começa. Assim a execução termina dentro do prazo, a não ser que a primeira iteração
+    #sozinha já passe dele (sem nenhuma rota não tem o que devolver).
+    #Se vier, parada recebe o motivo da parada ('iteracoes', 'prazo', 'alvo' ou 'estagnacao') e as iterações feitas.
+    fim_prazo = time.perf_counter() + prazo_ms / 1000 if prazo_ms is not None else None
+    maior_iteracao = 0.0
+    motivo = 'iteracoes'
+    try:
+        for iteracao in range(primeira_iteracao, num_iteracoes):
+            inicio_iteracao = time.perf_counter()
+            if fim_prazo is not None and melhor_rota is not None and inicio_iteracao + maior_iteracao > fim_prazo:
+                motivo = 'prazo'
+                break
+            #cada formiga cria uma rota, e a distância dessa rota, tudo guardado em todas as rotas (formigas x cidades)
+            #e todas as distâncias.
+            #O motor 'vetorizado' constrói todas as formigas juntas, o 'escalar' constrói uma por vez.
+            inicio_construcao = time.perf_counter()
+            if construtor is not None:
+                #com as formigas em outros processos, a avaliação é feita lá e o tempo dela vem dos workers, e o tempo
+                #da construção é o da chamada inteira (a comunicação com os workers inclusa).
+                todas_rotas, todas_distancias = construtor.construir(
+                    informacao, num_formigas, instrumentacao.contadores if instrumentacao is not None else None)
+                tempo_avaliacao = construtor.tempo_avaliacao
+            else:
+                if motor == 'vetorizado':
+                    todas_rotas = construir_rotas_vetorizado(
+                        num_formigas, informacao, heuristica, rng, vizinhos, estrategia.q0, atualizacao_local,
+                        instrumentacao.contadores if instrumentacao is not None else None, mais_proxima)
+                else:
+                    todas_rotas = np.array([construir_rota(cidades, informacao, heuristica, vizinhos, gerador_escalar)
+                                            for _ in range(num_formigas)])
+                inicio_avaliacao = time.perf_counter()
+                todas_distancias = avaliar_rotas(todas_rotas, instancia)
+                tempo_avaliacao = time.perf_counter() - inicio_avaliacao
+            tempo_construcao = time.perf_counter() - inicio_construcao
+
+            #busca local antes do depósito, assim o feromonio já é depositado nas rotas melhoradas.
+            tempo_busca_local = 0.0
+            if modo_busca_local:
+                inicio_busca_local = time.perf_counter()
+                if modo_busca_local == 'todas':
+                    selecionadas = np.arange(len(todas_rotas))
+                else:
+                    selecionadas = np.array([np.argmin(todas_distancias)])
+                todas_rotas[selecionadas], todas_distancias[selecionadas] = aplicar_busca_local(
+                    todas_rotas[selecionadas], distancias_busca, vizinhos_busca)
+                tempo_busca_local = time.perf_counter() - inicio_busca_local
+
+            #Se a distancia encontrada pela melhor formiga for melhor, ou seja, a distância seja menor que a melhor
+            #distância, então atualiza-se a melhor encontrada.
+            melhor_formiga = int(np.argmin(todas_distancias))
+            if todas_distancias[melhor_formiga] < melhor_distancia:
+                melhor_rota = todas_rotas[melhor_formiga]
+                melhor_distancia = float(todas_distancias[melhor_formiga])
+
+            #Para essa iteração, ou seja, para as 100 formigas, ele guarda o melhor fitness, o pior e a média dos fitness.
+            #essa para fins de gráficos.
+            best_fitness = float(todas_distancias.min())
+            worst_fitness = float(todas_distancias.max())
+            avg_fitness = float(todas_distancias.mean())
+
+            #já essa é global, para construir em torno de todas as iterações.
+            best_fitnesses.append(best_fitness)
+            worst_fitnesses.append(worst_fitness)
+            avg_fitnesses.append(avg_fitness)
+            iteracoes_feitas = iteracao + 1
+
+            # essa aqui está verificando se está estagnado, para aumentar o contador.
+            if melhor_distancia >= previous_best_distance:
+                stagnation_counter += 1
+            else:
+                stagnation_counter = 0
+                reiniciou = False
+
+            previous_best_distance = melhor_distancia
+
+            # Essa função no final é extremamente importante, serve para atualizar os feromônios de acordo
+            # com a estratégia, os parametros e com as rotas encontradas pelas formigas.
+            #e a informação de escolha é atualizada logo em seguida, uma vez só para todas as formigas da próxima iteração.
+            inicio_feromonio = time.perf_counter()
+            reinicios = estrategia.reinicios
+            fator, arestas = estrategia.atualizar(feromonio, todas_rotas, todas_distancias, melhor_rota, melhor_distancia)
+            #o primeiro reinicio depois da última melhora recomeça a contagem da estagnação: a colônia reiniciada tem
+            #max_stagnation iterações para melhorar antes de ser dada como convergida.
+            if estrategia.reinicios != reinicios and not reiniciou:
+                stagnation_counter = 0
+                reiniciou = True
+            informacao = atualizar_informacao_escolha(informacao, feromonio, heuristica_beta, alfa, fator, arestas,
+                                                      candidatas)
+
+            #tempo de cada fase da iteração, separado, para fins de acompanhamento.
+            tempo_feromonio = time.perf_counter() - inicio_feromonio
+            if tempos is not None:
+                tempos.append({'construcao': tempo_construcao, 'busca_local': tempo_busca_local,
+                               'feromonio': tempo_feromonio})
+            #com a instrumentação, a avaliação das rotas sai do tempo da construção e vira uma fase própria.
+            if instrumentacao is not None:
+                instrumentacao.registrar_iteracao({
+                    'construcao': tempo_construcao - tempo_avaliacao,
+                    'avaliacao': tempo_avaliacao,
+                    'busca_local': tempo_busca_local,
+                    'feromonio': tempo_feromonio,
+                }, num_formigas)
+
+            maior_iteracao = max(maior_iteracao, time.perf_counter() - inicio_iteracao)
+
+            #aqui é para ver se o algoritmo já entrou em convergência. Fica depois da atualização do feromonio, e numa
+            #estratégia que reinicia (o MAX-MIN reinicia o feromonio com reinicio iterações sem melhora) só conta depois
+            #do reinicio: assim a colônia sempre tem a chance de reiniciar antes de ser dada como convergida.
+            if max_stagnation and stagnation_counter >= max_stagnation and (reiniciou or not estrategia.reinicio):
+                print(f"[INFO] Algorithm converged after {iteracao + 1} iterations.")
+                motivo = 'estagnacao'
+                break
+
+            #checkpoint a cada intervalo_checkpoint iterações, já com o feromonio atualizado.
+            if checkpoint is not None and iteracoes_feitas % intervalo_checkpoint == 0:
+                salvar()
+
+            #Modelo de ilhas (ver ilhas.py): a cada migracao.intervalo iterações a colônia manda a melhor rota dela e
+            #recebe as rotas das ilhas vizinhas. No modo 'rota' a rota recebida vira a melhor da colônia (quando é
+            #melhor) e é depositada pela estratégia. No modo 'feromonio' a colônia também manda o feromonio que tem
+            #nas arestas da sua melhor rota, e o feromonio dessas arestas de quem recebe é misturado com ele (peso).
+            if migracao is not None and iteracoes_feitas % migracao.intervalo == 0:
+                valores = None
+                if migracao.modo == 'feromonio':
+                    origens, destinos = arestas_das_rotas(melhor_rota)
+                    valores = feromonio.flat[posicoes_arestas(feromonio, origens, destinos, candidatas)]
+                for rota, distancia, valores_recebidos in migracao.trocar(iteracoes_feitas, melhor_rota,
+                                                                          melhor_distancia, valores):
+                    rota = np.asarray(rota, dtype=np.intp)
+                    if valores_recebidos is None:
+                        if distancia < melhor_distancia:
+                            melhor_rota, melhor_distancia = rota, float(distancia)
+                        fator, arestas = estrategia.receber(feromonio, rota, distancia)
+                    else:
+                        arestas = arestas_das_rotas(rota)
+                        posicoes = posicoes_arestas(feromonio, *arestas, candidatas)
+                        feromonio.flat[posicoes] = ((1 - migracao.peso) * feromonio.flat[posicoes] +
+                                                    migracao.peso * valores_recebidos)
+                        fator = 1.0
+                    informacao = atualizar_informacao_escolha(informacao, feromonio, heuristica_beta, alfa, fator,
+                                                              arestas, candidatas)
+
+            #aqui ele retorna os valores para construção dos gráficos, mas continua a iteração, sem parar ela.
+            #a rota é devolvida com os rótulos originais das cidades, igual ao arquivo .tsp.
+            yield iteracao + 1, melhor_distancia, [int(cidade) for cidade in instancia['cidades'][melhor_rota]]
+
+            if distancia_alvo is not None and melhor_distancia <= distancia_alvo:
+                motivo = 'alvo'
+                break
+    except GeneratorExit: #execução cancelada (o gerador foi fechado no meio): guarda o ponto em que parou.
+        if checkpoint is not None:
+            salvar()
+        raise
+    finally:
+        if construtor is not None:
+            construtor.fechar()
+
+    if parada is not None:
+        parada.update(motivo=motivo, iteracoes=iteracoes_feitas)
+    if checkpoint is not None:
+        salvar()
+
+
+#devolve (G, problem, instancia) do arquivo pelo registro de instâncias (ver registro_instancias.py): as instâncias
+#ficam num cache em memória e as matrizes em arquivos .npy abertos com mmap, então várias execuções no mesmo processo
+#(ex: os jobs do servidor) ou em outros processos (ex: as execuções do /run_multiple_aco) não leem o arquivo de novo.
+#G e problem vêm sempre None, o solver só precisa da instância.
+def obter_instancia(nome_arquivo, arredondar=False, grande=None):
+    from registro_instancias import registro_instancias
+    return registro_instancias.carregar(nome_arquivo, arredondar, grande)
+
+
+#Roda uma colônia inteira do começo ao fim e devolve o resultado. Como ela recebe só o nome do arquivo e os
+#parâmetros, pode ser enviada para outro processo (cada processo carrega a instância uma vez e reaproveita).
+#Cada execução tem o seu próprio histórico de fitness, nada é compartilhado entre execuções.
+#cancelamento (ex: um Event de um Manager, que passa para outro processo) é conferido a cada iteração, e quando ele
+#está ligado a execução para ali, com o motivo 'cancelado'.
+#prazo_final é o instante (em time.time(), que vale entre processos) em que a execução tem que ter terminado: o
+#tempo até ela começar (espera por um processo livre, início do processo, carga da instância) conta nele, e o resto
+#vira o prazo_ms do solver. Se ele já passou, a colônia nem começa e o resultado vem com 'pulada'.
+def executar_colonia(nome_arquivo, arredondar=False, cancelamento=None, prazo_final=None, **parametros):
+    G, problem, instancia = obter_instancia(nome_arquivo, arredondar)
+
+    best_fitnesses, worst_fitnesses, avg_fitnesses = [], [], []
+    iteracoes, melhor_distancia, melhor_rota = 0, None, None
+    parada = {}
+    if prazo_final is not None:
+        parametros['prazo_ms'] = 1000 * (prazo_final - time.time())
+        if parametros['prazo_ms'] <= 0:
+            return execucao_pulada()
+    solver = algoritmo_colonia_formigas_sse(G, problem, best_fitnesses, worst_fitnesses, avg_fitnesses,
+                                            instancia=instancia, parada=parada, **parametros)
+    for iteracoes, melhor_distancia, melhor_rota in solver:
+        if cancelamento is not None and cancelamento.is_set():
+            solver.close()
+            parada['motivo'] = 'cancelado'
             break
 
-        # Essa função no final é extremamente importante, serve para atualizar os feromônios de acordo
-        # com os parametros e com as rotas encontradas pelas formigas.
-        feromonio = atualizar_feromonios(feromonio, todas_rotas, todas_distancias, evaporacao, Q)
-
-        #aqui ele retorna os valores para construção dos gráficos, mas continua a iteração, sem parar ela.
-        yield iteracao + 1, melhor_distancia, melhor_rota
-
+    #as iterações feitas são as do solver (o tamanho dos históricos): na parada por estagnação a última iteração não
+    #chega a ser devolvida pelo gerador. Cancelado, o gerador foi fechado e não preenche parada['iteracoes'].
+    return {
+        'pulada': False,
+        'iteracoes': parada.get('iteracoes', len(best_fitnesses)),
+        'motivo_parada': parada['motivo'],
+        'melhor_distancia': melhor_distancia,
+        'melhor_rota': melhor_rota,
+        'best_fitnesses': best_fitnesses,
+        'worst_fitnesses': worst_fitnesses,
+        'avg_fitnesses': avg_fitnesses,
+    }
 
 
+#resultado (no formato do executar_colonia) de uma execução que não começou porque o prazo já tinha acabado.
+def execucao_pulada():
+    return {'pulada': True, 'iteracoes': 0, 'motivo_parada': 'prazo', 'melhor_distancia': None, 'melhor_rota': None,
+            'best_fitnesses': [], 'worst_fitnesses': [], 'avg_fitnesses': []}
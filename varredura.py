@@ -0,0 +1,207 @@
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from tsp_solver import executar_colonia
+from paralelo import CONTEXTO_PROCESSOS
+
+#Varredura de parâmetros pela linha de comando, sem a interface: roda cada configuração de parâmetros em cada
+#instância e em várias sementes, espalhando as execuções em um pool de processos, e grava cada resultado (JSONL ou
+#CSV) assim que ele termina.
+#As configurações saem de uma grade (todas as combinações) ou de uma busca aleatória (--aleatoria N), e os
+#parâmetros têm os mesmos nomes do algoritmo_colonia_formigas_sse (alfa, beta, evaporacao, Q, num_formigas...).
+#Com --corrida, a varredura é feita em rodadas (successive halving): cada rodada roda as configurações que
+#sobraram em mais --sementes-por-rodada sementes, e só a melhor fração 1/--eta segue para a próxima. As
+#configurações claramente piores param cedo e a varredura sai com uma fração das execuções da grade completa.
+#A nota de uma configuração é a média, entre instâncias e sementes, da distância dividida pela melhor distância
+#já encontrada naquela instância (1.0 = empatou com a melhor, 1.05 = 5% pior), assim instâncias de tamanhos
+#diferentes pesam igual. Todas as configurações usam as mesmas sementes, o que deixa a comparação mais justa.
+#Exemplos:
+#   python varredura.py dj38.tsp d198.tsp -p alfa=0.5,1,2 -p beta=2,3,5 -p evaporacao=0.1,0.5 --sementes 5
+#   python varredura.py lin318.tsp -p alfa=0.5:3 -p beta=1:6 --aleatoria 40 --corrida --sementes 8 -o lin318.csv
+#   python varredura.py lin318.tsp -p estrategia=as,mmas,acs --fixo k_vizinhos=15 --fixo modo_busca_local=melhor
+
+SEMENTE_BASE = 1000
+
+
+#converte o texto para int, float, bool ou None quando der, senão deixa como texto.
+def converter(valor):
+    for tipo in (int, float):
+        try:
+            return tipo(valor)
+        except ValueError:
+            pass
+    return {'true': True, 'false': False, 'none': None}.get(valor.lower(), valor)
+
+
+#"nome=v1,v2,v3" vira (nome, [v1, v2, v3]) e "nome=min:max" vira (nome, (min, max)), um intervalo contínuo que só
+#faz sentido na busca aleatória.
+def ler_parametro(texto):
+    if '=' not in texto:
+        raise argparse.ArgumentTypeError(f"Parâmetro sem '=': {texto}")
+    nome, valores = texto.split('=', 1)
+    if ':' in valores and ',' not in valores:
+        minimo, maximo = (float(valor) for valor in valores.split(':', 1))
+        return nome, (minimo, maximo)
+    return nome, [converter(valor) for valor in valores.split(',')]
+
+
+def gerar_configuracoes(parametros, aleatoria=0, semente=SEMENTE_BASE):
+    if not aleatoria:
+        intervalos = [nome for nome, valores in parametros if isinstance(valores, tuple)]
+        if intervalos:
+            raise ValueError(f"Intervalos ({', '.join(intervalos)}) só podem ser usados com --aleatoria.")
+        nomes = [nome for nome, _ in parametros]
+        return [dict(zip(nomes, combinacao)) for combinacao in itertools.product(*(v for _, v in parametros))]
+
+    rng = np.random.default_rng(semente)
+    configuracoes = []
+    for _ in range(aleatoria):
+        configuracao = {}
+        for nome, valores in parametros:
+            if isinstance(valores, tuple):
+                configuracao[nome] = round(float(rng.uniform(*valores)), 4)
+            else:
+                configuracao[nome] = valores[rng.integers(len(valores))]
+        configuracoes.append(configuracao)
+    return configuracoes
+
+
+#roda em outro processo: uma colônia inteira, devolvendo só o resumo (sem os históricos, que são grandes).
+def executar_tarefa(tarefa):
+    inicio = time.perf_counter()
+    resultado = executar_colonia(tarefa['instancia'], tarefa['arredondar'], semente=tarefa['semente'],
+                                 **tarefa['fixos'], **tarefa['parametros'])
+    return dict(
+        {chave: valor for chave, valor in tarefa.items() if chave != 'fixos'},
+        melhor_distancia=resultado['melhor_distancia'],
+        iteracoes=resultado['iteracoes'],
+        tempo_s=time.perf_counter() - inicio,
+    )
+
+
+#grava cada resultado assim que chega, em JSONL (uma linha JSON por execução) ou CSV (pela extensão do arquivo).
+class Saida:
+    def __init__(self, caminho, nomes_parametros):
+        self.arquivo = open(caminho, 'w', newline='') if caminho != '-' else sys.stdout
+        self.csv = None
+        if caminho.endswith('.csv'):
+            self.csv = csv.writer(self.arquivo)
+            self.colunas = ['rodada', 'configuracao', 'instancia', 'semente'] + nomes_parametros + \
+                ['melhor_distancia', 'iteracoes', 'tempo_s']
+            self.csv.writerow(self.colunas)
+
+    def gravar(self, resultado):
+        if self.csv is not None:
+            linha = dict(resultado, **resultado['parametros'])
+            self.csv.writerow([linha.get(coluna) for coluna in self.colunas])
+        else:
+            self.arquivo.write(json.dumps(resultado) + '\n')
+        self.arquivo.flush()
+
+    def fechar(self):
+        if self.arquivo is not sys.stdout:
+            self.arquivo.close()
+
+
+#nota de cada configuração (média da distância relativa à melhor da instância) com os resultados até agora.
+def notas(resultados, configuracoes):
+    melhores = {}
+    for resultado in resultados:
+        instancia = resultado['instancia']
+        melhores[instancia] = min(melhores.get(instancia, math.inf), resultado['melhor_distancia'])
+    relativas = {indice: [] for indice in configuracoes}
+    for resultado in resultados:
+        if resultado['configuracao'] in relativas:
+            relativas[resultado['configuracao']].append(
+                resultado['melhor_distancia'] / melhores[resultado['instancia']])
+    return {indice: float(np.mean(valores)) for indice, valores in relativas.items() if valores}
+
+
+def rodar(args):
+    parametros = args.parametros or []
+    configuracoes = dict(enumerate(gerar_configuracoes(parametros, args.aleatoria)))
+    fixos = dict(args.fixos or [])
+    fixos.setdefault('num_iteracoes', args.iteracoes)
+    sementes = [SEMENTE_BASE + indice for indice in range(args.sementes)]
+    #sem corrida é uma rodada só, com todas as sementes.
+    por_rodada = args.sementes_por_rodada if args.corrida else args.sementes
+    nomes_parametros = [nome for nome, _ in parametros]
+    total_grade = len(configuracoes) * len(args.instancias) * len(sementes)
+    print(f"[INFO] {len(configuracoes)} configurações x {len(args.instancias)} instâncias x {len(sementes)} sementes "
+          f"= {total_grade} execuções na grade completa.", file=sys.stderr)
+
+    saida = Saida(args.saida, nomes_parametros)
+    resultados = []
+    vivas = list(configuracoes)
+    inicio = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.processos, mp_context=CONTEXTO_PROCESSOS) as pool:
+            for rodada, primeira in enumerate(range(0, len(sementes), por_rodada)):
+                tarefas = [
+                    {'rodada': rodada, 'configuracao': indice, 'instancia': instancia, 'semente': semente,
+                     'arredondar': args.arredondar, 'parametros': configuracoes[indice], 'fixos': fixos}
+                    for indice in vivas for instancia in args.instancias
+                    for semente in sementes[primeira:primeira + por_rodada]
+                ]
+                for futuro in as_completed([pool.submit(executar_tarefa, tarefa) for tarefa in tarefas]):
+                    resultado = futuro.result()
+                    resultados.append(resultado)
+                    saida.gravar(resultado)
+
+                if not args.corrida or primeira + por_rodada >= len(sementes):
+                    break
+                #successive halving: só a melhor fração 1/eta continua.
+                nota = notas(resultados, vivas)
+                vivas = sorted(vivas, key=nota.get)[:max(1, math.ceil(len(vivas) / args.eta))]
+                print(f"[INFO] Rodada {rodada}: {len(vivas)} configurações seguem.", file=sys.stderr)
+                if len(vivas) == 1:
+                    break
+    finally:
+        saida.fechar()
+
+    nota = notas(resultados, vivas)
+    ranking = sorted(vivas, key=nota.get)
+    print(f"[INFO] {len(resultados)} de {total_grade} execuções em {time.perf_counter() - inicio:.1f} s.",
+          file=sys.stderr)
+    for posicao, indice in enumerate(ranking[:args.top], start=1):
+        print(f"[INFO] {posicao}. nota {nota[indice]:.4f} configuração {indice}: {configuracoes[indice]}",
+              file=sys.stderr)
+    return ranking, configuracoes, nota
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Varredura de parâmetros do ACO em lote, sem a interface.")
+    parser.add_argument('instancias', nargs='+', help="arquivos .tsp")
+    parser.add_argument('-p', '--parametro', dest='parametros', action='append', type=ler_parametro,
+                        help="parâmetro variado: nome=v1,v2,... (grade) ou nome=min:max (só com --aleatoria)")
+    parser.add_argument('--fixo', dest='fixos', action='append', type=lambda texto: (
+        texto.split('=', 1)[0], converter(texto.split('=', 1)[1])), help="parâmetro fixo: nome=valor")
+    parser.add_argument('--aleatoria', type=int, default=0, help="sorteia N configurações no lugar da grade")
+    parser.add_argument('--sementes', type=int, default=3, help="sementes por configuração e instância")
+    parser.add_argument('--iteracoes', type=int, default=100, help="num_iteracoes de cada execução")
+    parser.add_argument('--arredondar', action='store_true', help="distâncias arredondadas do TSPLIB")
+    parser.add_argument('--processos', type=int, default=os.cpu_count(), help="execuções ao mesmo tempo")
+    parser.add_argument('--corrida', action='store_true', help="elimina as piores configurações a cada rodada")
+    parser.add_argument('--sementes-por-rodada', type=int, default=1, help="sementes novas por rodada da corrida")
+    parser.add_argument('--eta', type=float, default=2, help="fração que sobrevive a cada rodada é 1/eta")
+    parser.add_argument('-o', '--saida', default='varredura.jsonl', help="arquivo .jsonl ou .csv ('-' = tela)")
+    parser.add_argument('--top', type=int, default=5, help="quantas configurações mostrar no final")
+    args = parser.parse_args()
+    if args.eta <= 1:
+        parser.error("--eta precisa ser maior que 1.")
+    try:
+        rodar(args)
+    except ValueError as e:
+        parser.error(str(e))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
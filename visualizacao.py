@@ -0,0 +1,160 @@
+import gzip
+import hashlib
+import json
+import numpy as np
+from tsp_solver import calcular_vizinhos
+
+#Camada de visualização do grafo para o Plotly. O que é mandado para o navegador sai direto das matrizes da instância
+#(coordenadas, vizinhos), sem passar pelo networkx, e fica guardado pronto na instância: o JSON já serializado, a
+#versão em gzip e o ETag. Assim a segunda requisição do mesmo grafo não monta nem serializa nada, e se o navegador
+#já tem a resposta (If-None-Match) não manda nem os bytes.
+#Modos de desenho:
+# - 'completo': todas as arestas do grafo completo (n(n-1)/2, fica pesado rápido, e acima de MAX_ARESTAS_COMPLETO
+#   nem é montado);
+# - 'vizinhos': só as arestas para os k vizinhos mais próximos de cada cidade (no máximo MAX_ARESTAS_COMPLETO
+#   arestas, n·k). Com k maior que o da instância, a lista é calculada só para o desenho, sem mexer na instância
+#   (que é compartilhada com as execuções);
+# - 'amostra': no máximo LIMITE_ARESTAS arestas do grafo completo, sorteadas com semente fixa;
+# - 'cidades': só as cidades, sem arestas;
+# - 'auto': 'completo' enquanto couber em LIMITE_ARESTAS, senão 'vizinhos' enquanto couber, senão 'cidades'.
+#Acima de LIMITE_ROTULOS cidades os pontos vão sem o rótulo escrito (só no hover), que com dezenas de milhares de
+#cidades é o que mais pesa no navegador.
+#As rotas não levam coordenadas: vão como a lista de índices das cidades, e o navegador liga os pontos com as
+#coordenadas do node_trace que ele já tem (a posição i do node_trace é a cidade de índice i).
+
+MODOS = ('auto', 'completo', 'vizinhos', 'amostra', 'cidades')
+LIMITE_ARESTAS = 20000
+MAX_ARESTAS_COMPLETO = 500000
+LIMITE_ROTULOS = 1000
+K_VIZINHOS_VISUALIZACAO = 5
+
+
+#texto, gzip e ETag de um payload, guardados juntos na instância.
+class Payload:
+    def __init__(self, dados):
+        self.corpo = json.dumps(dados, separators=(',', ':')).encode()
+        self.corpo_gzip = gzip.compress(self.corpo, compresslevel=6)
+        self.etag = hashlib.sha1(self.corpo).hexdigest()[:20]
+
+
+def obter_cache(instancia):
+    if 'visualizacao' not in instancia:
+        instancia['visualizacao'] = {}
+    return instancia['visualizacao']
+
+
+def node_trace(instancia):
+    cache = obter_cache(instancia)
+    if 'node_trace' not in cache:
+        coordenadas = instancia['coordenadas']
+        rotulos = len(coordenadas) <= LIMITE_ROTULOS
+        cache['node_trace'] = {
+            'x': coordenadas[:, 0].tolist(),
+            'y': coordenadas[:, 1].tolist(),
+            'mode': 'markers+text' if rotulos else 'markers',
+            'text': [str(cidade) for cidade in instancia['cidades'].tolist()],
+            'textposition': 'top center',
+            'marker': {
+                'size': 10 if rotulos else 3,
+                'color': 'blue',
+                'line': {'width': 2 if rotulos else 0}
+            }
+        }
+    return cache['node_trace']
+
+
+def escolher_modo(instancia, modo, k=K_VIZINHOS_VISUALIZACAO):
+    if modo not in MODOS:
+        raise ValueError(f"Modo de visualização desconhecido: {modo}. Use um de {', '.join(MODOS)}.")
+    n = len(instancia['cidades'])
+    if modo == 'auto':
+        if n * (n - 1) // 2 <= LIMITE_ARESTAS:
+            return 'completo'
+        return 'vizinhos' if n * K_VIZINHOS_VISUALIZACAO <= LIMITE_ARESTAS else 'cidades'
+    if modo == 'completo' and n * (n - 1) // 2 > MAX_ARESTAS_COMPLETO:
+        raise ValueError(f"O grafo completo tem {n * (n - 1) // 2} arestas, mais que o máximo de "
+                         f"{MAX_ARESTAS_COMPLETO}. Use o modo vizinhos, amostra ou cidades.")
+    if modo == 'vizinhos' and not 1 <= k <= MAX_ARESTAS_COMPLETO // n:
+        raise ValueError(f"k tem que estar entre 1 e {MAX_ARESTAS_COMPLETO // n} nesta instância "
+                         f"(no máximo {MAX_ARESTAS_COMPLETO} arestas).")
+    return modo
+
+
+#arestas (origens, destinos) em índices para o modo pedido, cada aresta uma vez só (origem < destino).
+def arestas_do_modo(instancia, modo, k):
+    n = len(instancia['cidades'])
+    if modo == 'cidades':
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    if modo == 'vizinhos':
+        k = min(k, n - 1)
+        vizinhos = instancia['vizinhos']
+        if k > vizinhos.shape[1]:
+            vizinhos = calcular_vizinhos(instancia['coordenadas'], k, instancia.get('distancias'))
+        vizinhos = vizinhos[:, :k]
+        origens = np.repeat(np.arange(n), vizinhos.shape[1])
+        destinos = vizinhos.ravel()
+        pares = np.unique(np.sort(np.column_stack([origens, destinos]), axis=1), axis=0)
+        return pares[:, 0], pares[:, 1]
+    total = n * (n - 1) // 2
+    if modo == 'amostra' and total > LIMITE_ARESTAS:
+        #sorteia as posições na ordem do triu_indices e converte para (origem, destino) sem montar as n(n-1)/2
+        #arestas: a linha i começa na posição i * (2n - i - 1) / 2.
+        escolhidas = np.sort(np.random.default_rng(0).choice(total, LIMITE_ARESTAS, replace=False))
+        linhas = np.arange(n - 1)
+        inicios = linhas * (2 * n - linhas - 1) // 2
+        origens = np.searchsorted(inicios, escolhidas, side='right') - 1
+        return origens, origens + 1 + escolhidas - inicios[origens]
+    return np.triu_indices(n, k=1)
+
+
+#x e y das arestas no formato do Plotly (x0, x1, None, x0, x1, None, ...), montados de uma vez com numpy.
+def linhas(coordenadas, origens, destinos):
+    pontos = np.full((len(origens), 3, 2), np.nan)
+    pontos[:, 0] = coordenadas[origens]
+    pontos[:, 1] = coordenadas[destinos]
+    x, y = pontos[:, :, 0].ravel().tolist(), pontos[:, :, 1].ravel().tolist()
+    return [v if v == v else None for v in x], [v if v == v else None for v in y] #NaN vira null no JSON.
+
+
+#só o k padrão do modo vizinhos fica no cache: com qualquer k o cache da instância cresceria sem limite.
+def payload_grafo(instancia, modo='auto', k=K_VIZINHOS_VISUALIZACAO):
+    modo = escolher_modo(instancia, modo, k)
+    chave = (modo, k if modo == 'vizinhos' else None)
+    cache = {} if modo == 'vizinhos' and k != K_VIZINHOS_VISUALIZACAO else obter_cache(instancia)
+    if chave not in cache:
+        origens, destinos = arestas_do_modo(instancia, modo, k)
+        edge_x, edge_y = linhas(instancia['coordenadas'], origens, destinos)
+        cache[chave] = Payload({
+            'node_trace': node_trace(instancia),
+            'edge_trace': {
+                'x': edge_x,
+                'y': edge_y,
+                'line': {'width': 1, 'color': '#888'},
+                'mode': 'lines'
+            },
+            'layout': layout('Visualização do Grafo TSP'),
+            'mode': modo,
+        })
+    return cache[chave]
+
+
+#a rota (rótulos das cidades) vai como índices, o navegador expande com as coordenadas do node_trace.
+def payload_rota(instancia, rota):
+    indices = instancia['indices']
+    return Payload({
+        'rota': [indices[int(cidade)] for cidade in rota],
+        'line': {'width': 2, 'color': 'red'},
+        'layout': layout('Melhor Rota Encontrada'),
+    })
+
+
+def layout(titulo):
+    return {
+        'title': titulo,
+        'showlegend': False,
+        'hovermode': 'closest',
+        'margin': {'b': 0, 'l': 0, 'r': 0, 't': 40},
+        'xaxis': {'showgrid': False, 'zeroline': False},
+        'yaxis': {'showgrid': False, 'zeroline': False},
+        'height': 600
+    }